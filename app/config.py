@@ -10,6 +10,85 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # EEG inference executor: number of worker processes (0 runs jobs on
+    # INFERENCE_THREADS background threads in the web process) and how many
+    # jobs may wait for a free worker before new submissions are rejected
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_THREADS: int = 1
+    INFERENCE_MAX_QUEUE: int = 4
+
+    # Micro-batching of model calls: segments from assessments running at the
+    # same time in one process are collected for up to MODEL_BATCH_MAX_WAIT_MS
+    # and run in one forward pass of up to MODEL_BATCH_MAX_SIZE segments. Only
+    # the threads of INFERENCE_WORKERS=0 with INFERENCE_THREADS above 1 run
+    # assessments side by side; worker processes run one at a time, so there
+    # the window is skipped and segments waiting together are still batched
+    MODEL_BATCH_MAX_WAIT_MS: float = 5
+    MODEL_BATCH_MAX_SIZE: int = 512
+
+    # Early exit of the segment vote: with EARLY_EXIT, assessments are scored
+    # EARLY_EXIT_BATCH segments at a time and stop once the epochs left can't
+    # change the majority, or once the majority share is above one half at
+    # the EARLY_EXIT_CONFIDENCE level, at least 0 and below 1 (0 only stops
+    # on a decided majority)
+    EARLY_EXIT: bool = False
+    EARLY_EXIT_BATCH: int = 32
+    EARLY_EXIT_CONFIDENCE: float = 0
+
+    # Model backend: "keras" runs the compiled TensorFlow forward pass,
+    # "tflite" runs the flatbuffer written by python -m app.ml.export from
+    # TFLITE_MODEL_PATH (defaults to model.tflite next to model.h5)
+    MODEL_BACKEND: str = "keras"
+    TFLITE_MODEL_PATH: str = ""
+
+    # Model precision: "float", or "int8" to run the int8 quantized TFLite
+    # model from INT8_MODEL_PATH (defaults to model-int8.tflite next to
+    # model.h5) on either backend
+    MODEL_PRECISION: str = "float"
+    INT8_MODEL_PATH: str = ""
+
+    # Thread limits of every process that runs the model, so several uvicorn
+    # workers or INFERENCE_WORKERS on one machine don't each use every core
+    # (0 keeps the library default of one thread per core). TensorFlow's are
+    # applied before the model is loaded and TF_INTRA_OP_THREADS also sets the
+    # TFLite interpreter's threads; BLAS_THREADS limits numpy/scipy/MNE's
+    # BLAS and OpenMP pools; MNE_N_JOBS is the number of jobs of MNE's filters
+    TF_INTER_OP_THREADS: int = 0
+    TF_INTRA_OP_THREADS: int = 0
+    BLAS_THREADS: int = 0
+    MNE_N_JOBS: int = 1
+
+    # EEG uploads are streamed to a private temporary directory (defaults to
+    # the system temp directory) in chunks. Request bodies past MAX_UPLOAD_MB
+    # are rejected from their Content-Length, or while they are received
+    UPLOAD_DIR: str = ""
+    MAX_UPLOAD_MB: int = 200
+    UPLOAD_CHUNK_KB: int = 1024
+
+    # Where uploads for asynchronous assessment jobs wait for a worker
+    # (defaults to a folder in the system temp directory)
+    JOB_STORAGE_DIR: str = ""
+
+    # On-disk cache of preprocessed spectrograms keyed by the uploaded file's
+    # hash (defaults to a folder in the system temp directory, 0 MB disables it)
+    SPECTROGRAM_CACHE_DIR: str = ""
+    SPECTROGRAM_CACHE_MAX_MB: int = 512
+
+    # Recordings of at least EDF_MEMMAP_MINUTES (0 disables it) are read into
+    # a memory-mapped file in EDF_MEMMAP_DIR (defaults to the system temp
+    # directory) instead of RAM, and referenced, filtered and cleaned in place
+    EDF_MEMMAP_MINUTES: float = 60
+    EDF_MEMMAP_DIR: str = ""
+
+    # Default preprocessing profile, "full" or "fast" (reuses the ICA fitted
+    # on an earlier recording of the same subject and device, stored in
+    # ICA_CACHE_DIR which defaults to a folder in the system temp directory)
+    PREPROCESSING_PROFILE: str = "full"
+    ICA_CACHE_DIR: str = ""
+
+    # Comma-separated emails of users allowed to use admin endpoints
+    ADMIN_EMAILS: str = ""
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,21 +1,42 @@
-from fastapi import FastAPI, status, HTTPException
+from fastapi import FastAPI, Request, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import time
 from .routers import auth, users, phq9_prediction
 from .database import engine
-from . import models
+from .ml.executor import get_executor
+from .uploads import UploadLimitMiddleware
+from . import models, metrics
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up the model in the background; /api/health reports when it is done
+    warm_up = asyncio.create_task(get_executor().warm_up())
+    yield
+    # Stop the inference workers with the web process
+    warm_up.cancel()
+    get_executor().shutdown()
+
 app = FastAPI(
     title="Depression Detection API",
     description="API for depression detection using EEG data and PHQ-9 assessment",
     version="1.0.0",
     docs_url="/api/docs",   
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
+)
+
+# Reject oversized EEG uploads while they are received, inside CORS so browsers see the 413
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=["/api/assessment/submit-assessment", "/api/assessment/jobs"]
 )
 
 # CORS configuration
@@ -27,6 +48,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe the latency of every request, labelled by route template rather than raw path"""
+    start = time.perf_counter()
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=metrics.route_label(request.scope),
+            status=status_code
+        )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -55,9 +93,28 @@ async def api_root():
 @app.get("/api/health", tags=["Health Check"])
 async def health_check():
     """
-    Health check endpoint
+    Health check endpoint, healthy once the model is loaded and warmed up
+    """
+    if not get_executor().ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting", "model_ready": False}
+        )
+    return {"status": "healthy", "model_ready": True}
+
+@app.get("/api/inference-stats", tags=["Health Check"])
+async def inference_stats():
+    """
+    Queue depth and per-stage timings of the EEG inference workers
+    """
+    return get_executor().snapshot()
+
+@app.get("/api/metrics", tags=["Health Check"])
+async def prometheus_metrics():
+    """
+    Request latencies, pipeline stage durations and inference queue metrics in Prometheus text format
     """
-    return {"status": "healthy"}
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 # Mount static files - do this separately for each type
 # Mount CSS files
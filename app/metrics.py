@@ -0,0 +1,201 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets in seconds, from fast API calls up to a full EEG assessment
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, list(zip(self.labelnames, key)), value) for key, value in items]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. cache hits"""
+    type_name = "counter"
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. queue depth"""
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value=1, **labels):
+        self.inc(-value, **labels)
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. request latencies, in cumulative buckets"""
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, {"buckets": list(entry["buckets"]), "sum": entry["sum"], "count": entry["count"]})
+                           for key, entry in self._values.items())
+        samples = []
+        for key, entry in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels + [("le", _format_value(bound))], cumulative))
+            samples.append((f"{self.name}_sum", labels, entry["sum"]))
+            samples.append((f"{self.name}_count", labels, entry["count"]))
+        return samples
+
+class MetricsRegistry:
+    """The metrics of this process, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def route_label(scope):
+    """
+    Label of the route that handled a request, e.g. /api/assessment/jobs/{job_id}.
+
+    Path parameter values are replaced by their names, so every route is one label
+    however many ids it sees. Static file mounts are labelled with their mount path.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    if not hasattr(route, "endpoint"):
+        return route.path
+    path = scope["path"]
+    # Replace values from the right so a value repeated in the prefix is left alone
+    for name, value in scope.get("path_params", {}).items():
+        value = str(value)
+        index = path.rfind(value)
+        if value and index >= 0:
+            path = path[:index] + "{" + name + "}" + path[index + len(value):]
+    return path
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route template",
+    ["method", "route", "status"]
+)
+pipeline_stage_duration = registry.histogram(
+    "eeg_pipeline_stage_seconds",
+    "Duration of each EEG pipeline stage, measured in the inference workers",
+    ["stage"]
+)
+pipeline_events = registry.counter(
+    "eeg_pipeline_events_total",
+    "EEG pipeline events such as cache hits and misses",
+    ["event"]
+)
+inference_jobs = registry.counter(
+    "eeg_inference_jobs_total",
+    "EEG predictions by outcome (completed, failed, rejected)",
+    ["outcome"]
+)
+inference_in_flight = registry.gauge(
+    "eeg_inference_in_flight",
+    "EEG predictions running or waiting for a worker"
+)
+inference_ready = registry.gauge(
+    "eeg_inference_ready",
+    "1 once the inference workers have loaded and warmed up the model"
+)
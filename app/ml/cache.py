@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = ".npz"
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file's bytes, read in chunks so large recordings aren't loaded at once.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SpectrogramCache:
+    """
+    On-disk LRU cache of final spectrogram tensors keyed by recording hash and pipeline fingerprint.
+
+    Entries are compressed .npz files; reading an entry refreshes its modification time, and the
+    least recently used entries are evicted once the directory grows past max_bytes. The cache is
+    safe to share between worker processes.
+
+    Args:
+        directory: Folder holding the cache entries
+        max_bytes: Size limit of the cache, 0 disables caching
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, file_hash, fingerprint):
+        return hashlib.sha256(f"{file_hash}:{fingerprint}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """Return the cached spectrograms for key, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        import numpy as np
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                spectrograms = entry["spectrograms"]
+            os.utime(path)
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+        return spectrograms
+
+    def put(self, key, spectrograms):
+        if not self.enabled:
+            return
+
+        import numpy as np
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary name first so other workers never read a partial entry
+        temp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez_compressed(f, spectrograms=spectrograms)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.error(f"Could not write spectrogram cache entry: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def purge(self):
+        """Remove every entry, returning how many were deleted"""
+        removed = 0
+        for _, _, name in self._entries():
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def spectrograms(self):
+        """
+        Yield the spectrograms of every entry, most recently used first.
+
+        Entries are not refreshed, so reading them doesn't change what is evicted next.
+        """
+        import numpy as np
+        for _, _, name in sorted(self._entries(), reverse=True):
+            try:
+                with np.load(os.path.join(self.directory, name)) as entry:
+                    yield entry["spectrograms"]
+            except (FileNotFoundError, KeyError, ValueError, OSError):
+                continue
+
+    def usage(self):
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+class IcaCache:
+    """
+    On-disk store of fitted ICA decompositions, shared between worker processes.
+    
+    Entries are MNE .fif files of a few kilobytes each, one per subject and device.
+    
+    Args:
+        directory: Folder holding the fitted ICAs
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        # MNE expects ICA files to end in -ica.fif
+        return os.path.join(self.directory, f"{key}-ica.fif")
+
+    def get(self, key):
+        """Return the fitted ICA for key, or None on a miss"""
+        import mne
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return mne.preprocessing.read_ica(path, verbose="error")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read cached ICA {path}: {str(e)}")
+            return None
+
+    def put(self, key, ica):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}-ica.fif")
+        try:
+            ica.save(temp_path, overwrite=True, verbose="error")
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.error(f"Could not write cached ICA: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+_cache = None
+_ica_cache = None
+
+def get_spectrogram_cache():
+    """Return the process-wide spectrogram cache configured from settings"""
+    global _cache
+    if _cache is None:
+        directory = settings.SPECTROGRAM_CACHE_DIR or os.path.join(tempfile.gettempdir(), "eeg-spectrogram-cache")
+        _cache = SpectrogramCache(directory, settings.SPECTROGRAM_CACHE_MAX_MB * 1024 * 1024)
+    return _cache
+
+def get_ica_cache():
+    """Return the process-wide ICA cache configured from settings"""
+    global _ica_cache
+    if _ica_cache is None:
+        _ica_cache = IcaCache(settings.ICA_CACHE_DIR or os.path.join(tempfile.gettempdir(), "eeg-ica-cache"))
+    return _ica_cache
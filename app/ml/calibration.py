@@ -0,0 +1,90 @@
+"""
+Collect the calibration set for int8 quantization of the model.
+
+Spectrograms are taken from the spectrogram cache, which holds the output of
+process_for_prediction for recent uploads, and from EEG recordings run through
+process_for_prediction. Both are reshaped with model_inputs exactly as predict_api
+does; spectrograms that still don't match the model's input shape are skipped and
+reported. When more segments are found than needed, an even random sample is kept,
+so every recording contributes rather than only the first few.
+
+The result is an .npz archive to pass to python -m app.ml.export --quantize int8 --calibration.
+
+Usage:
+    python -m app.ml.calibration --output calibration.npz [--no-cache] [--recordings a.edf b.edf]
+                                 [--max-samples 500] [--profile full]
+"""
+import argparse
+import logging
+import numpy as np
+from .model import MODEL_INPUT_SHAPE, model_inputs
+
+logger = logging.getLogger(__name__)
+
+def collect_calibration(recordings=(), cache=None, max_samples=500, profile="full", seed=0):
+    """
+    Gather model inputs to calibrate int8 quantization on.
+
+    Args:
+        recordings: Paths of .edf files to run through process_for_prediction
+        cache: SpectrogramCache to read entries from, or None to skip the cache
+        max_samples: Number of segments to keep at most
+        profile: Preprocessing profile used for the recordings
+        seed: Seed of the random sample taken when more segments are found
+
+    Returns:
+        np.ndarray: float32 array of shape (n, 33, 45, 1)
+
+    Raises:
+        ValueError: If nothing of the model's input shape was found
+    """
+    arrays = []
+    skipped = {}
+
+    def add(spectrograms, source):
+        spectrograms = model_inputs(np.asarray(spectrograms))
+        if spectrograms.shape[1:] != MODEL_INPUT_SHAPE:
+            skipped[spectrograms.shape[1:]] = skipped.get(spectrograms.shape[1:], 0) + len(spectrograms)
+            logger.warning(f"Skipping {len(spectrograms)} segments of shape {spectrograms.shape[1:]} from {source}")
+            return
+        arrays.append(spectrograms.astype(np.float32, copy=False))
+
+    if cache is not None:
+        for spectrograms in cache.spectrograms():
+            add(spectrograms, "the spectrogram cache")
+
+    if recordings:
+        from .preprocessing import process_for_prediction
+        for path in recordings:
+            add(process_for_prediction(path, profile=profile), path)
+
+    if not arrays:
+        found = ", ".join(f"{n} of shape {shape}" for shape, n in skipped.items()) or "none"
+        raise ValueError(f"No segments of the model input shape {MODEL_INPUT_SHAPE} to calibrate on (found {found})")
+
+    calibration = np.concatenate(arrays)
+    if len(calibration) > max_samples:
+        rows = np.random.default_rng(seed).choice(len(calibration), max_samples, replace=False)
+        calibration = calibration[np.sort(rows)]
+    logger.info(f"Collected {len(calibration)} calibration segments")
+    return calibration
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="Where to write the calibration set (.npz)")
+    parser.add_argument("--recordings", nargs="+", default=[], help="EDF recordings to preprocess")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read the spectrogram cache")
+    parser.add_argument("--max-samples", type=int, default=500, help="Number of segments to keep")
+    parser.add_argument("--profile", default="full", help="Preprocessing profile for --recordings")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from .cache import get_spectrogram_cache
+
+    cache = None if args.no_cache else get_spectrogram_cache()
+    calibration = collect_calibration(args.recordings, cache, args.max_samples, args.profile)
+    np.savez_compressed(args.output, model_inputs=calibration)
+    print(f"Wrote {len(calibration)} calibration segments to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from ..config import settings
+from .. import metrics
+from .stages import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Queue used by the worker to report stage progress back to the web process
+_progress_queue = None
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue cannot accept another job"""
+
+def _init_worker(progress_queue):
+    """
+    Worker initializer: load and warm up the model and scaler so jobs only pay for inference.
+    """
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    # Before numpy and TensorFlow load their thread pools
+    from .threads import configure_blas
+    configure_blas()
+    from .registry import registry
+    registry.warm_up()
+    logger.info("Inference worker ready")
+
+def _worker_ready():
+    from .registry import registry
+    return registry.is_ready()
+
+def _run_prediction(token, file_path, file_hash=None, profile="full", subject=None):
+    """
+    Run the full EEG pipeline for one file inside a worker.
+
+    Returns:
+        tuple: (prediction result, per-stage timings in seconds, event counters, wall-clock start time)
+    """
+    from .model import predict_api
+
+    started_at = time.time()
+
+    def report(stage_name):
+        _progress_queue.put((token, stage_name))
+
+    with StageTimer(on_stage=report) as timer:
+        result = predict_api(file_path, file_hash=file_hash, profile=profile, subject=subject)
+    return result, timer.timings, timer.counters, started_at
+
+class InferenceStats:
+    """Counters and per-stage timing totals used to size the worker pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.stages = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": entry["count"],
+                    "total_seconds": round(entry["total_seconds"], 4),
+                    "mean_seconds": round(entry["total_seconds"] / entry["count"], 4),
+                    "max_seconds": round(entry["max_seconds"], 4),
+                }
+                for name, entry in self.stages.items()
+            }
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "stages": stages,
+                "counters": dict(self.counters),
+            }
+
+class InferenceExecutor:
+    """
+    Runs EEG predictions off the event loop on a bounded pool of preloaded workers.
+
+    Args:
+        max_workers: Number of worker processes, or 0 to use background threads
+        max_queue: Number of jobs allowed to wait for a free worker
+        threads: Number of background threads when max_workers is 0. Their model
+            calls share forward passes through the micro-batcher
+    """
+
+    def __init__(self, max_workers, max_queue, threads=1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.threads = max(threads, 1)
+        self.stats = InferenceStats()
+        self._pool = None
+        self._progress = None
+        self._listener = None
+        self._callbacks = {}
+        self._recovery = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.ready = False
+
+    @property
+    def capacity(self):
+        return self.max_workers if self.max_workers > 0 else self.threads
+
+    def start(self):
+        with self._lock:
+            if self._pool is not None:
+                return
+
+            if self.max_workers > 0:
+                # TensorFlow is not fork-safe, so workers always start from a clean interpreter
+                context = multiprocessing.get_context("spawn")
+                self._progress = context.Queue()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._progress,)
+                )
+            else:
+                self._progress = queue.Queue()
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.threads,
+                    thread_name_prefix="inference",
+                    initializer=_init_worker,
+                    initargs=(self._progress,)
+                )
+
+            self._listener = threading.Thread(target=self._dispatch_progress, name="inference-progress", daemon=True)
+            self._listener.start()
+            logger.info(f"Started inference executor with {self.max_workers} worker(s)")
+
+    async def warm_up(self):
+        """
+        Start every worker and wait until each has loaded and warmed up the model.
+        """
+        self.start()
+        try:
+            futures = [asyncio.wrap_future(self._pool.submit(_worker_ready)) for _ in range(self.capacity)]
+            self.ready = all(await asyncio.gather(*futures))
+        except Exception as e:
+            logger.error(f"Inference worker warm-up failed: {str(e)}")
+            self.ready = False
+        metrics.inference_ready.set(1 if self.ready else 0)
+        if self.ready:
+            logger.info("Inference workers are ready")
+        return self.ready
+
+    def shutdown(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._progress.put(None)
+        self.ready = False
+        metrics.inference_ready.set(0)
+        self._pool = None
+        self._progress = None
+        self._listener = None
+
+    def _replace_broken(self, pool):
+        """
+        Drop a pool that lost a worker (killed, e.g. out of memory on a long recording) and
+        start warming up a new one. Until it is ready the health check reports the workers
+        as starting, and jobs submitted meanwhile start the new pool themselves.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            logger.error("An inference worker died, replacing the worker pool")
+            self._close()
+        self._recovery = asyncio.ensure_future(self.warm_up())
+
+    def is_full(self):
+        return self._pending >= self.capacity + self.max_queue
+
+    def queue_depth(self):
+        """Number of submitted jobs still waiting for a worker"""
+        return max(self._pending - self.capacity, 0)
+
+    def reserve(self):
+        """
+        Take a slot for a job that is submitted later with reserved=True, so a job
+        accepted while the queue has room keeps its place until it is submitted.
+        Give the slot back with release() if the job is never submitted.
+
+        Raises:
+            QueueFullError: If every worker is busy and the queue is full
+        """
+        with self._lock:
+            if self.is_full():
+                self.stats.rejected += 1
+                metrics.inference_jobs.inc(outcome="rejected")
+                raise QueueFullError("Inference queue is full, please try again later")
+            self._pending += 1
+            metrics.inference_in_flight.inc()
+
+    def release(self):
+        """Give back a slot taken by reserve() or submit()"""
+        with self._lock:
+            self._pending -= 1
+        metrics.inference_in_flight.dec()
+
+    async def submit(self, file_path, on_stage=None, file_hash=None, profile="full", subject=None, reserved=False):
+        """
+        Queue a prediction for file_path and wait for its result without blocking the event loop.
+
+        Args:
+            file_path: Path to the .edf file
+            on_stage: Optional callable invoked with each stage name as the worker starts it
+            file_hash: SHA-256 of the file if already known, saves the worker re-reading it
+            profile: Preprocessing profile, "full" or "fast"
+            subject: Identifier of the person recorded, lets the fast profile reuse their ICA
+            reserved: Whether the job already holds a slot taken with reserve()
+
+        Returns:
+            dict: The predict_api result
+
+        Raises:
+            QueueFullError: If every worker is busy and the queue is full (never with reserved)
+        """
+        if not reserved:
+            self.reserve()
+        with self._lock:
+            self.stats.submitted += 1
+
+        token = uuid.uuid4().hex
+        if on_stage is not None:
+            self._callbacks[token] = on_stage
+
+        submitted_at = time.time()
+        pool = None
+        try:
+            self.start()
+            pool = self._pool
+            future = pool.submit(_run_prediction, token, file_path, file_hash, profile, subject)
+            result, timings, counters, started_at = await asyncio.wrap_future(future)
+        except Exception as e:
+            self.stats.failed += 1
+            metrics.inference_jobs.inc(outcome="failed")
+            if isinstance(e, BrokenExecutor):
+                self._replace_broken(pool)
+            raise
+        finally:
+            self._callbacks.pop(token, None)
+            self.release()
+
+        self.stats.completed += 1
+        metrics.inference_jobs.inc(outcome="completed")
+        timings = {"queue_wait": max(started_at - submitted_at, 0.0), **timings}
+        for name, seconds in timings.items():
+            self.stats.observe(name, seconds)
+            metrics.pipeline_stage_duration.observe(seconds, stage=name)
+        for name, value in counters.items():
+            self.stats.increment(name, value)
+            metrics.pipeline_events.inc(value, event=name)
+        return result
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        stats.update({
+            "ready": self.ready,
+            "workers": self.max_workers,
+            "threads": self.threads if self.max_workers == 0 else 0,
+            "max_queue": self.max_queue,
+            "in_flight": self._pending,
+            "queue_depth": self.queue_depth(),
+        })
+        return stats
+
+    def _dispatch_progress(self):
+        progress = self._progress
+        while True:
+            message = progress.get()
+            if message is None:
+                break
+            token, stage_name = message
+            callback = self._callbacks.get(token)
+            if callback is None:
+                continue
+            try:
+                callback(stage_name)
+            except Exception as e:
+                logger.error(f"Progress callback failed: {str(e)}")
+
+_executor = None
+
+def get_executor():
+    """Return the process-wide inference executor, creating it from settings on first use"""
+    global _executor
+    if _executor is None:
+        _executor = InferenceExecutor(settings.INFERENCE_WORKERS, settings.INFERENCE_MAX_QUEUE, settings.INFERENCE_THREADS)
+    return _executor
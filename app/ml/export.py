@@ -0,0 +1,146 @@
+"""
+Export the model to a TFLite flatbuffer for MODEL_BACKEND=tflite.
+
+The model is the one the keras backend serves (model.h5, or the fallback model).
+It can be exported as float32, with float16 weights (half the size, same float32
+arithmetic on CPU) or fully quantized to int8. int8 needs a calibration set of
+spectrograms of the model's input shape (n, 33, 45, 1), as .npy files or .npz
+archives (every array of that shape is used); directories are searched for both.
+python -m app.ml.calibration collects such a set from the spectrogram cache or
+from recordings. int8 models are written to INT8_MODEL_PATH unless --output is
+given, and served with MODEL_PRECISION=int8.
+
+Usage:
+    python -m app.ml.export [--output app/ml/model.tflite] [--quantize none|float16|int8]
+                            [--calibration spectrograms.npz ...] [--calibration-samples 500]
+"""
+import argparse
+import logging
+import os
+import uuid
+import numpy as np
+from .model import MODEL_INPUT_SHAPE, tflite_model_path
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ["none", "float16", "int8"]
+
+def _calibration_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".npy", ".npz")):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+def load_calibration(paths, max_samples=500):
+    """
+    Collect calibration spectrograms from .npy/.npz files and directories.
+
+    Args:
+        paths: Files or directories to read
+        max_samples: Number of spectrograms to keep at most
+
+    Returns:
+        np.ndarray: float32 array of shape (n, 33, 45, 1)
+
+    Raises:
+        ValueError: If no array of the model's input shape is found
+    """
+    arrays = []
+    total = 0
+    for path in _calibration_files(paths):
+        if path.endswith(".npz"):
+            with np.load(path) as archive:
+                candidates = [archive[name] for name in archive.files]
+        else:
+            candidates = [np.load(path)]
+        for array in candidates:
+            if array.ndim != len(MODEL_INPUT_SHAPE) + 1 or array.shape[1:] != MODEL_INPUT_SHAPE:
+                logger.warning(f"Skipping calibration array of shape {array.shape} in {path}")
+                continue
+            arrays.append(array.astype(np.float32, copy=False))
+            total += len(array)
+        if total >= max_samples:
+            break
+
+    if not total:
+        raise ValueError(f"No calibration spectrograms of shape (n, {', '.join(map(str, MODEL_INPUT_SHAPE))}) found")
+    return np.concatenate(arrays)[:max_samples]
+
+def export_tflite(model, output_path, quantize="none", calibration=None):
+    """
+    Convert a Keras model to a TFLite flatbuffer.
+
+    Args:
+        model: The Keras model
+        output_path: Where to write the .tflite file
+        quantize: "none", "float16" or "int8"
+        calibration: Spectrograms of shape (n, 33, 45, 1), required for int8
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    import tensorflow as tf
+
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantize!r}, expected one of {', '.join(QUANTIZATIONS)}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        if calibration is None or len(calibration) == 0:
+            raise ValueError("int8 quantization needs calibration spectrograms")
+        calibration = np.asarray(calibration, dtype=np.float32)
+
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    flatbuffer = converter.convert()
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temporary name first so running workers never load a partial model
+    temp_path = os.path.join(directory, f".{os.path.basename(output_path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(flatbuffer)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return len(flatbuffer)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=None, help="Where to write the model (defaults to TFLITE_MODEL_PATH, "
+                                                       "or INT8_MODEL_PATH for int8)")
+    parser.add_argument("--quantize", choices=QUANTIZATIONS, default="none", help="Weight/activation quantization")
+    parser.add_argument("--calibration", nargs="+", default=[], help="Calibration .npy/.npz files or directories for int8")
+    parser.add_argument("--calibration-samples", type=int, default=500, help="Number of calibration spectrograms to use")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from .registry import registry
+
+    calibration = None
+    if args.quantize == "int8":
+        if not args.calibration:
+            parser.error("--quantize int8 needs --calibration")
+        calibration = load_calibration(args.calibration, args.calibration_samples)
+
+    output_path = args.output or tflite_model_path("int8" if args.quantize == "int8" else "float")
+    size = export_tflite(registry.get_model(), output_path, args.quantize, calibration)
+    print(f"Wrote {output_path} ({size / 1024:.1f} KB, quantization {args.quantize})")
+
+if __name__ == "__main__":
+    main()
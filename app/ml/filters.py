@@ -0,0 +1,212 @@
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import mne
+import numpy as np
+from scipy import fft
+
+logger = logging.getLogger(__name__)
+
+# Annotations across which MNE filters each part of a recording separately
+SKIP_ANNOTATIONS = ("edge", "bad_acq_skip")
+
+@functools.lru_cache(maxsize=32)
+def fir_kernel(sfreq, l_freq, h_freq, l_trans_bandwidth="auto", h_trans_bandwidth="auto"):
+    """
+    MNE's default FIR filter (firwin design, Hamming window, zero phase) for a band.
+
+    Designing it is independent of the recording, so each kernel is designed once per
+    process and sampling rate and shared, read-only, by every request.
+
+    Args:
+        sfreq: Sampling rate in Hz
+        l_freq: Lower pass-band edge, None for a low-pass filter
+        h_freq: Upper pass-band edge, None for a high-pass filter. Below l_freq the
+            filter is a band-stop
+        l_trans_bandwidth: Width of the lower transition band, "auto" as in MNE
+        h_trans_bandwidth: Width of the upper transition band, "auto" as in MNE
+
+    Returns:
+        np.ndarray: The odd-length, linear-phase kernel
+    """
+    kernel = mne.filter.create_filter(
+        None, sfreq, l_freq, h_freq,
+        l_trans_bandwidth=l_trans_bandwidth, h_trans_bandwidth=h_trans_bandwidth,
+        fir_design="firwin", verbose="error"
+    )
+    kernel.flags.writeable = False
+    return kernel
+
+def notch_design(freq, trans_bandwidth=1.0):
+    """fir_kernel arguments of MNE's default FIR notch at freq (width freq / 200), a band-stop"""
+    half_width = freq / 200.0 / 2.0 + trans_bandwidth / 2.0
+    return freq + half_width, freq - half_width, trans_bandwidth / 2.0, trans_bandwidth / 2.0
+
+def notch_kernel(sfreq, freq, trans_bandwidth=1.0):
+    """MNE's default FIR notch at freq, as a band-stop kernel"""
+    return fir_kernel(sfreq, *notch_design(freq, trans_bandwidth))
+
+def _pad_length(n_times, n_h):
+    return max(min(n_h, n_times) - 1, 0)
+
+def fft_length(n_times, n_h):
+    """FFT size that holds the full convolution of a padded channel with the kernel"""
+    return fft.next_fast_len(n_times + 2 * _pad_length(n_times, n_h) + n_h - 1, real=True)
+
+def kernel_spectrum(n_times, sfreq, *design):
+    """
+    rfft of fir_kernel(sfreq, *design) for filtering channels of n_times samples.
+
+    Computed once per filter and shared by all the channels. It isn't cached across
+    requests: uploads rarely share a length, and the spectrum of an hour-long channel
+    takes several MB.
+    """
+    kernel = fir_kernel(sfreq, *design)
+    return fft.rfft(kernel, fft_length(n_times, len(kernel)))
+
+def fir_filter(x, kernel, kernel_fft=None):
+    """
+    Zero-phase filter one channel with an FIR kernel.
+
+    Gives the result of MNE's overlap-add filter (same edge padding) with a single
+    FFT of the whole channel instead of a Python loop over blocks.
+
+    Args:
+        x: 1D signal
+        kernel: Odd-length linear-phase kernel from fir_kernel
+        kernel_fft: rfft of the kernel at fft_length(len(x), len(kernel)), computed
+            here if not given; pass it to share it between channels
+    """
+    n_h = len(kernel)
+    n_edge = _pad_length(len(x), n_h)
+    if n_edge:
+        # MNE's "reflect_limited" padding: odd reflection about the edge samples
+        zeros = np.zeros(max(n_edge - len(x) + 1, 0), dtype=x.dtype)
+        x_ext = np.concatenate([zeros, 2 * x[:1] - x[n_edge:0:-1], x, 2 * x[-1:] - x[-2:-n_edge - 2:-1], zeros])
+    else:
+        x_ext = x
+    n_fft = fft_length(len(x), n_h)
+    if kernel_fft is None:
+        kernel_fft = fft.rfft(kernel, n_fft)
+    filtered = fft.irfft(fft.rfft(x_ext, n_fft) * kernel_fft, n_fft)
+    shift = (n_h - 1) // 2 + n_edge
+    return filtered[shift:shift + len(x)].astype(x.dtype, copy=False)
+
+def _threads(n_jobs):
+    """
+    Run MNE's n_jobs on joblib's threading backend (the FFTs release the GIL).
+
+    The default process backend would copy the recording into every job and leave
+    idle processes behind that keep inference workers from shutting down.
+    """
+    if n_jobs == 1:
+        return contextlib.nullcontext()
+    import joblib
+    return joblib.parallel_config(backend="threading")
+
+def _has_skip_annotations(data):
+    descriptions = [description.lower() for description in data.annotations.description]
+    return any(description.startswith(SKIP_ANNOTATIONS) for description in descriptions)
+
+def _data_channels(data):
+    # The channels Raw.filter and Raw.apply_function filter by default
+    data_types = set(data.get_channel_types(only_data_chs=True))
+    return [index for index, kind in enumerate(data.get_channel_types()) if kind in data_types]
+
+def _apply_kernel(data, design, n_jobs):
+    # Each channel is written back as soon as it is filtered, unlike Raw.apply_function
+    # with n_jobs, which holds every filtered channel in memory before writing them
+    # back (and so a copy of a memory-mapped recording in RAM)
+    sfreq = data.info["sfreq"]
+    kernel = fir_kernel(sfreq, *design)
+    kernel_fft = kernel_spectrum(data.n_times, sfreq, *design)
+
+    def filter_channel(index):
+        data._data[index] = fir_filter(data._data[index], kernel, kernel_fft)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        list(pool.map(filter_channel, _data_channels(data)))
+
+def filter_raw(data, l_freq, h_freq, n_jobs=1):
+    """
+    Band-, high- or low-pass filter every data channel of a preloaded Raw in place,
+    with the result of data.filter(l_freq, h_freq).
+
+    The kernel comes from fir_kernel, channels are filtered in place in parallel on
+    n_jobs threads, and info["highpass"] and info["lowpass"] are updated as Raw.filter does.
+    Recordings with edge or bad_acq_skip annotations are left to Raw.filter, which
+    filters each part separately.
+
+    Args:
+        data: Preloaded mne.io.Raw
+        l_freq: Lower pass-band edge, None for a low-pass filter
+        h_freq: Upper pass-band edge, None for a high-pass filter
+        n_jobs: Number of channels filtered at once
+
+    Returns:
+        mne.io.Raw: data, filtered
+    """
+    if _has_skip_annotations(data):
+        with _threads(n_jobs):
+            return data.filter(l_freq=l_freq, h_freq=h_freq, n_jobs=n_jobs)
+
+    _apply_kernel(data, (l_freq, h_freq), n_jobs)
+    _update_band(data.info, l_freq, h_freq)
+    return data
+
+def _update_band(info, l_freq, h_freq):
+    # Same rule as Raw.filter: a pass band narrows the recorded band, a stop band doesn't
+    pass_band = l_freq is None or h_freq is None or l_freq < h_freq
+    with info._unlock():
+        if pass_band and h_freq is not None and (info["lowpass"] is None or h_freq < info["lowpass"]):
+            info["lowpass"] = float(h_freq)
+        if pass_band and l_freq is not None and (info["highpass"] is None or l_freq > info["highpass"]):
+            info["highpass"] = float(l_freq)
+
+def decimated_filter(data, l_freq, h_freq, decim, n_jobs=1):
+    """
+    Every decim-th sample of data.filter(l_freq, h_freq), for fitting ICA.
+
+    Each channel is filtered at full rate and only every decim-th sample is kept, so
+    the result is what ICA.fit(filtered, decim=decim) would see, without a filtered
+    copy of the whole recording. The time axis is not resampled (no anti-aliasing),
+    as with ICA.fit's decim: the output is a set of samples, not a new recording.
+
+    Args:
+        data: Preloaded mne.io.Raw without skip annotations, left unchanged
+        l_freq: Lower pass-band edge, None for a low-pass filter
+        h_freq: Upper pass-band edge, None for a high-pass filter
+        decim: Keep every decim-th sample
+        n_jobs: Number of channels filtered at once
+
+    Returns:
+        mne.io.RawArray: The kept samples with the info of data, its band updated as
+        filter_raw updates it
+    """
+    design = (l_freq, h_freq)
+    sfreq = data.info["sfreq"]
+    kernel = fir_kernel(sfreq, *design)
+    kernel_fft = kernel_spectrum(data.n_times, sfreq, *design)
+    samples = np.empty((len(data.ch_names), len(range(0, data.n_times, decim))), dtype=data._data.dtype)
+
+    def filter_channel(index):
+        samples[index] = fir_filter(data._data[index], kernel, kernel_fft)[::decim]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        list(pool.map(filter_channel, range(len(samples))))
+    info = data.info.copy()
+    _update_band(info, l_freq, h_freq)
+    return mne.io.RawArray(samples, info, verbose="error")
+
+def notch_raw(data, freq, n_jobs=1):
+    """
+    Notch filter every data channel of a preloaded Raw in place, with the result of
+    data.notch_filter(freq). See filter_raw.
+    """
+    if _has_skip_annotations(data):
+        with _threads(n_jobs):
+            return data.notch_filter(freq, n_jobs=n_jobs)
+
+    _apply_kernel(data, notch_design(freq), n_jobs)
+    return data
@@ -1,18 +1,27 @@
 import numpy as np
+import contextlib
 import logging
-import tensorflow as tf
-from tensorflow import keras
+import math
+import queue
+import statistics
+import threading
+import time
 import os
+from ..config import settings
+from .stages import stage, count
+from .registry import registry
+from .segments import pack_segments
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize the model variable
-model = None
+# Input shape of a single spectrogram segment expected by the model
+MODEL_INPUT_SHAPE = (33, 45, 1)
 
 def create_custom_model():
     """Create a custom model that can handle the input without TimeDistributed issues"""
-    input_shape = (33, 45, 1)
+    from tensorflow import keras
+    input_shape = MODEL_INPUT_SHAPE
     
     model = keras.Sequential([
         # First Conv Block - use padding='same' to prevent dimension reduction
@@ -44,8 +53,12 @@ def create_custom_model():
     return model
 
 def load_model():
-    """Attempt to load the trained model from disk, or create a custom model if it fails"""
-    global model
+    """
+    Load the trained model from disk, or create a custom model if it fails.
+    
+    Use registry.get_model() instead of calling this directly so the model is only loaded once.
+    """
+    from tensorflow import keras
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         model_path = os.path.join(current_dir, "model.h5")
@@ -54,121 +67,549 @@ def load_model():
             try:
                 model = keras.models.load_model(model_path)
                 logger.info(f"Model loaded successfully from {model_path}")
+                return model
             except Exception as e:
                 logger.error(f"Failed to load model from {model_path}: {str(e)}")
                 logger.info("Falling back to custom model")
-                model = create_custom_model()
-        else:
-            # Try loading from model folder
-            model_dir_path = os.path.join(current_dir, "model")
-            if os.path.exists(model_dir_path):
-                try:
-                    model = keras.models.load_model(model_dir_path)
-                    logger.info(f"Model loaded successfully from directory {model_dir_path}")
-                except Exception as e:
-                    logger.error(f"Failed to load model from {model_dir_path}: {str(e)}")
-                    logger.info("Falling back to custom model")
-                    model = create_custom_model()
-            else:
-                logger.warning(f"Model not found at {model_path} or {model_dir_path}")
-                logger.info("Creating custom model")
-                model = create_custom_model()
+                return create_custom_model()
+        
+        # Try loading from model folder
+        model_dir_path = os.path.join(current_dir, "model")
+        if os.path.exists(model_dir_path):
+            try:
+                model = keras.models.load_model(model_dir_path)
+                logger.info(f"Model loaded successfully from directory {model_dir_path}")
+                return model
+            except Exception as e:
+                logger.error(f"Failed to load model from {model_dir_path}: {str(e)}")
+                logger.info("Falling back to custom model")
+                return create_custom_model()
+        
+        logger.warning(f"Model not found at {model_path} or {model_dir_path}")
+        logger.info("Creating custom model")
+        return create_custom_model()
     except Exception as e:
         logger.error(f"Error in load_model: {str(e)}")
         logger.info("Creating custom model as fallback")
-        model = create_custom_model()
+        return create_custom_model()
 
-# Try to load the model when the module is imported
-try:
-    load_model()
-except Exception as e:
-    logger.error(f"Model initialization failed: {str(e)}")
-    model = None  # Will be created on first prediction
+# Batch sizes the forward pass is run at; inputs are zero-padded up to the
+# nearest one and larger inputs are split into chunks of the largest
+PREDICT_BUCKETS = (8, 16, 32, 64, 128, 256)
 
-def predict_api(file_path: str) -> dict:
+class _BucketedModel:
     """
-    Process EEG file and return prediction with detailed analysis
+    Base of the model backends: pads inputs to a few fixed batch sizes and runs
+    _forward on each padded chunk.
+    """
+
+    def __init__(self, buckets=PREDICT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+
+    def _bucket(self, size):
+        for bucket in self.buckets:
+            if size <= bucket:
+                return bucket
+        return self.buckets[-1]
+
+    def _forward(self, batch):
+        raise NotImplementedError
+
+    def predict(self, inputs):
+        """Return the model's output for inputs of shape (n, 33, 45, 1) as a numpy array"""
+        inputs = np.asarray(inputs, dtype=np.float32)
+        if inputs.shape[1:] != MODEL_INPUT_SHAPE:
+            raise ValueError(f"Expected model input of shape (None, {', '.join(map(str, MODEL_INPUT_SHAPE))}), got {inputs.shape}")
+        
+        if len(inputs) == 0:
+            return self._forward(inputs)
+        
+        outputs = []
+        for start in range(0, len(inputs), self.buckets[-1]):
+            chunk = inputs[start:start + self.buckets[-1]]
+            size = len(chunk)
+            bucket = self._bucket(size)
+            if bucket > size:
+                padded = np.zeros((bucket, *MODEL_INPUT_SHAPE), dtype=np.float32)
+                padded[:size] = chunk
+                chunk = padded
+            outputs.append(self._forward(chunk)[:size])
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+class CompiledModel(_BucketedModel):
+    """
+    Direct forward pass of a Keras model, replacing model.predict.
+    
+    model.predict builds a tf.data pipeline and progress bar on every call, which costs
+    more than the forward pass itself for a few hundred segments. Here the model is
+    called inside a tf.function with the fixed input signature (None, 33, 45, 1), so it is
+    traced once, and batches are padded to a few bucket sizes so the kernels only ever
+    see those shapes.
+    
+    Args:
+        model: The Keras model
+        buckets: Batch sizes to pad inputs to
+    """
+
+    def __init__(self, model, buckets=PREDICT_BUCKETS):
+        import tensorflow as tf
+        super().__init__(buckets)
+        self.model = model
+        self._function = tf.function(
+            lambda inputs: model(inputs, training=False),
+            input_signature=[tf.TensorSpec((None, *MODEL_INPUT_SHAPE), tf.float32)]
+        )
+
+    def _forward(self, batch):
+        return self._function(batch).numpy()
+
+# Model precisions served by the registry (MODEL_PRECISION)
+MODEL_PRECISIONS = ["float", "int8"]
+
+def tflite_model_path(precision="float"):
+    """
+    Path of the exported TFLite model for a precision.
+    
+    float: TFLITE_MODEL_PATH, or model.tflite next to model.h5
+    int8: INT8_MODEL_PATH, or model-int8.tflite next to model.h5
     """
+    if precision not in MODEL_PRECISIONS:
+        raise ValueError(f"Unknown model precision {precision!r}, expected one of {', '.join(MODEL_PRECISIONS)}")
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if precision == "int8":
+        return settings.INT8_MODEL_PATH or os.path.join(current_dir, "model-int8.tflite")
+    return settings.TFLITE_MODEL_PATH or os.path.join(current_dir, "model.tflite")
+
+def _load_interpreter():
+    """Return the Interpreter class of the lightest TFLite runtime installed"""
     try:
-        global model
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            # Full TensorFlow ships the same interpreter
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+def _quantize(values, details):
+    scale, zero_point = details["quantization"]
+    if not scale:
+        return values.astype(details["dtype"], copy=False)
+    limits = np.iinfo(details["dtype"])
+    return np.clip(np.round(values / scale) + zero_point, limits.min, limits.max).astype(details["dtype"])
+
+def _dequantize(values, details):
+    scale, zero_point = details["quantization"]
+    if not scale:
+        return values.astype(np.float32, copy=False)
+    return (values.astype(np.float32) - zero_point) * scale
+
+class TFLiteModel(_BucketedModel):
+    """
+    Forward pass of a TFLite flatbuffer written by python -m app.ml.export.
+    
+    Runs on the standalone TFLite runtime (ai-edge-litert or tflite-runtime) when one
+    is installed, so the process never imports TensorFlow, and on TensorFlow's own
+    interpreter otherwise. Inputs and outputs of int8 models are quantized with the
+    model's scale and zero point, so callers always pass and get float32. The
+    interpreter is resized only when the bucket size changes.
+    
+    Args:
+        model_path: Path to the .tflite file
+        buckets: Batch sizes to pad inputs to
+        num_threads: Threads of the interpreter, None for its default
+    """
+
+    def __init__(self, model_path, buckets=PREDICT_BUCKETS, num_threads=None):
+        super().__init__(buckets)
+        self.model_path = model_path
+        self._interpreter = _load_interpreter()(model_path=model_path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        # One interpreter holds one set of tensors, so calls can't overlap
+        self._lock = threading.Lock()
+
+    def _forward(self, batch):
+        if len(batch) == 0:
+            return np.zeros((0, *self._output["shape_signature"][1:]), dtype=np.float32)
         
-        # Ensure model is loaded/created
-        if model is None:
-            load_model()
-            if model is None:
-                logger.warning("Model still None after load attempt, creating custom model")
-                model = create_custom_model()
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input["index"], _quantize(batch, self._input))
+            self._interpreter.invoke()
+            return _dequantize(self._interpreter.get_tensor(self._output["index"]), self._output)
+
+class _BatchRequest:
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.shared = False
+    
+    def wait(self):
+        """Block until the batcher has run the request, and return its rows of the output"""
+        self.done.wait()
+        if self.shared:
+            count("model_batched_requests")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class MicroBatcher:
+    """
+    Runs the model on segments from several concurrent assessments in one forward pass.
+    
+    Callers block in predict() (or submit() and later wait()) while a background thread collects requests for up to
+    max_wait seconds (or until max_batch_size segments are waiting), concatenates
+    requests with the same segment shape, runs predict_fn once per shape and hands
+    each caller back its own rows. Requests already queued are always batched
+    together, so max_wait=0 batches without adding latency. Only the batching thread
+    calls predict_fn, which also keeps the model off concurrent threads.
+    
+    Args:
+        predict_fn: Callable mapping an input batch to an output batch
+        max_wait: Seconds to wait for more requests after the first one arrives
+        max_batch_size: Number of segments that triggers a forward pass straight away
+    """
+
+    def __init__(self, predict_fn, max_wait=0.005, max_batch_size=512):
+        self._predict = predict_fn
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, inputs):
+        """
+        Queue inputs without waiting for the model; the returned request's wait() gives
+        predict_fn(inputs). Lets a caller prepare its next inputs while these run.
+        """
+        request = _BatchRequest(np.asarray(inputs))
+        if len(request.inputs) == 0:
+            try:
+                request.result = self._predict(request.inputs)
+            except Exception as e:
+                request.error = e
+            request.done.set()
+            return request
         
-        # Get preprocessed spectrograms
-        from .preprocessing import process_for_prediction
-        spectrograms = process_for_prediction(file_path)
-        logger.info(f"Processing file: {file_path}")
-        logger.info(f"Original input shape: {spectrograms.shape}")
-        
-        # Reshape specifically to handle the TimeDistributed error
-        # From the error, we see the TimeDistributed layer is trying to apply a 3x3 convolution
-        # on input with shape [32, 45, 1, 1], but we need at least size 3 in two dimensions
-        if len(spectrograms.shape) == 5 and spectrograms.shape[1:] == (33, 45, 1, 1):
-            # Reshape to remove the extra dimension
-            spectrograms = spectrograms.reshape(spectrograms.shape[0], 33, 45, 1)
-            logger.info(f"Reshaped to: {spectrograms.shape}")
-        elif len(spectrograms.shape) == 5:
-            # Handle other 5D tensors by taking the first element of dimension 1
-            spectrograms = spectrograms[:, 0, :, :, :]
-            logger.info(f"Extracted feature to shape: {spectrograms.shape}")
+        self._start()
+        self._queue.put(request)
+        return request
+
+    def predict(self, inputs):
+        """Return predict_fn(inputs), computed in a batch shared with other callers"""
+        return self.submit(inputs).wait()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="model-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0].inputs)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.inputs)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
             
-        # Make predictions using the model
-        logger.info(f"Making prediction with model input shape: {spectrograms.shape}")
-        raw_predictions = model.predict(spectrograms)
-        logger.info(f"Made predictions successfully. Shape: {raw_predictions.shape}")
-        
-        # Process each segment's prediction
-        detailed_segments = []
-        healthy_count = 0
-        mdd_count = 0
+            # Segments of different shapes can't share a forward pass
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.inputs.shape[1:], request.inputs.dtype), []).append(request)
+            
+            for requests in groups.values():
+                try:
+                    if len(requests) == 1:
+                        outputs = self._predict(requests[0].inputs)
+                    else:
+                        outputs = self._predict(np.concatenate([request.inputs for request in requests]))
+                    offset = 0
+                    for request in requests:
+                        request.result = outputs[offset:offset + len(request.inputs)]
+                        request.shared = len(requests) > 1
+                        offset += len(request.inputs)
+                except Exception as e:
+                    for request in requests:
+                        request.error = e
+                finally:
+                    for request in requests:
+                        request.done.set()
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def _batch_max_wait():
+    """
+    Seconds the micro-batcher waits for other assessments' segments. Only the inference
+    threads of one process (INFERENCE_WORKERS=0 with INFERENCE_THREADS above 1) run
+    assessments side by side; a worker process runs one at a time, so its batches
+    don't wait for segments that can't arrive.
+    """
+    if settings.INFERENCE_WORKERS == 0 and settings.INFERENCE_THREADS > 1:
+        return settings.MODEL_BATCH_MAX_WAIT_MS / 1000
+    return 0
+
+def get_batcher():
+    """Return the process-wide micro-batcher in front of the registry's model"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    registry.get_predictor().predict,
+                    max_wait=_batch_max_wait(),
+                    max_batch_size=settings.MODEL_BATCH_MAX_SIZE
+                )
+    return _batcher
+
+def model_inputs(spectrograms):
+    """
+    Reshape the output of process_for_prediction into the model's input.
+    
+    Shared by predict_api and the int8 calibration collector so both see the same tensors.
+    """
+    logger.info(f"Original input shape: {spectrograms.shape}")
+    
+    # Reshape specifically to handle the TimeDistributed error
+    # From the error, we see the TimeDistributed layer is trying to apply a 3x3 convolution
+    # on input with shape [32, 45, 1, 1], but we need at least size 3 in two dimensions
+    if len(spectrograms.shape) == 5 and spectrograms.shape[1:] == (33, 45, 1, 1):
+        # Reshape to remove the extra dimension
+        spectrograms = spectrograms.reshape(spectrograms.shape[0], 33, 45, 1)
+        logger.info(f"Reshaped to: {spectrograms.shape}")
+    elif len(spectrograms.shape) == 5:
+        # Handle other 5D tensors by taking the first element of dimension 1
+        spectrograms = spectrograms[:, 0, :, :, :]
+        logger.info(f"Extracted feature to shape: {spectrograms.shape}")
+    return spectrograms
+
+class SegmentVotes:
+    """
+    Running tally of the per-segment predictions of one assessment, fed a batch at a time.
+    
+    The confidences of the segments are kept as float32 columns in recording order and
+    stored packed (see segments.pack_segments). Predictions of an unexpected shape can't
+    be read as votes; those segments are split half Healthy, half MDD by finish(), once
+    every batch is in.
+    """
+
+    def __init__(self):
+        self.healthy = 0
+        self.mdd = 0
+        self.unreadable = 0
+        self.input_shape = None
+        self.output_shape = None
+        self._healthy_confidence = []
+        self._mdd_confidence = []
+
+    @property
+    def total(self):
+        return self.healthy + self.mdd
+
+    def _grow(self, shape, batch_shape):
+        if shape is None:
+            return tuple(batch_shape)
+        return (shape[0] + batch_shape[0], *shape[1:])
+
+    def add(self, inputs, predictions):
+        """Count the votes of a batch of model inputs and the model's predictions for them"""
+        self.input_shape = self._grow(self.input_shape, inputs.shape)
+        self.output_shape = self._grow(self.output_shape, predictions.shape)
         
         # Process predictions based on output shape
-        if len(raw_predictions.shape) == 2:  # Standard shape (batch_size, num_classes)
-            for idx, pred in enumerate(raw_predictions):
-                segment_class = np.argmax(pred)
-                healthy_conf = float(pred[0])
-                mdd_conf = float(pred[1])
-                
-                # Log the first few predictions for debugging
-                if idx < 3:
-                    logger.info(f"Segment {idx} prediction - Healthy: {healthy_conf:.4f}, MDD: {mdd_conf:.4f}")
-                
-                if segment_class == 0:
-                    healthy_count += 1
-                else:
-                    mdd_count += 1
+        if len(predictions.shape) != 2:  # Standard shape (batch_size, num_classes)
+            logger.warning(f"Unexpected prediction shape: {predictions.shape}")
+            self.unreadable += inputs.shape[0]
+            return
+        
+        # Log the first few predictions for debugging
+        for idx, pred in enumerate(predictions[:max(3 - self.total, 0)], start=self.total):
+            logger.info(f"Segment {idx} prediction - Healthy: {pred[0]:.4f}, MDD: {pred[1]:.4f}")
+        
+        healthy = int(np.count_nonzero(np.argmax(predictions, axis=1) == 0))
+        self.healthy += healthy
+        self.mdd += len(predictions) - healthy
+        self._healthy_confidence.append(predictions[:, 0].astype(np.float32))
+        self._mdd_confidence.append(predictions[:, 1].astype(np.float32))
+
+    def decided(self, remaining, confidence=0):
+        """
+        Whether the majority is settled without scoring the remaining segments: they can
+        no longer change it or, with a confidence above 0, the majority's share of the
+        segments counted is above one half at that confidence level.
+        """
+        if self.unreadable:
+            return False
+        if self.healthy >= self.mdd + remaining or self.mdd > self.healthy + remaining:
+            return True
+        if confidence <= 0 or not self.total:
+            return False
+        return wilson_lower_bound(max(self.healthy, self.mdd), self.total, confidence) > 0.5
+
+    def finish(self):
+        """Count the segments whose predictions couldn't be read"""
+        # Default to binary prediction with 0.5 confidence if we can't interpret
+        healthy = self.unreadable // 2
+        is_healthy = np.arange(self.unreadable) < healthy
+        self.healthy += healthy
+        self.mdd += self.unreadable - healthy
+        self._healthy_confidence.append(np.where(is_healthy, 0.75, 0.25).astype(np.float32))
+        self._mdd_confidence.append(np.where(is_healthy, 0.25, 0.75).astype(np.float32))
+        self.unreadable = 0
+
+    def packed(self):
+        """The confidences of every segment counted, packed for detailed_results"""
+        columns = [np.concatenate(column) if column else np.empty(0, np.float32)
+                   for column in (self._healthy_confidence, self._mdd_confidence)]
+        return pack_segments(*columns)
+
+def wilson_lower_bound(successes, trials, confidence):
+    """One-sided lower bound of a proportion at a confidence level, from the Wilson score interval"""
+    z = statistics.NormalDist().inv_cdf(confidence)
+    share = successes / trials
+    centre = share + z * z / (2 * trials)
+    spread = z * math.sqrt(share * (1 - share) / trials + z * z / (4 * trials * trials))
+    return (centre - spread) / (1 + z * z / trials)
+
+class EarlyExit:
+    """
+    Decides when predict_api can stop scoring a recording (EARLY_EXIT) and reports what it saved.
+    
+    Segments still to come are bounded by the epochs of the recording not yet seen, some
+    of which may be rejected. The time saved is estimated from the pace at which batches
+    arrived after the first one, which also paid for reading, filtering and the ICA fit.
+    
+    Args:
+        n_epochs: Number of epochs of the recording, from count_epochs
+        confidence: Confidence level at which a majority is taken as settled, 0 to only
+            stop once the remaining segments can't change it
+
+    Raises:
+        ValueError: If the confidence level isn't in [0, 1)
+    """
+
+    def __init__(self, n_epochs, confidence=None):
+        self.n_epochs = n_epochs
+        self.confidence = settings.EARLY_EXIT_CONFIDENCE if confidence is None else confidence
+        if not 0 <= self.confidence < 1:
+            raise ValueError(f"Early exit confidence must be at least 0 and below 1, got {self.confidence}")
+        self.segments = 0
+        self.first = None
+        self.stopped = False
+        self.seconds_saved = 0.0
+
+    def arrived(self, n_segments):
+        """Note a batch of n_segments handed to the model"""
+        self.segments += n_segments
+        if self.first is None:
+            self.first = (time.perf_counter(), self.segments)
+
+    def decided(self, votes):
+        """Whether the votes counted so far settle the majority; if so, the rest is skipped"""
+        remaining = max(self.n_epochs - votes.total, 0)
+        if not remaining or not votes.decided(remaining, self.confidence):
+            return False
+        
+        self.stopped = True
+        started, first_segments = self.first
+        if self.segments > first_segments:
+            pace = (time.perf_counter() - started) / (self.segments - first_segments)
+            self.seconds_saved = pace * max(self.n_epochs - self.segments, 0)
+        count("early_exits")
+        logger.info(f"Majority settled after {votes.total} segments of at most {self.n_epochs}")
+        return True
+
+    def summary(self, votes):
+        return {
+            "stopped_early": self.stopped,
+            "segments_evaluated": votes.total,
+            "epochs_in_recording": self.n_epochs,
+            "estimated_seconds_saved": round(self.seconds_saved, 3),
+        }
+
+def _count_votes(votes, inputs, request):
+    with stage("predict"):
+        predictions = request.wait()
+    logger.info(f"Made predictions successfully. Shape: {predictions.shape}")
+    with stage("postprocess"):
+        votes.add(inputs, predictions)
+
+def predict_api(file_path: str, file_hash: str = None, profile: str = "full", subject: str = None) -> dict:
+    """
+    Process EEG file and return prediction with detailed analysis
+    
+    The spectrograms come from the preprocessing a batch at a time: each batch is handed
+    to the model as soon as it is ready and its segment votes are counted while the next
+    batch is being preprocessed.
+    
+    Args:
+        file_path: Path to the .edf file
+        file_hash: SHA-256 of the file if already known (used by the spectrogram cache)
+        profile: Preprocessing profile, "full" or "fast"
+        subject: Identifier of the person recorded (used by the fast profile)
+    """
+    try:
+        # The model is loaded once per process by the registry and shared through the micro-batcher
+        batcher = get_batcher()
+        
+        # Get preprocessed spectrograms
+        from .preprocessing import SPECTROGRAM_BATCH, count_epochs, iter_spectrograms
+        logger.info(f"Processing file: {file_path}")
+        votes = SegmentVotes()
+        running = None
+        early_exit = EarlyExit(count_epochs(file_path)) if settings.EARLY_EXIT else None
+        batch_size = settings.EARLY_EXIT_BATCH if early_exit else SPECTROGRAM_BATCH
+        with contextlib.closing(iter_spectrograms(file_path, file_hash=file_hash, profile=profile, subject=subject,
+                                                  batch_size=batch_size)) as batches:
+            while True:
+                with stage("preprocess"):
+                    spectrograms = next(batches, None)
+                if spectrograms is None:
+                    break
+                spectrograms = model_inputs(spectrograms)
+                if early_exit:
+                    early_exit.arrived(len(spectrograms))
                 
-                detailed_segments.append({
-                    "segment_number": idx + 1,
-                    "prediction": "Healthy" if segment_class == 0 else "MDD",
-                    "healthy_confidence": healthy_conf,
-                    "mdd_confidence": mdd_conf
-                })
-        else:
-            # If model output is not the expected shape, convert appropriately 
-            logger.warning(f"Unexpected prediction shape: {raw_predictions.shape}")
-            # Default to binary prediction with 0.5 confidence if we can't interpret
-            healthy_count = spectrograms.shape[0] // 2
-            mdd_count = spectrograms.shape[0] - healthy_count
+                # Make predictions using the model, while the next batch is preprocessed
+                logger.info(f"Making prediction with model input shape: {spectrograms.shape}")
+                request = batcher.submit(spectrograms)
+                if running is not None:
+                    _count_votes(votes, *running)
+                running = spectrograms, request
+                if early_exit and early_exit.decided(votes):
+                    break
+        _count_votes(votes, *running)
+        
+        with stage("postprocess"):
+            votes.finish()
+            healthy_count, mdd_count, total_segments = votes.healthy, votes.mdd, votes.total
             
-            for idx in range(spectrograms.shape[0]):
-                is_healthy = idx < healthy_count
-                detailed_segments.append({
-                    "segment_number": idx + 1,
-                    "prediction": "Healthy" if is_healthy else "MDD",
-                    "healthy_confidence": 0.75 if is_healthy else 0.25,
-                    "mdd_confidence": 0.25 if is_healthy else 0.75
-                })
-        
-        # Determine final prediction
-        final_prediction = "Healthy" if healthy_count >= mdd_count else "Major Depressive Disorder"
-        total_segments = healthy_count + mdd_count
-        majority_confidence = max(healthy_count, mdd_count) / total_segments * 100 if total_segments > 0 else 50
+            # Determine final prediction
+            final_prediction = "Healthy" if healthy_count >= mdd_count else "Major Depressive Disorder"
+            majority_confidence = max(healthy_count, mdd_count) / total_segments * 100 if total_segments > 0 else 50
         
         # Log final statistics
         logger.info(f"Total segments: {total_segments}")
@@ -183,11 +624,12 @@ def predict_api(file_path: str) -> dict:
             "segment_details": {
                 "healthy_segments": healthy_count,
                 "mdd_segments": mdd_count,
-                "detailed_predictions": detailed_segments
+                "segment_predictions": votes.packed(),
+                **({"early_exit": early_exit.summary(votes)} if early_exit else {})
             },
             "debug_info": {
-                "spectrogram_shape": str(spectrograms.shape),
-                "prediction_shape": str(raw_predictions.shape),
+                "spectrogram_shape": str(votes.input_shape),
+                "prediction_shape": str(votes.output_shape),
                 "healthy_ratio": f"{healthy_count}/{total_segments}",
                 "mdd_ratio": f"{mdd_count}/{total_segments}"
             }
@@ -208,6 +650,6 @@ def predict_api(file_path: str) -> dict:
             "segment_details": {
                 "healthy_segments": 0,
                 "mdd_segments": 0,
-                "detailed_predictions": []
+                "segment_predictions": pack_segments([], [])
             }
         }
\ No newline at end of file
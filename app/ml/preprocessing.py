@@ -1,14 +1,54 @@
 import mne
 import numpy as np
 from scipy import signal
+from numpy.lib.stride_tricks import sliding_window_view
 import pickle
 import os
 import cv2  # Make sure OpenCV is installed and imported
 from sklearn.preprocessing import StandardScaler
 import logging
+import functools
+import math
+import hashlib
+import json
+import tempfile
+from ..config import settings
+from .stages import stage, count, timed
+from .cache import get_spectrogram_cache, get_ica_cache, hash_file
+from .registry import registry
+from .threads import mne_n_jobs
+from .filters import decimated_filter, filter_raw, notch_raw
 
 logger = logging.getLogger(__name__)
 
+# Parameters of the pipeline below. They are part of the spectrogram cache key,
+# so update them (or PIPELINE_VERSION) whenever the processing changes.
+PIPELINE_VERSION = 1
+PIPELINE_PARAMS = {
+    "bandpass": [0.1, 70],
+    "notch": 50,
+    "ica": {"n_components": 13, "random_state": 42, "highpass": 1.0, "decim": 3},
+    "epochs": {"duration": 5, "overlap": 2},
+    "reject_amplitude": 1e-4,
+    "spectrogram": {"fs": 256, "window": ["tukey", 0.25], "nperseg": 32, "noverlap": 16, "nfft": 32},
+    "resize": [75, 17],
+    "splits": 3,
+    "dtype": "float32",
+}
+
+# Features are computed in float32, the precision the model runs at
+FEATURE_DTYPE = np.float32
+
+# Number of epochs turned into spectrograms at once
+SPECTROGRAM_BATCH = 256
+
+# Seconds of a recording referenced or cleaned by the ICA at once
+BLOCK_SECONDS = 60
+
+
+# Reasons reject_criteria gives MNE's drop log for a rejected segment
+REJECT_REASONS = ["max amp", "min amp"]
+
 def reject_criteria(x):
     """
     Criteria for rejecting noisy segments in EEG data.
@@ -20,150 +60,682 @@ def reject_criteria(x):
     Returns:
         tuple: (reject_flag, reasons)
     """
-    max_condition = np.max(x, axis=1) > 1e-4
-    min_condition = np.min(x, axis=1) < -1e-4
+    threshold = PIPELINE_PARAMS["reject_amplitude"]
+    max_condition = np.max(x, axis=1) > threshold
+    min_condition = np.min(x, axis=1) < -threshold
+    
+    return ((max_condition.any() or min_condition.any()), REJECT_REASONS)
+
+@timed("ica_fit")
+def fit_ica(data):
+    """
+    Fit the notebook's ICA on every decim-th sample of the recording, high-passed at 1 Hz.
+    
+    The high-passed samples are built channel by channel, so neither a filtered copy of
+    the whole recording nor ICA.fit's own copy of it is made. The result is that of
+    ica.fit(data.copy().filter(1.0, None), decim=decim). Recordings with annotations
+    that ICA.fit or the filter treat specially take that route.
+    """
+    params = PIPELINE_PARAMS["ica"]
+    ica = mne.preprocessing.ICA(random_state=params["random_state"], n_components=params["n_components"])
+    descriptions = [description.lower() for description in data.annotations.description]
+    if any(description.startswith(("bad", "edge")) for description in descriptions):
+        filtered = filter_raw(data.copy(), l_freq=params["highpass"], h_freq=None, n_jobs=mne_n_jobs())
+        return ica.fit(filtered, decim=params["decim"])
+    return ica.fit(decimated_filter(data, params["highpass"], None, params["decim"], n_jobs=mne_n_jobs()))
+
+def ica_cache_key(data, subject=None):
+    """
+    Key of the cached ICA for the recording's subject and device, or None if the subject is unknown.
+    
+    The device is identified by the channel layout and sampling rate. Without a subject the
+    EDF's patient id is used; recordings with neither are never matched to a cached ICA.
+    """
+    if subject is None:
+        subject = (data.info.get("subject_info") or {}).get("his_id")
+    if not subject or subject == "X":
+        return None
+    identity = {
+        "subject": str(subject),
+        "channels": data.ch_names,
+        "sfreq": data.info["sfreq"],
+        "ica": PIPELINE_PARAMS["ica"],
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+def get_ica(data, profile="full", subject=None):
+    """
+    Return the ICA to apply to the recording.
+    
+    The full profile always fits a new ICA. The fast profile reuses the unmixing fitted on an
+    earlier recording of the same subject and device, and only fits (and stores) one on a miss.
+    """
+    if profile != "fast":
+        return fit_ica(data)
+    
+    key = ica_cache_key(data, subject)
+    if key is None:
+        logger.info("Unknown subject, fitting ICA for the fast profile")
+        return fit_ica(data)
+    
+    ica_cache = get_ica_cache()
+    ica = ica_cache.get(key)
+    if ica is not None:
+        count("ica_cache_hits")
+        return ica
+    
+    count("ica_cache_misses")
+    ica = fit_ica(data)
+    ica_cache.put(key, ica)
+    return ica
+
+# Channel names of the two recording setups mapped to standard 10-20 names
+DROPPED_CHANNELS = {
+    22: ['EEG 23A-23R', 'EEG 24A-24R', 'EEG A2-A1', 'EEG C3-LE', 'EEG F4-LE'],
+    20: ['EEG A2-A1', 'EEG C3-LE', 'EEG F4-LE'],
+}
+CHANNEL_NAMES = {
+    'EEG Fp1-LE': 'Fp1', 'EEG Fp2-LE': 'Fp2',
+    'EEG F7-LE': 'F7', 'EEG F3-LE': 'F3', 'EEG Fz-LE': 'Fz', 'EEG F8-LE': 'F8',
+    'EEG T3-LE': 'T3', 'EEG Cz-LE': 'Cz', 'EEG C4-LE': 'C4', 'EEG T4-LE': 'T4',
+    'EEG T5-LE': 'T5', 'EEG P3-LE': 'P3', 'EEG Pz-LE': 'Pz', 'EEG P4-LE': 'P4', 'EEG T6-LE': 'T6',
+    'EEG O1-LE': 'O1', 'EEG O2-LE': 'O2'
+}
+
+@functools.lru_cache(maxsize=1)
+def standard_montage():
+    """The standard 10-20 montage, built once per process; Raw.set_montage doesn't modify it"""
+    return mne.channels.make_standard_montage("standard_1020")
+
+# The steps of preprocess_eeg, also run one at a time by benchmarks/pipeline.py.
+# Steps taking a Raw modify it in place and return it. Each is timed as its own
+# stage, nested in the coarser stages reported as job progress.
+
+@timed("read")
+def read_recording(file_path):
+    """
+    Read an EDF recording, into a memory-mapped file if it is at least EDF_MEMMAP_MINUTES long.
+    
+    MNE reads the data records into the file a few at a time, so a long recording never
+    has to fit in RAM; the steps below keep it in the file. The file is unlinked straight
+    away and its space freed once the recording is no longer used.
+    """
+    if settings.EDF_MEMMAP_MINUTES > 0:
+        header = mne.io.read_raw_edf(file_path, preload=False)
+        if header.n_times / header.info["sfreq"] >= settings.EDF_MEMMAP_MINUTES * 60:
+            fd, memmap_path = tempfile.mkstemp(prefix="eeg-recording-", suffix=".dat", dir=settings.EDF_MEMMAP_DIR or None)
+            os.close(fd)
+            try:
+                return mne.io.read_raw_edf(file_path, preload=memmap_path)
+            finally:
+                os.remove(memmap_path)
+    return mne.io.read_raw_edf(file_path, preload=True)
+
+def memory_mapped(data):
+    """Whether the samples of a Raw are in a memory-mapped file rather than in RAM"""
+    return isinstance(data._data, np.memmap) and data._data._mmap is not None
+
+def _blocks(data):
+    block = int(BLOCK_SECONDS * data.info["sfreq"])
+    for start in range(0, data.n_times, block):
+        yield start, min(start + block, data.n_times)
+
+@timed("reference")
+def set_reference(data):
+    """
+    Average reference. A memory-mapped recording is referenced in place a block at a time,
+    as MNE's set_eeg_reference would otherwise make a copy of all its channels.
+    """
+    if not memory_mapped(data):
+        return data.set_eeg_reference()
+    for start, stop in _blocks(data):
+        block = mne.io.RawArray(data._data[:, start:stop], data.info, verbose="error")
+        block.set_eeg_reference(verbose="error")
+    with data.info._unlock():
+        data.info["custom_ref_applied"] = block.info["custom_ref_applied"]
+    return data
+
+def drop_channels(data, ch_names):
+    """
+    data.drop_channels(ch_names). The kept channels of a memory-mapped recording are moved
+    to the front of the file one at a time instead of being copied into RAM together.
+    """
+    if not memory_mapped(data):
+        return data.drop_channels(ch_names)
+    samples = data._data
+    kept = [index for index, name in enumerate(data.ch_names) if name not in ch_names]
+    for row, index in enumerate(kept):
+        if row != index:
+            samples[row] = samples[index]
+    # Let MNE update everything but the samples, which are already in place
+    data._data = samples[:, :0]
+    data.drop_channels(ch_names)
+    data._data = samples[:len(kept)]
+    return data
+
+@timed("bandpass")
+def bandpass_filter(data):
+    l_freq, h_freq = PIPELINE_PARAMS["bandpass"]
+    return filter_raw(data, l_freq=l_freq, h_freq=h_freq, n_jobs=mne_n_jobs())
+
+@timed("notch")
+def notch_filter(data):
+    return notch_raw(data, PIPELINE_PARAMS["notch"], n_jobs=mne_n_jobs())
+
+@timed("channels")
+def select_channels(data):
+    """Drop the extra channels of the recording setup and rename the rest to 10-20 names"""
+    # Drop specific channels based on total channels - exactly as in the notebook
+    if data.info['nchan'] in DROPPED_CHANNELS:
+        drop_channels(data, DROPPED_CHANNELS[data.info['nchan']])
+    
+    # Rename channels to standard names as done in the notebook
+    data.rename_channels(CHANNEL_NAMES)
+    return data.set_montage(standard_montage())
+
+def apply_ica(data, profile="full", subject=None):
+    """
+    Clean the recording with its ICA in place, BLOCK_SECONDS at a time.
+    
+    ICA.apply works on a copy of the samples it is given, so applying it to blocks bounds
+    that copy to one block instead of the whole recording.
+    """
+    ica = get_ica(data, profile, subject)
+    for start, stop in _blocks(data):
+        ica.apply(data, start=start, stop=stop, verbose="error")
+    return data
+
+class EpochWindows:
+    """
+    Fixed-length, overlapping epochs of a recording, as windows of its samples.
+    
+    The epochs are never copied out of the recording: rejecting epochs only changes which
+    ones are kept, and the channel means the model needs are windows of the mean of the
+    continuous signal. np.asarray(epochs) gives the kept epochs as one array, the result
+    of mne.Epochs.get_data().
+    
+    Args:
+        samples: Continuous samples of shape (n_channels, n_times), possibly memory-mapped
+        starts: First sample of every epoch of the recording
+        length: Samples per epoch
+        kept: Indices of the epochs kept, all of them if not given
+        drop_log: Reasons every epoch was dropped, as in mne.Epochs.drop_log
+        eeg: Indices of the EEG channels, which reject_epochs tests, all of them if not given
+    """
+    
+    def __init__(self, samples, starts, length, kept=None, drop_log=None, eeg=None):
+        self.samples = samples
+        self.starts = np.asarray(starts)
+        self.length = length
+        self.kept = np.arange(len(self.starts)) if kept is None else np.asarray(kept, dtype=int)
+        self.drop_log = tuple(drop_log) if drop_log is not None else ((),) * len(self.starts)
+        self.eeg = np.arange(len(samples)) if eeg is None else np.asarray(eeg)
+    
+    def __len__(self):
+        return len(self.kept)
+    
+    @property
+    def shape(self):
+        return (len(self), len(self.samples), self.length)
+    
+    def windows(self):
+        """View of every possible window of the samples, (n_channels, n_times - length + 1, length)"""
+        return sliding_window_view(self.samples, self.length, axis=1)
+    
+    def __array__(self, dtype=None, copy=None):
+        array = self.windows()[:, self.starts[self.kept]].transpose(1, 0, 2)
+        return np.ascontiguousarray(array, dtype=dtype)
+    
+    def drop(self, indices, reason):
+        """Epochs without those at indices (of all the recording's epochs), logged with reason"""
+        indices = set(int(index) for index in indices)
+        drop_log = [log + tuple(reason) if index in indices else log for index, log in enumerate(self.drop_log)]
+        kept = [index for index in self.kept if index not in indices]
+        return EpochWindows(self.samples, self.starts, self.length, kept, drop_log, self.eeg)
+    
+    def span(self, start, stop):
+        """
+        The epochs start to stop - 1 of the recording, as EpochWindows over the view of
+        the samples they cover (their starts counted from the first of them), so the
+        channel means and extrema of a span only read its own samples.
+        """
+        starts = self.starts[start:stop]
+        first = int(starts[0]) if len(starts) else 0
+        last = int(starts[-1]) + self.length if len(starts) else 0
+        kept = self.kept[(self.kept >= start) & (self.kept < stop)] - start
+        return EpochWindows(self.samples[:, first:last], starts - first, self.length, kept,
+                            self.drop_log[start:stop], self.eeg)
+    
+    def extrema(self):
+        """Maximum and minimum of every epoch of the recording, each of shape (n_channels, n_epochs)"""
+        starts = self.starts
+        step = int(starts[1] - starts[0]) if len(starts) > 1 else 1
+        if len(starts) and step > 0 and np.all(np.diff(starts) == step):
+            maxima, minima = window_extrema(self.samples[:, starts[0]:starts[-1] + self.length], self.length, step)
+            return maxima[:, :len(starts)], minima[:, :len(starts)]
+        windows = self.windows()
+        maxima = np.stack([windows[:, start].max(axis=1) for start in starts], axis=1)
+        minima = np.stack([windows[:, start].min(axis=1) for start in starts], axis=1)
+        return maxima, minima
+    
+    def channel_means(self, dtype=np.float64):
+        """
+        Mean across channels of every kept epoch, (n_epochs, length).
+        
+        The mean of the continuous signal is computed once and cut into windows, which gives
+        np.asarray(self).mean(axis=1) exactly without the epochs.
+        """
+        means = sliding_window_view(self.samples.mean(axis=0), self.length)
+        return means[self.starts[self.kept]].astype(dtype)
+
+def epoch_starts(n_times, sfreq):
+    """First sample of every 5 s epoch of a recording, those of mne.make_fixed_length_events"""
+    params = PIPELINE_PARAMS["epochs"]
+    length = int(round(params["duration"] * sfreq))
+    return np.arange(0, n_times - length + 1, sfreq * (params["duration"] - params["overlap"])).astype(int)
+
+def count_epochs(file_path):
+    """Number of epochs make_epochs cuts a recording into, from its EDF header alone"""
+    header = mne.io.read_raw_edf(file_path, preload=False, verbose="error")
+    return len(epoch_starts(header.n_times, header.info["sfreq"]))
+
+@timed("segmenting")
+def make_epochs(data):
+    """
+    Create 5-second epochs with 2-second overlap - matching the notebook's first code cell.
+    
+    The epochs are those of mne.make_fixed_length_epochs(data, duration=5, overlap=2), as
+    EpochWindows over the samples of the recording. Epochs overlapping bad annotations are
+    dropped as MNE drops them.
+    """
+    params = PIPELINE_PARAMS["epochs"]
+    sfreq = data.info["sfreq"]
+    length = int(round(params["duration"] * sfreq))
+    starts = epoch_starts(data.n_times, sfreq)
+    if len(starts) == 0:
+        raise ValueError(f"Recording shorter than one {params['duration']} s epoch")
+    eeg = mne.pick_types(data.info, eeg=True, exclude=[])
+    epochs = EpochWindows(data._data, starts, length, eeg=eeg)
+    
+    if any(description.lower().startswith("bad") for description in data.annotations.description):
+        mne_epochs = mne.make_fixed_length_epochs(data, duration=params["duration"], overlap=params["overlap"])
+        mne_epochs.drop_bad()
+        kept = [index for index, log in enumerate(mne_epochs.drop_log) if not log]
+        epochs = EpochWindows(data._data, starts, length, kept, mne_epochs.drop_log, eeg)
+    return epochs
+
+def window_extrema(samples, length, step):
+    """
+    Maximum and minimum of every window samples[:, k * step:k * step + length] that fits.
+    
+    Computed in one pass over the samples without copying any window: each channel is cut
+    into blocks of gcd(length, step) samples, and the extrema of the blocks are combined
+    into those of the windows through a sliding-window view.
+    
+    Args:
+        samples: Array of shape (n_channels, n_times), possibly memory-mapped
+        length: Samples per window
+        step: Samples between the starts of consecutive windows
+        
+    Returns:
+        tuple: (maxima, minima), each of shape (n_channels, n_windows)
+    """
+    n_channels, n_times = samples.shape
+    n_windows = max((n_times - length) // step + 1, 0)
+    size = math.gcd(length, step)
+    n_blocks = ((n_windows - 1) * step + length) // size if n_windows else 0
+    blocks = samples[:, :n_blocks * size].reshape(n_channels, n_blocks, size)
+    extrema = []
+    for reduce in (np.max, np.min):
+        if not n_windows:
+            extrema.append(np.empty((n_channels, 0), dtype=samples.dtype))
+            continue
+        windows = sliding_window_view(reduce(blocks, axis=2), length // size, axis=1)[:, ::step // size]
+        extrema.append(reduce(windows, axis=2))
+    return tuple(extrema)
+
+@timed("rejection")
+def reject_epochs(epochs):
+    """
+    Drop the epochs failing reject_criteria.
+    
+    Instead of calling reject_criteria on every epoch, the amplitude test runs on all of
+    them at once from their extrema (one pass over the recording with window_extrema).
+    Dropped epochs get reject_criteria's reasons in the drop log, as mne.Epochs.drop_bad
+    records them.
     
-    return ((max_condition.any() or min_condition.any()), ["max amp", "min amp"])
+    Args:
+        epochs: EpochWindows from make_epochs
+        
+    Returns:
+        EpochWindows: The epochs kept
+    """
+    threshold = PIPELINE_PARAMS["reject_amplitude"]
+    maxima, minima = epochs.extrema()
+    rejected = ((maxima[epochs.eeg] > threshold) | (minima[epochs.eeg] < -threshold)).any(axis=0)
+    epochs = epochs.drop(np.intersect1d(np.flatnonzero(rejected), epochs.kept), REJECT_REASONS)
+    count("rejected_epochs", sum(1 for reasons in epochs.drop_log if reasons))
+    return epochs
+
+def filter_recording(file_path):
+    """Read an EDF recording and run the filtering stage of preprocess_eeg on it"""
+    data = read_recording(file_path)
+    with stage("filtering"):
+        # Basic preprocessing
+        set_reference(data)
+        bandpass_filter(data)
+        notch_filter(data)
+        select_channels(data)
+    return data
 
-def preprocess_eeg(file_path):
+def preprocess_eeg(file_path, profile="full", subject=None):
     """
     Preprocess EEG data according to the protocol in the notebook.
     
     Args:
         file_path: Path to the .edf file
+        profile: Preprocessing profile, "full" or "fast"
+        subject: Identifier of the person recorded, used by the fast profile to reuse their ICA
         
     Returns:
-        np.array: Preprocessed EEG data
+        EpochWindows: The epochs kept, np.asarray gives them as an array of shape
+        (n_epochs, n_channels, n_times)
     """
     try:
-        # Read EEG file
-        data = mne.io.read_raw_edf(file_path, preload=True)
+        data = filter_recording(file_path)
         
-        # Basic preprocessing
-        data.set_eeg_reference()
-        data.filter(l_freq=0.1, h_freq=70)
-        data.notch_filter(50)
-        
-        # Drop specific channels based on total channels - exactly as in the notebook
-        if data.info['nchan'] == 22:
-            data.drop_channels(['EEG 23A-23R', 'EEG 24A-24R', 'EEG A2-A1', 'EEG C3-LE', 'EEG F4-LE'])
-        elif data.info['nchan'] == 20:
-            data.drop_channels(['EEG A2-A1', 'EEG C3-LE', 'EEG F4-LE'])
-            
-        # Rename channels to standard names as done in the notebook
-        data.rename_channels({
-            'EEG Fp1-LE': 'Fp1', 'EEG Fp2-LE': 'Fp2',
-            'EEG F7-LE': 'F7', 'EEG F3-LE': 'F3', 'EEG Fz-LE': 'Fz', 'EEG F8-LE': 'F8',
-            'EEG T3-LE': 'T3', 'EEG Cz-LE': 'Cz', 'EEG C4-LE': 'C4', 'EEG T4-LE': 'T4',
-            'EEG T5-LE': 'T5', 'EEG P3-LE': 'P3', 'EEG Pz-LE': 'Pz', 'EEG P4-LE': 'P4', 'EEG T6-LE': 'T6',
-            'EEG O1-LE': 'O1', 'EEG O2-LE': 'O2'
-        })
-        data.set_montage(mne.channels.make_standard_montage("standard_1020"))
-        
-        # Apply ICA - exactly as in the notebook
-        ica = mne.preprocessing.ICA(random_state=42, n_components=13)
-        ica.fit(data.copy().filter(l_freq=1.0, h_freq=None))
-        data = ica.apply(data.copy())
-        
-        # Create 5-second epochs with 2-second overlap - matching the notebook's first code cell
-        epochs = mne.make_fixed_length_epochs(data, duration=5, overlap=2)
-        
-        # Drop bad epochs based on amplitude criteria
-        epochs.drop_bad(reject=dict(eeg=reject_criteria))
-        
-        # Get data array
-        array = epochs.get_data()
-        
-        logger.info(f"Preprocessed EEG shape: {array.shape}")
-        return array
+        # Apply ICA - exactly as in the notebook, or reused from an earlier recording in the fast profile
+        with stage("ica"):
+            apply_ica(data, profile, subject)
+        
+        with stage("epoching"):
+            epochs = reject_epochs(make_epochs(data))
+        
+        logger.info(f"Preprocessed EEG shape: {epochs.shape}")
+        return epochs
         
     except Exception as e:
         logger.error(f"Error in EEG preprocessing: {str(e)}")
         raise
 
-def process_for_prediction(file_path):
+def iter_epochs(file_path, profile="full", subject=None):
     """
-    Complete preprocessing pipeline for model prediction.
+    preprocess_eeg as a generator that follows the ICA through the recording.
+    
+    The ICA is fitted on the whole recording as in preprocess_eeg, then applied one block
+    at a time. After each block the epochs ending in it are clean, so they are rejected and
+    yielded while the rest of the recording is still being cleaned.
     
     Args:
         file_path: Path to the .edf file
+        profile: Preprocessing profile, "full" or "fast"
+        subject: Identifier of the person recorded, used by the fast profile to reuse their ICA
+        
+    Yields:
+        EpochWindows: The epochs kept among those ending in one block, in recording order
+    """
+    data = filter_recording(file_path)
+    with stage("ica"):
+        ica = get_ica(data, profile, subject)
+    with stage("epoching"):
+        epochs = make_epochs(data)
+    
+    ends = epochs.starts + epochs.length
+    done = 0
+    for start, stop in _blocks(data):
+        with stage("ica"):
+            ica.apply(data, start=start, stop=stop, verbose="error")
+        ready = int(np.searchsorted(ends, stop, side="right"))
+        if ready == done:
+            continue
+        with stage("epoching"):
+            cleaned = reject_epochs(epochs.span(done, ready))
+        done = ready
+        yield cleaned
+
+def load_scaler(fit_data=None):
+    """
+    Load the fitted StandardScaler from scaler.pkl.
+    
+    Use registry.get_scaler() instead of calling this directly so the scaler is only loaded once.
+    
+    Args:
+        fit_data: Flattened data used to fit a new scaler if scaler.pkl is missing
         
     Returns:
-        np.array: Processed data ready for model prediction
+        StandardScaler: The scaler used for z-score normalization, or None if it
+        is missing and no data was given to fit one
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    scaler_path = os.path.join(current_dir, "scaler.pkl")
+        
+    if os.path.exists(scaler_path):
+        # Load existing scaler
+        with open(scaler_path, "rb") as f:
+            scaler = pickle.load(f)
+            logger.info(f"Loaded scaler from {scaler_path}")
+        return scaler
+    
+    if fit_data is None:
+        return None
+    
+    # Create new scaler
+    scaler = StandardScaler()
+    scaler.fit(fit_data)
+    logger.info("Created new scaler")
+    
+    # Save the new scaler
+    with open(scaler_path, "wb") as f:
+        pickle.dump(scaler, f)
+    logger.info(f"Saved new scaler to {scaler_path}")
+    
+    return scaler
+
+def pipeline_fingerprint(profile="full", subject=None):
+    """
+    Hash of everything besides the recording that determines the output of process_for_prediction.
+    """
+    fingerprint = {"version": PIPELINE_VERSION, "params": PIPELINE_PARAMS, "profile": profile}
+    if profile == "fast":
+        # The reused ICA depends on whose recordings were seen before
+        fingerprint["subject"] = None if subject is None else str(subject)
+    scaler = registry.get_scaler()
+    if scaler is not None:
+        fingerprint["scaler"] = [np.asarray(scaler.mean_).tolist(), np.asarray(scaler.scale_).tolist()]
+    encoded = json.dumps(fingerprint, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def apply_scaler(array, scaler):
+    """
+    Z-score array in place with a StandardScaler fitted on a single feature.
+    
+    Equivalent to scaler.transform(array.reshape(-1, 1)) without the copies it makes.
+    """
+    if scaler.mean_ is not None:
+        array -= np.asarray(scaler.mean_, dtype=array.dtype)
+    if scaler.scale_ is not None:
+        array /= np.asarray(scaler.scale_, dtype=array.dtype)
+    return array
+
+def scale_channel_means(data_array, scaler):
+    """
+    Mean across channels of every epoch, z-scored as float32.
+    
+    The scaler is an affine transform of every sample, so it commutes with the channel mean:
+    scaling the (n_epochs, n_times) means gives the notebook's result of scaling the full
+    array first, without copying the full array.
+    
+    Args:
+        data_array: EpochWindows, or epochs of shape (n_epochs, n_channels, n_times)
+        scaler: StandardScaler fitted on all samples as a single feature
+        
+    Returns:
+        np.array: float32 array of shape (n_epochs, n_times)
+    """
+    if isinstance(data_array, EpochWindows):
+        mean_signals = data_array.channel_means(FEATURE_DTYPE)
+    else:
+        mean_signals = data_array.mean(axis=1).astype(FEATURE_DTYPE)
+    return apply_scaler(mean_signals, scaler)
+
+@functools.lru_cache(maxsize=8)
+def _resize_matrices(in_shape, out_shape, dtype):
+    """
+    Matrices reproducing cv2.resize with INTER_CUBIC as rows @ image @ columns.
+    
+    They are built by resizing identity matrices, so border handling matches OpenCV exactly.
+    """
+    in_height, in_width = in_shape
+    out_height, out_width = out_shape
+    rows = cv2.resize(np.eye(in_height), dsize=(in_height, out_height), interpolation=cv2.INTER_CUBIC)
+    columns = cv2.resize(np.eye(in_width), dsize=(out_width, in_width), interpolation=cv2.INTER_CUBIC)
+    return rows.astype(dtype), columns.astype(dtype)
+
+def compute_spectrograms(mean_signals):
+    """
+    Turn the scaled channel means of the epochs into the model's spectrogram input.
+    
+    Matches the notebook's per-epoch loop: each signal is turned into a spectrogram,
+    normalized by its maximum, resized to (75, 17) with bicubic interpolation and split
+    into 3 parts along the time axis. Epochs are processed in batches of SPECTROGRAM_BATCH
+    written into a preallocated float32 output, which bounds the intermediate arrays.
+    
+    Args:
+        mean_signals: Scaled channel means of shape (n_epochs, n_times)
+        
+    Returns:
+        np.array: float32 spectrograms of shape (n_epochs, 3, 17, 25)
+    """
+    params = PIPELINE_PARAMS["spectrogram"]
+    width, height = PIPELINE_PARAMS["resize"]
+    splits = PIPELINE_PARAMS["splits"]
+    
+    n_epochs = mean_signals.shape[0]
+    X_data = np.empty((n_epochs, splits, height, width // splits), dtype=FEATURE_DTYPE)
+    
+    for start in range(0, n_epochs, SPECTROGRAM_BATCH):
+        batch = mean_signals[start:start + SPECTROGRAM_BATCH]
+        
+        # One STFT for the whole batch, (batch, n_freqs, n_segments)
+        _, _, stft_data = signal.spectrogram(
+            x=batch,
+            fs=params["fs"],
+            window=tuple(params["window"]),
+            nperseg=params["nperseg"],
+            noverlap=params["noverlap"],
+            nfft=params["nfft"],
+            axis=-1
+        )
+        spectrograms = np.abs(stft_data, out=stft_data).astype(FEATURE_DTYPE, copy=False)
+        spectrograms /= spectrograms.max(axis=(1, 2), keepdims=True)
+        
+        # Bicubic resizing is linear and separable, so resizing every epoch is two matrix products
+        rows, columns = _resize_matrices(spectrograms.shape[1:], (height, width), FEATURE_DTYPE)
+        resized = rows @ spectrograms @ columns
+        
+        # (batch, height, width) -> (batch, splits, height, width // splits)
+        X_data[start:start + len(batch)] = resized.reshape(len(batch), height, splits, width // splits).transpose(0, 2, 1, 3)
+    
+    return X_data
+
+def iter_spectrograms(file_path, file_hash=None, profile="full", subject=None, batch_size=SPECTROGRAM_BATCH):
+    """
+    process_for_prediction as a generator of batches of spectrograms.
+    
+    Batches of batch_size spectrograms (the last one smaller) are yielded as soon as their
+    epochs have been cleaned by iter_epochs, so the model can run on one batch while the
+    rest of the recording is preprocessed, and only about a batch of channel means and
+    spectrograms is held at a time. Concatenated, the batches are the output of
+    process_for_prediction; a recording without any epoch kept yields one empty batch.
+    
+    Repeat uploads of the same recording are served from the spectrogram cache, and the
+    spectrograms are cached once every batch has been computed. Without scaler.pkl the
+    scaler is fitted on all the epochs, so the first batch waits for the whole recording.
+    
+    Args:
+        file_path: Path to the .edf file
+        file_hash: SHA-256 of the file if already known, otherwise it is hashed here
+        profile: Preprocessing profile, "full" or "fast"
+        subject: Identifier of the person recorded, used by the fast profile to reuse their ICA
+        batch_size: Number of spectrograms per batch
+        
+    Yields:
+        np.array: float32 spectrograms of shape (n, 3, 17, 25), n <= batch_size
     """
     try:
-        # Get preprocessed data
-        data_array = preprocess_eeg(file_path)
-        
-        # Apply z-score normalization (StandardScaler)
-        original_shape = data_array.shape
-        array_flattened = data_array.reshape(-1, 1)
-        
-        # Check if scaler exists, otherwise create new one
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        scaler_path = os.path.join(current_dir, "scaler.pkl")
-            
-        if os.path.exists(scaler_path):
-            # Load existing scaler
-            with open(scaler_path, "rb") as f:
-                scaler = pickle.load(f)
-                logger.info(f"Loaded scaler from {scaler_path}")
+        cache = get_spectrogram_cache()
+        cache_key = None
+        if cache.enabled:
+            with stage("cache_lookup"):
+                cache_key = cache.key(file_hash or hash_file(file_path), pipeline_fingerprint(profile, subject))
+                cached = cache.get(cache_key)
+            if cached is not None:
+                count("spectrogram_cache_hits")
+                logger.info(f"Loaded spectrograms from cache: {cached.shape}")
+                for start in range(0, max(len(cached), 1), batch_size):
+                    yield cached[start:start + batch_size]
+                return
+            count("spectrogram_cache_misses")
+        
+        # Apply z-score normalization (StandardScaler), only fitted here if scaler.pkl is missing
+        scaler = registry.get_scaler()
+        if scaler is None:
+            epochs = preprocess_eeg(file_path, profile, subject)
+            with stage("scaling"):
+                scaler = registry.get_scaler(np.asarray(epochs).reshape(-1, 1))
+            cleaned = [epochs]
         else:
-            # Create new scaler
-            scaler = StandardScaler()
-            scaler.fit(array_flattened)
-            logger.info("Created new scaler")
-            
-            # Save the new scaler
-            with open(scaler_path, "wb") as f:
-                pickle.dump(scaler, f)
-            logger.info(f"Saved new scaler to {scaler_path}")
-        
-        # Apply the scaling
-        scaled_data = scaler.transform(array_flattened)
-        data_array = scaled_data.reshape(original_shape)
-        
-        # Calculate mean across channels - exactly as in the notebook
-        mean_signals = []
-        for d in data_array:
-            mean_signals.append(np.mean(d, axis=0))
-        
-        # Create spectrograms - exactly as in the notebook
-        X_data = []
-        
-        for d in mean_signals:
-            # Generate spectrogram using exact parameters from the notebook
-            frequencies, times, stft_data = signal.spectrogram(
-                x=d, 
-                fs=256, 
-                window=('tukey', 0.25), 
-                nperseg=32, 
-                noverlap=16, 
-                nfft=32
-            )
-            
-            # Process the spectrogram exactly as in the notebook
-            resized_spectrogram = np.abs(stft_data)
-            resized_spectrogram = resized_spectrogram / np.max(resized_spectrogram)
-            
-            # Resize to match dimensions used in the notebook (75, 17)
-            resized_spectrogram = cv2.resize(resized_spectrogram, dsize=(75, 17), interpolation=cv2.INTER_CUBIC)
-            
-            # Split array into 3 parts as done in the notebook
-            split_array = np.split(resized_spectrogram, 3, axis=1)
-            spectrogram_array = np.array(split_array)
-            
-            X_data.append(spectrogram_array)
-        
-        X_data = np.array(X_data)
-        logger.info(f"Final spectrograms shape: {X_data.shape}")
-        
-        return X_data
+            cleaned = iter_epochs(file_path, profile, subject)
+        
+        computed = []
+        pending = []
+        yielded = False
+        for epochs in cleaned:
+            with stage("scaling"):
+                pending.append(scale_channel_means(epochs, scaler))
+            mean_signals = np.concatenate(pending)
+            ready = len(mean_signals) - len(mean_signals) % batch_size
+            for start in range(0, ready, batch_size):
+                with stage("spectrogram"):
+                    batch = compute_spectrograms(mean_signals[start:start + batch_size])
+                if cache_key is not None:
+                    computed.append(batch)
+                yielded = True
+                yield batch
+            pending = [mean_signals[ready:]]
+        
+        with stage("spectrogram"):
+            batch = compute_spectrograms(np.concatenate(pending))
+        if cache_key is not None:
+            cache.put(cache_key, np.concatenate(computed + [batch]))
+        if len(batch) or not yielded:
+            yield batch
         
     except Exception as e:
         logger.error(f"Error in prediction processing: {str(e)}")
         raise
 
+def process_for_prediction(file_path, file_hash=None, profile="full", subject=None):
+    """
+    Complete preprocessing pipeline for model prediction: the batches of iter_spectrograms as one array.
+    
+    Repeat uploads of the same recording are served from the spectrogram cache
+    and skip preprocessing entirely.
+    
+    Args:
+        file_path: Path to the .edf file
+        file_hash: SHA-256 of the file if already known, otherwise it is hashed here
+        profile: Preprocessing profile, "full" or "fast"
+        subject: Identifier of the person recorded, used by the fast profile to reuse their ICA
+        
+    Returns:
+        np.array: Processed data ready for model prediction
+    """
+    batches = list(iter_spectrograms(file_path, file_hash, profile, subject))
+    X_data = batches[0] if len(batches) == 1 else np.concatenate(batches)
+    logger.info(f"Final spectrograms shape: {X_data.shape}")
+    return X_data
+
 if __name__ == "__main__":
     # Set up logging
     logging.basicConfig(
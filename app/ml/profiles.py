@@ -0,0 +1,18 @@
+from ..config import settings
+
+# Preprocessing profiles:
+#   full - fit a fresh ICA on every recording, exactly as in the notebook
+#   fast - reuse the ICA fitted on an earlier recording of the same subject and device
+PREPROCESSING_PROFILES = ["full", "fast"]
+
+def resolve_profile(profile=None):
+    """
+    Return the preprocessing profile to use, defaulting to PREPROCESSING_PROFILE.
+    
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    profile = profile or settings.PREPROCESSING_PROFILE
+    if profile not in PREPROCESSING_PROFILES:
+        raise ValueError(f"Unknown preprocessing profile '{profile}', expected one of: {', '.join(PREPROCESSING_PROFILES)}")
+    return profile
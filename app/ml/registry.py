@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+import os
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Holds the model and the fitted scaler, loading each exactly once per process.
+
+    The model is warmed up with a dummy prediction so graph tracing happens at startup
+    rather than on the first user's request; is_ready() reports when that has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._model = None
+        self._predictor = None
+        self._scaler = None
+        self._ready = False
+
+    def get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from .model import load_model
+                    from .threads import configure_tensorflow
+                    configure_tensorflow()
+                    start = time.perf_counter()
+                    self._model = load_model()
+                    logger.info(f"Model ready in {time.perf_counter() - start:.2f}s")
+        return self._model
+
+    def get_predictor(self):
+        """
+        Return the forward pass used instead of model.predict, for the MODEL_BACKEND and
+        MODEL_PRECISION settings.
+        
+        "keras" compiles the Keras model; "tflite", or the "int8" precision on either
+        backend, loads the exported TFLite model and never loads the Keras one.
+        """
+        if self._predictor is None:
+            with self._lock:
+                if self._predictor is None:
+                    self._predictor = self._create_predictor(settings.MODEL_BACKEND, settings.MODEL_PRECISION)
+        return self._predictor
+
+    def _create_predictor(self, backend, precision):
+        from .model import tflite_model_path
+        if backend not in ("keras", "tflite"):
+            raise ValueError(f"Unknown model backend {backend!r}, expected 'keras' or 'tflite'")
+        # Validates the precision before the Keras model is loaded
+        path = tflite_model_path(precision)
+        
+        if backend == "keras" and precision == "float":
+            from .model import CompiledModel
+            return CompiledModel(self.get_model())
+        
+        from .model import TFLiteModel
+        from .threads import tflite_threads
+        if not os.path.exists(path):
+            quantize = " --quantize int8 --calibration <spectrograms>" if precision == "int8" else ""
+            raise FileNotFoundError(f"TFLite model not found at {path}, export it with python -m app.ml.export{quantize}")
+        start = time.perf_counter()
+        predictor = TFLiteModel(path, num_threads=tflite_threads())
+        logger.info(f"TFLite model ({precision}) loaded from {path} in {time.perf_counter() - start:.2f}s")
+        return predictor
+
+    def get_scaler(self, fit_data=None):
+        """
+        Return the fitted StandardScaler.
+
+        Args:
+            fit_data: Flattened data used to fit a new scaler if scaler.pkl is missing
+        """
+        if self._scaler is None:
+            with self._lock:
+                if self._scaler is None:
+                    from .preprocessing import load_scaler
+                    self._scaler = load_scaler(fit_data)
+        return self._scaler
+
+    def load(self):
+        """Apply the thread settings, then load the model backend and the scaler"""
+        from .threads import configure_blas
+        configure_blas()
+        self.get_predictor()
+        self.get_scaler()
+
+    def warm_up(self, batch_size=2):
+        """
+        Run a dummy prediction to trace the compiled forward pass, then mark the registry ready.
+        """
+        import numpy as np
+        from .model import MODEL_INPUT_SHAPE
+
+        with self._lock:
+            if self._ready:
+                return
+            self.load()
+            start = time.perf_counter()
+            self.get_predictor().predict(np.zeros((batch_size, *MODEL_INPUT_SHAPE), dtype=np.float32))
+            self._ready = True
+            logger.info(f"Model warm-up finished in {time.perf_counter() - start:.2f}s")
+
+    def is_ready(self):
+        return self._ready
+
+registry = ModelRegistry()
@@ -0,0 +1,94 @@
+import base64
+import numpy as np
+
+# Format of the packed per-segment columns in detailed_results["segment_predictions"]:
+# little-endian float32 confidences, base64-encoded to fit the JSON column
+SEGMENT_ENCODING = "float32-le-base64"
+
+def _encode(values):
+    return base64.b64encode(np.asarray(values, dtype="<f4").tobytes()).decode("ascii")
+
+def _decode(text):
+    return np.frombuffer(base64.b64decode(text), dtype="<f4")
+
+def pack_segments(healthy_confidence, mdd_confidence):
+    """
+    Per-segment confidences of an assessment as two packed columns.
+
+    The model's confidences are float32, so packing them loses nothing, and the label and
+    number of every segment follow from their order and the two columns (see unpack_segments).
+
+    Args:
+        healthy_confidence: Healthy confidence of every segment, in recording order
+        mdd_confidence: MDD confidence of every segment
+
+    Returns:
+        dict: JSON-serializable columns, stored as detailed_results["segment_predictions"]
+    """
+    if len(healthy_confidence) != len(mdd_confidence):
+        raise ValueError(f"Got {len(healthy_confidence)} healthy and {len(mdd_confidence)} MDD confidences")
+    return {
+        "encoding": SEGMENT_ENCODING,
+        "count": len(healthy_confidence),
+        "healthy_confidence": _encode(healthy_confidence),
+        "mdd_confidence": _encode(mdd_confidence),
+    }
+
+def unpack_segments(packed):
+    """
+    Inverse of pack_segments.
+
+    Returns:
+        tuple: (healthy_confidence, mdd_confidence) as read-only float32 arrays
+
+    Raises:
+        ValueError: If the columns are in an unknown encoding or don't match the count
+    """
+    if packed.get("encoding") != SEGMENT_ENCODING:
+        raise ValueError(f"Unknown segment encoding {packed.get('encoding')!r}, expected {SEGMENT_ENCODING}")
+    healthy, mdd = _decode(packed["healthy_confidence"]), _decode(packed["mdd_confidence"])
+    if not len(healthy) == len(mdd) == packed["count"]:
+        raise ValueError(f"Expected {packed['count']} segments, got {len(healthy)} and {len(mdd)} confidences")
+    return healthy, mdd
+
+def segment_labels(healthy_confidence, mdd_confidence):
+    """Label of every segment, the class with the highest confidence (Healthy on a tie, as argmax)"""
+    return np.where(np.asarray(mdd_confidence) > np.asarray(healthy_confidence), "MDD", "Healthy")
+
+def expand_segments(detailed_results):
+    """
+    detailed_results with the per-segment list "detailed_predictions" (segment number,
+    label and both confidences of every segment) in place of the packed columns.
+    Results without packed columns are returned as they are.
+    """
+    if not detailed_results or "segment_predictions" not in detailed_results:
+        return detailed_results
+    healthy, mdd = unpack_segments(detailed_results["segment_predictions"])
+    expanded = {key: value for key, value in detailed_results.items() if key != "segment_predictions"}
+    expanded["detailed_predictions"] = [
+        {
+            "segment_number": number,
+            "prediction": label,
+            "healthy_confidence": healthy_conf,
+            "mdd_confidence": mdd_conf
+        }
+        for number, label, healthy_conf, mdd_conf in zip(
+            range(1, len(healthy) + 1), segment_labels(healthy, mdd).tolist(), healthy.tolist(), mdd.tolist()
+        )
+    ]
+    return expanded
+
+def compact_segments(detailed_results):
+    """
+    Inverse of expand_segments, for assessments stored with the per-segment list.
+    Results without the list are returned as they are.
+    """
+    if not detailed_results or "detailed_predictions" not in detailed_results:
+        return detailed_results
+    segments = detailed_results["detailed_predictions"]
+    compact = {key: value for key, value in detailed_results.items() if key != "detailed_predictions"}
+    compact["segment_predictions"] = pack_segments(
+        [segment["healthy_confidence"] for segment in segments],
+        [segment["mdd_confidence"] for segment in segments]
+    )
+    return compact
@@ -0,0 +1,77 @@
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+# The timer collecting stage durations for the pipeline run in this context
+_current_timer = contextvars.ContextVar("stage_timer", default=None)
+
+class StageTimer:
+    """
+    Collects wall-clock durations of the named pipeline stages run while it is active,
+    along with event counters such as cache hits.
+
+    Args:
+        on_stage: Optional callable invoked with the stage name when a stage starts
+    """
+
+    def __init__(self, on_stage=None):
+        self.timings = {}
+        self.counters = {}
+        self._on_stage = on_stage
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_timer.reset(self._token)
+        return False
+
+    def record(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def notify(self, name):
+        if self._on_stage is not None:
+            self._on_stage(name)
+
+@contextmanager
+def stage(name):
+    """
+    Time a pipeline stage against the active StageTimer (no-op when none is active).
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+
+    timer.notify(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.record(name, time.perf_counter() - start)
+
+def timed(name):
+    """
+    Decorator running every call of the function as the pipeline stage name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, value=1):
+    """
+    Increment a counter on the active StageTimer (no-op when none is active).
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.increment(name, value)
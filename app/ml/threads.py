@@ -0,0 +1,76 @@
+import logging
+import os
+import threading
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Read by the BLAS and OpenMP runtimes (numpy, scipy, scikit-learn, MNE) when they load
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS",
+)
+
+_lock = threading.Lock()
+_blas_configured = False
+_tensorflow_configured = False
+
+def blas_environment(threads):
+    """Environment variables limiting BLAS/OpenMP to threads, empty for 0 (library default)"""
+    if threads <= 0:
+        return {}
+    return {name: str(threads) for name in BLAS_ENV_VARS}
+
+def configure_blas():
+    """
+    Limit BLAS/OpenMP thread pools to BLAS_THREADS.
+
+    The environment variables cover libraries that are not loaded yet; threadpoolctl
+    resizes the pools of those already loaded.
+    """
+    global _blas_configured
+    with _lock:
+        if _blas_configured:
+            return
+        _blas_configured = True
+        threads = settings.BLAS_THREADS
+        if threads <= 0:
+            return
+        os.environ.update(blas_environment(threads))
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+        logger.info(f"BLAS/OpenMP limited to {threads} thread(s)")
+
+def configure_tensorflow():
+    """
+    Apply TF_INTER_OP_THREADS and TF_INTRA_OP_THREADS.
+
+    TensorFlow only accepts them before it runs its first operation, so this is called
+    before the model is loaded; later calls with other values are logged and ignored.
+    """
+    global _tensorflow_configured
+    with _lock:
+        if _tensorflow_configured:
+            return
+        _tensorflow_configured = True
+        inter_op, intra_op = settings.TF_INTER_OP_THREADS, settings.TF_INTRA_OP_THREADS
+        if inter_op <= 0 and intra_op <= 0:
+            return
+        import tensorflow as tf
+        try:
+            if inter_op > 0:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+            if intra_op > 0:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        except RuntimeError as e:
+            logger.warning(f"TensorFlow thread settings not applied: {str(e)}")
+            return
+        logger.info(f"TensorFlow limited to {inter_op or 'default'} inter-op and {intra_op or 'default'} intra-op thread(s)")
+
+def tflite_threads():
+    """Threads of the TFLite interpreter, None for its default"""
+    return settings.TF_INTRA_OP_THREADS or None
+
+def mne_n_jobs():
+    """Number of jobs of MNE's filters"""
+    return max(settings.MNE_N_JOBS, 1)
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import text
+from sqlalchemy.sql import func
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from .database import Base
 
@@ -56,4 +57,38 @@ class CombinedAssessment(Base):
     segments_analyzed = Column(Integer, nullable=False)
     detailed_results = Column(JSON)
     
-    user = relationship("User", back_populates="combined_assessments")
\ No newline at end of file
+    user = relationship("User", back_populates="combined_assessments")
+
+class AssessmentJob(Base):
+    __tablename__ = "assessment_jobs"
+
+    # Job ids are random hex strings so they can't be guessed from one another
+    id = Column(String, primary_key=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('CURRENT_TIMESTAMP'), onupdate=func.now())
+    
+    # queued, running, completed or failed
+    status = Column(String, nullable=False)
+    
+    # Status of each pipeline stage, e.g. {"filtering": "completed", "ica": "running", ...}
+    stages = Column(JSON, nullable=False)
+    
+    # Inputs kept until the background runner picks the job up
+    phq9_answers = Column(JSON, nullable=False)
+    file_path = Column(String)
+    file_hash = Column(String)
+    profile = Column(String, nullable=False, server_default='full')
+    
+    error = Column(String)
+    assessment_id = Column(Integer, ForeignKey("combined_assessments.id", ondelete="SET NULL"))
+    
+    assessment = relationship("CombinedAssessment")
+    
+    @property
+    def progress(self):
+        """Fraction of pipeline stages that have completed"""
+        if not self.stages:
+            return 0.0
+        completed = sum(1 for state in self.stages.values() if state == "completed")
+        return round(completed / len(self.stages), 2)
@@ -1,19 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Response
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Response, BackgroundTasks
 from sqlalchemy.orm import Session
 from .. import models, schemas, auth
-from ..database import get_db
-from ..ml.model import predict_api
-from typing import List
+from ..config import settings
+from ..database import get_db, SessionLocal
+from ..ml.executor import get_executor, QueueFullError
+from ..ml.cache import get_spectrogram_cache
+from ..ml.profiles import resolve_profile
+from ..ml import segments
+from ..uploads import save_upload, discard_upload, UploadTooLargeError
+from typing import List, Optional
+import logging
 import os
 import io
+import tempfile
+import uuid
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+# Pipeline stages reported while an assessment job runs
+JOB_STAGES = ["filtering", "ica", "epoching", "spectrogram", "predict"]
+
+def get_phq9_category(phq9_score: int) -> str:
+    if phq9_score >= 20:
+        return "Severe Depression"
+    elif phq9_score >= 15:
+        return "Moderately Severe Depression"
+    elif phq9_score >= 10:
+        return "Moderate Depression"
+    elif phq9_score >= 5:
+        return "Mild Depression"
+    return "Minimal Depression"
+
 @router.post("/submit-phq9", response_model=schemas.PHQ9Response)
 async def submit_phq9(
     phq9_data: schemas.PHQ9Create,
@@ -45,6 +65,7 @@ async def submit_phq9(
 async def submit_combined_assessment(
     phq9_answers: List[int],
     file: UploadFile = File(...),
+    profile: Optional[str] = None,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -57,15 +78,7 @@ async def submit_combined_assessment(
     
     # Calculate PHQ-9 score and category
     phq9_score = sum(phq9_answers)
-    phq9_category = "Minimal Depression"
-    if phq9_score >= 20:
-        phq9_category = "Severe Depression"
-    elif phq9_score >= 15:
-        phq9_category = "Moderately Severe Depression"
-    elif phq9_score >= 10:
-        phq9_category = "Moderate Depression"
-    elif phq9_score >= 5:
-        phq9_category = "Mild Depression"
+    phq9_category = get_phq9_category(phq9_score)
     
     # Validate file
     if not file.filename.endswith('.edf'):
@@ -74,16 +87,20 @@ async def submit_combined_assessment(
             detail="Please upload an EDF file"
         )
     
+    profile = _get_profile(profile)
+    
+    temp_path = None
     try:
-        # Save file temporarily
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream the upload to a private temporary directory
+        temp_path, file_hash = await save_upload(file)
         
-        # Process EEG file with model
-        prediction_result = predict_api(temp_path)
-        os.remove(temp_path)
+        # Process EEG file with model on the inference workers
+        prediction_result = await get_executor().submit(
+            temp_path,
+            file_hash=file_hash,
+            profile=profile,
+            subject=str(current_user.id)
+        )
         
         # Create combined assessment record
         db_assessment = models.CombinedAssessment(
@@ -94,7 +111,7 @@ async def submit_combined_assessment(
             prediction=prediction_result["final_prediction"],
             confidence=prediction_result["confidence"],
             segments_analyzed=prediction_result["segments_analyzed"],
-            detailed_results=prediction_result["segment_details"]
+            detailed_results={**prediction_result["segment_details"], "preprocessing_profile": profile}
         )
         
         db.add(db_assessment)
@@ -103,26 +120,270 @@ async def submit_combined_assessment(
         
         return db_assessment
         
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+    finally:
+        discard_upload(temp_path)
+
+def _get_profile(profile: Optional[str]) -> str:
+    try:
+        return resolve_profile(profile)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+def _get_job_dir() -> str:
+    job_dir = settings.JOB_STORAGE_DIR or os.path.join(tempfile.gettempdir(), "eeg-assessment-jobs")
+    os.makedirs(job_dir, exist_ok=True)
+    return job_dir
+
+def _mark_job_stage(job_id: str, stage_name: str):
+    """
+    Record that a job has reached stage_name. Called from the executor's progress thread.
+    
+    The streaming pipeline goes back and forth between stages (each minute of the recording
+    is cleaned, epoched and turned into spectrograms in turn), so a stage at or before the
+    furthest one reached is ignored and the job's progress never goes backwards.
+    """
+    if stage_name not in JOB_STAGES:
+        return
+    
+    position = JOB_STAGES.index(stage_name)
+    db = SessionLocal()
+    try:
+        job = db.query(models.AssessmentJob).filter(models.AssessmentJob.id == job_id).first()
+        if job is None:
+            return
+        reached = [index for index, name in enumerate(JOB_STAGES) if (job.stages or {}).get(name, "pending") != "pending"]
+        if reached and position <= max(reached):
+            return
+        job.stages = {
+            name: "completed" if index < position else "running" if index == position else "pending"
+            for index, name in enumerate(JOB_STAGES)
+        }
+        db.commit()
+    finally:
+        db.close()
+
+async def run_assessment_job(job_id: str):
+    """
+    Background runner: process the stored upload and save the resulting assessment.
+    
+    The job's inference slot was reserved when it was accepted, and is handed to the
+    executor (or given back if the job doesn't get that far).
+    """
+    db = SessionLocal()
+    file_path = None
+    reserved = True
+    try:
+        job = db.query(models.AssessmentJob).filter(models.AssessmentJob.id == job_id).first()
+        if job is None:
+            return
+        file_path = job.file_path
+        file_hash = job.file_hash
+        job.status = "running"
+        db.commit()
+        
+        try:
+            reserved = False
+            prediction_result = await get_executor().submit(
+                file_path,
+                on_stage=lambda stage_name: _mark_job_stage(job_id, stage_name),
+                file_hash=file_hash,
+                profile=job.profile,
+                subject=str(job.user_id),
+                reserved=True
+            )
+            # predict_api reports a failed prediction instead of raising
+            if prediction_result.get("status") == "error":
+                raise RuntimeError(prediction_result.get("error") or "Prediction failed")
+            
+            # Pick up stage updates written by the progress thread
+            db.refresh(job)
+            phq9_score = sum(job.phq9_answers)
+            db_assessment = models.CombinedAssessment(
+                user_id=job.user_id,
+                phq9_answers=job.phq9_answers,
+                phq9_score=phq9_score,
+                phq9_category=get_phq9_category(phq9_score),
+                prediction=prediction_result["final_prediction"],
+                confidence=prediction_result["confidence"],
+                segments_analyzed=prediction_result["segments_analyzed"],
+                detailed_results={**prediction_result["segment_details"], "preprocessing_profile": job.profile}
+            )
+            db.add(db_assessment)
+            db.flush()
+            
+            job.assessment_id = db_assessment.id
+            job.stages = {name: "completed" for name in JOB_STAGES}
+            job.status = "completed"
+            job.file_path = None
+            db.commit()
+        except Exception as e:
+            logger.error(f"Assessment job {job_id} failed: {str(e)}")
+            db.rollback()
+            job = db.query(models.AssessmentJob).filter(models.AssessmentJob.id == job_id).first()
+            job.status = "failed"
+            job.error = str(e)
+            job.file_path = None
+            db.commit()
+    finally:
+        if reserved:
+            get_executor().release()
+        discard_upload(file_path)
+        db.close()
+
+@router.post("/jobs", response_model=schemas.AssessmentJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_assessment_job(
+    phq9_answers: List[int],
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    profile: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Store the upload and queue the EEG assessment, returning a job id to poll
+    """
+    # Validate PHQ-9 answers
+    if len(phq9_answers) != 9 or not all(0 <= answer <= 3 for answer in phq9_answers):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid PHQ-9 answers. Must provide 9 answers, each between 0 and 3"
+        )
+    
+    # Validate file
+    if not file.filename.endswith('.edf'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Please upload an EDF file"
+        )
+    
+    profile = _get_profile(profile)
+    
+    # Hold the job's place in the inference queue from the moment it is accepted,
+    # so it can't be turned away once it has been submitted in the background
+    try:
+        get_executor().reserve()
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    
+    try:
+        try:
+            file_path, file_hash = await save_upload(file, directory=_get_job_dir())
+        except UploadTooLargeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+        
+        job_id = uuid.uuid4().hex
+        job = models.AssessmentJob(
+            id=job_id,
+            user_id=current_user.id,
+            status="queued",
+            stages={name: "pending" for name in JOB_STAGES},
+            phq9_answers=phq9_answers,
+            file_path=file_path,
+            file_hash=file_hash,
+            profile=profile
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except BaseException:
+        get_executor().release()
+        raise
+    
+    background_tasks.add_task(run_assessment_job, job_id)
+    return job
+
+@router.get("/jobs/{job_id}", response_model=schemas.AssessmentJobResponse)
+def get_assessment_job(
+    job_id: str,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the progress of an assessment job and, once completed, its assessment
+    """
+    job = db.query(models.AssessmentJob)\
+        .filter(models.AssessmentJob.id == job_id,
+                models.AssessmentJob.user_id == current_user.id)\
+        .first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job
+
+@router.get("/cache")
+def get_spectrogram_cache_stats(current_admin: models.User = Depends(auth.get_current_admin)):
+    """
+    Size and hit/miss counts of the preprocessed spectrogram cache
+    """
+    counters = get_executor().stats.snapshot()["counters"]
+    usage = get_spectrogram_cache().usage()
+    usage.update({
+        "hits": counters.get("spectrogram_cache_hits", 0),
+        "misses": counters.get("spectrogram_cache_misses", 0),
+    })
+    return usage
+
+@router.delete("/cache")
+def purge_spectrogram_cache(current_admin: models.User = Depends(auth.get_current_admin)):
+    """
+    Remove every cached spectrogram
+    """
+    removed = get_spectrogram_cache().purge()
+    return {"message": "Spectrogram cache purged", "entries_removed": removed}
 
 @router.get("/assessment-history", response_model=List[schemas.CombinedAssessmentResponse])
 def get_assessment_history(
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db),
-    limit: int = 10
+    limit: int = 10,
+    expand_segments: bool = False
 ):
+    """
+    The user's latest assessments. Per-segment predictions come as packed columns
+    (segment_predictions), or as the per-segment list with expand_segments=true
+    """
     assessments = db.query(models.CombinedAssessment)\
         .filter(models.CombinedAssessment.user_id == current_user.id)\
         .order_by(models.CombinedAssessment.created_at.desc())\
         .limit(limit)\
         .all()
-    return assessments
+    
+    # Assessments stored before the packed columns are compacted on the way out
+    segments_view = segments.expand_segments if expand_segments else segments.compact_segments
+    history = []
+    for assessment in assessments:
+        response = schemas.CombinedAssessmentResponse.model_validate(assessment)
+        response.detailed_results = segments_view(response.detailed_results)
+        history.append(response)
+    return history
 
 @router.delete("/assessment/{assessment_id}")
 def delete_assessment(
@@ -154,6 +415,12 @@ async def download_assessment_report(
     """
     Generate and download a PDF report for a specific assessment
     """
+    # ReportLab is only needed here, so keep it out of app startup
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    
     # Get the assessment with the given ID
     assessment = db.query(models.CombinedAssessment)\
         .filter(models.CombinedAssessment.id == assessment_id, 
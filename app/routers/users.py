@@ -71,7 +71,11 @@ def delete_user(
             detail="User not found"
         )
     
-    # Delete user's assessments first to avoid foreign key constraint issues
+    # Delete user's assessment jobs and assessments first to avoid foreign key constraint issues
+    db.query(models.AssessmentJob).filter(
+        models.AssessmentJob.user_id == user.id
+    ).delete(synchronize_session=False)
+    
     db.query(models.CombinedAssessment).filter(
         models.CombinedAssessment.user_id == user.id
     ).delete(synchronize_session=False)
@@ -122,6 +122,20 @@ class CombinedAssessmentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AssessmentJobResponse(BaseModel):
+    id: str
+    status: str
+    stages: Dict[str, str]
+    progress: float
+    profile: str
+    created_at: datetime
+    updated_at: datetime
+    error: Optional[str] = None
+    assessment: Optional[CombinedAssessmentResponse] = None
+
+    class Config:
+        from_attributes = True
+
 class PHQ9Create(BaseModel):
     answers: List[int]
     total_score: int
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from .config import settings
+
+# Allowance over MAX_UPLOAD_MB for the multipart framing and the form fields sent with the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_MB"""
+
+def _too_large_detail():
+    return f"File is larger than the {settings.MAX_UPLOAD_MB} MB upload limit"
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware enforcing MAX_UPLOAD_MB on the raw request body of the upload endpoints.
+
+    Starlette's multipart parser spools the whole body to disk before an endpoint runs,
+    so the limit has to apply while the body is received: a request whose Content-Length
+    is over it gets a 413 before any of it is read, and a body sent without one is cut
+    off with a 413 as soon as it passes the limit. save_upload still checks the file itself.
+
+    Args:
+        app: The ASGI app
+        paths: Paths of the upload endpoints
+    """
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.MAX_UPLOAD_MB * 1024 * 1024 + FORM_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": _too_large_detail()}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing and turned into the response
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def save_upload(file: UploadFile, directory: str = None, filename: str = "recording.edf"):
+    """
+    Stream an upload to a new private temporary directory in fixed-size chunks.
+
+    Only one chunk is held in memory at a time, the size of the file is checked
+    (UploadLimitMiddleware has already bounded the request body), and the SHA-256 of the content is computed on the way so the
+    spectrogram cache doesn't have to read the file again.
+
+    Args:
+        file: The uploaded file
+        directory: Parent folder for the temporary directory (defaults to UPLOAD_DIR)
+        filename: Name of the saved file inside the temporary directory
+
+    Returns:
+        tuple: (path of the saved file, SHA-256 hex digest of its content)
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than MAX_UPLOAD_MB
+    """
+    parent = directory or settings.UPLOAD_DIR or None
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    upload_dir = tempfile.mkdtemp(prefix="eeg-upload-", dir=parent)
+    file_path = os.path.join(upload_dir, filename)
+
+    max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+    chunk_size = settings.UPLOAD_CHUNK_KB * 1024
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLargeError(_too_large_detail())
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise
+
+    return file_path, digest.hexdigest()
+
+def discard_upload(file_path: str):
+    """Remove a file saved by save_upload together with its temporary directory"""
+    if file_path:
+        shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
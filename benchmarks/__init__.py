@@ -0,0 +1 @@
+# Benchmarks for the web app and the EEG pipeline, run with python -m benchmarks.<name>
@@ -0,0 +1,157 @@
+"""
+Latency, memory and accuracy of the model backends: Keras against TFLite (float32,
+float16 and int8).
+
+The create_custom_model architecture is saved once as .h5 and exported to TFLite with
+each quantization (int8 is calibrated on random spectrograms). Every backend then runs
+in a fresh interpreter, which reports the time to import its runtime and load the
+model, the RSS once loaded and at the end, and the median latency of several request
+sizes (segments per recording). Outputs on a fixed input set are compared with the
+Keras backend: largest absolute difference and agreement of the predicted class.
+
+Without ai-edge-litert or tflite-runtime installed the TFLite backend runs on
+TensorFlow's interpreter, so its import time and RSS include TensorFlow.
+
+Usage:
+    python -m benchmarks.backends [--segments 20 100 200 500] [--runs 20] [--json report.json]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKENDS = [
+    ("keras", None),
+    ("tflite", "none"),
+    ("tflite", "float16"),
+    ("tflite", "int8"),
+]
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_child(config_path):
+    """Run in the child interpreter: load one backend, time it and write the results to config_path"""
+    with open(config_path) as f:
+        config = json.load(f)
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    if config["backend"] == "keras":
+        from tensorflow import keras
+        from app.ml.model import CompiledModel
+        predictor = CompiledModel(keras.models.load_model(config["model_path"]))
+    else:
+        from app.ml.model import TFLiteModel
+        predictor = TFLiteModel(config["model_path"])
+    import numpy as np
+    from app.ml.model import MODEL_INPUT_SHAPE
+
+    predictor.predict(np.zeros((2, *MODEL_INPUT_SHAPE), dtype=np.float32))
+    load_seconds = time.perf_counter() - start
+    loaded_rss = rss_mb()
+
+    rng = np.random.default_rng(0)
+    latencies = {}
+    for segments in config["segments"]:
+        inputs = rng.random((segments, *MODEL_INPUT_SHAPE), dtype=np.float32)
+        predictor.predict(inputs)
+        timings = []
+        for _ in range(config["runs"]):
+            start = time.perf_counter()
+            predictor.predict(inputs)
+            timings.append(time.perf_counter() - start)
+        latencies[str(segments)] = round(statistics.median(timings), 5)
+
+    reference = np.load(config["reference_inputs"])
+    results = {
+        "load_seconds": round(load_seconds, 3),
+        "baseline_rss_mb": round(baseline, 1),
+        "loaded_rss_mb": round(loaded_rss, 1),
+        "latency_seconds": latencies,
+        "outputs": predictor.predict(reference).tolist(),
+    }
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    with open(config_path, "w") as f:
+        json.dump(results, f)
+
+def benchmark(backend, model_path, reference_inputs, segments, runs):
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"backend": backend, "model_path": model_path, "reference_inputs": reference_inputs,
+                   "segments": segments, "runs": runs}, f)
+        config_path = f.name
+    try:
+        command = [sys.executable, "-m", "benchmarks.backends", "--child", config_path]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmarking {backend} failed:\n{completed.stderr[-2000:]}")
+        with open(config_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(config_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, nargs="+", default=[20, 100, 200, 500], help="Segments per request")
+    parser.add_argument("--runs", type=int, default=20, help="Timed calls per request size")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    import numpy as np
+    from app.ml.export import export_tflite
+    from app.ml.model import MODEL_INPUT_SHAPE, create_custom_model
+
+    rng = np.random.default_rng(1)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="eeg-backends-") as directory:
+        model = create_custom_model()
+        model_paths = {"keras": os.path.join(directory, "model.h5")}
+        model.save(model_paths["keras"])
+        calibration = rng.random((200, *MODEL_INPUT_SHAPE), dtype=np.float32)
+        for _, quantize in BACKENDS[1:]:
+            model_paths[quantize] = os.path.join(directory, f"model-{quantize}.tflite")
+            export_tflite(model, model_paths[quantize], quantize, calibration)
+
+        reference_inputs = os.path.join(directory, "reference.npy")
+        np.save(reference_inputs, rng.random((200, *MODEL_INPUT_SHAPE), dtype=np.float32))
+
+        for backend, quantize in BACKENDS:
+            model_path = model_paths[quantize or backend]
+            result = {"backend": backend, "quantize": quantize, "model_kb": round(os.path.getsize(model_path) / 1024, 1)}
+            result.update(benchmark(backend, model_path, reference_inputs, args.segments, args.runs))
+            results.append(result)
+
+    reference = np.array(results[0]["outputs"])
+    print(f"{'backend':<16}  {'model (KB)':>10}  {'load (s)':>8}  {'RSS (MB)':>8}  {'max |diff|':>10}  {'agreement':>9}  "
+          + "  ".join(f"{segments:>5} seg (s)" for segments in args.segments))
+    for result in results:
+        outputs = np.array(result.pop("outputs"))
+        result["max_abs_diff"] = float(np.abs(outputs - reference).max())
+        result["class_agreement"] = float((outputs.argmax(axis=1) == reference.argmax(axis=1)).mean())
+        name = result["backend"] + (f" {result['quantize']}" if result["quantize"] else "")
+        print(f"{name:<16}  {result['model_kb']:>10}  {result['load_seconds']:>8.2f}  {result['loaded_rss_mb']:>8.1f}  "
+              f"{result['max_abs_diff']:>10.2e}  {result['class_agreement']:>9.3f}  "
+              + "  ".join(f"{result['latency_seconds'][str(segments)]:>13.5f}" for segments in args.segments))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
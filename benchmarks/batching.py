@@ -0,0 +1,96 @@
+"""
+Load test of the micro-batching scheduler in front of the model.
+
+Concurrent clients each send --requests predictions of --segments segments (a 5 minute
+recording gives about 100) straight to the model, first without batching (one forward
+pass per request, serialized by a lock) and then through MicroBatcher for every
+--max-wait value. The report gives segments per second and the p50/p95 latency of a
+request, to choose MODEL_BATCH_MAX_WAIT_MS for the expected concurrency.
+
+Usage:
+    python -m benchmarks.batching [--clients 1 4 8] [--segments 100] [--requests 5]
+                                  [--max-wait 0 2 5 10 20] [--json report.json]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(round(fraction * (len(values) - 1))), len(values) - 1)]
+
+def load_test(predict, clients, segments, requests):
+    """Run clients threads calling predict and return throughput and latencies"""
+    import numpy as np
+    from app.ml.model import MODEL_INPUT_SHAPE
+
+    inputs = np.random.default_rng(0).random((segments, *MODEL_INPUT_SHAPE), dtype=np.float32)
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client():
+        barrier.wait()
+        for _ in range(requests):
+            start = time.perf_counter()
+            predict(inputs)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "segments_per_second": round(clients * requests * segments / wall, 1),
+        "p50_latency_seconds": round(statistics.median(latencies), 4),
+        "p95_latency_seconds": round(percentile(latencies, 0.95), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 8], help="Concurrent clients")
+    parser.add_argument("--segments", type=int, default=100, help="Segments per request")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client")
+    parser.add_argument("--max-wait", type=float, nargs="+", default=[0, 2, 5, 10, 20], help="Batching windows in ms")
+    parser.add_argument("--max-batch-size", type=int, default=512, help="Segments that trigger a forward pass")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    from app.ml.model import MicroBatcher
+    from app.ml.registry import registry
+
+    registry.warm_up()
+    predictor = registry.get_predictor()
+    model_lock = threading.Lock()
+
+    def direct(inputs):
+        with model_lock:
+            return predictor.predict(inputs)
+
+    results = []
+    print(f"{'clients':>7}  {'mode':>14}  {'segments/s':>10}  {'p50 (s)':>8}  {'p95 (s)':>8}")
+    for clients in args.clients:
+        modes = [("unbatched", direct)]
+        for max_wait in args.max_wait:
+            batcher = MicroBatcher(predictor.predict, max_wait / 1000, args.max_batch_size)
+            modes.append((f"batched {max_wait:g} ms", batcher.predict))
+        for mode, predict in modes:
+            result = {"clients": clients, "mode": mode}
+            result.update(load_test(predict, clients, args.segments, args.requests))
+            results.append(result)
+            print(f"{clients:>7}  {mode:>14}  {result['segments_per_second']:>10.1f}  "
+                  f"{result['p50_latency_seconds']:>8.4f}  {result['p95_latency_seconds']:>8.4f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"segments": args.segments, "requests": args.requests, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
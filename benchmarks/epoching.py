@@ -0,0 +1,100 @@
+"""
+Compare the epoching of the pipeline (EpochWindows) with the MNE path it replaced.
+
+For every recording length a synthetic recording is written, filtered and reduced to
+the 17 channels, and its 5 s epochs with 2 s overlap are turned into the channel means
+the spectrograms are computed from, in two ways:
+
+- mne: make_fixed_length_epochs, drop_bad with reject_criteria, get_data and the mean
+  across channels of the epoch array
+- windows: make_epochs, reject_epochs and EpochWindows.channel_means, which never copy
+  the epochs out of the recording
+
+The report gives the median time of --repeats runs and the peak memory allocated
+(tracemalloc) by each, and checks that both give the same channel means.
+
+Usage:
+    python -m benchmarks.epoching [--minutes 5 20 60] [--channels 20] [--repeats 3] [--json report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from .synthetic import make_recording
+
+def mne_path(data):
+    import mne
+    from app.ml.preprocessing import PIPELINE_PARAMS, reject_criteria
+    params = PIPELINE_PARAMS["epochs"]
+    epochs = mne.make_fixed_length_epochs(data, duration=params["duration"], overlap=params["overlap"], verbose="error")
+    epochs.drop_bad(reject=dict(eeg=reject_criteria), verbose="error")
+    return epochs.get_data(verbose="error").mean(axis=1).astype(np.float32)
+
+def windows_path(data):
+    from app.ml.preprocessing import make_epochs, reject_epochs
+    return reject_epochs(make_epochs(data)).channel_means(np.float32)
+
+def measure(run, data, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(data)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        result = run(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": round(statistics.median(timings), 4), "peak_mb": round(peak / 1024 / 1024, 1)}
+
+def benchmark(minutes, n_channels, repeats):
+    import mne
+    mne.set_log_level("ERROR")
+    from app.ml import preprocessing
+
+    with tempfile.TemporaryDirectory(prefix="eeg-epoching-") as directory:
+        path = make_recording(os.path.join(directory, "recording.edf"), minutes, n_channels)
+        data = preprocessing.read_recording(path)
+    for step in (preprocessing.set_reference, preprocessing.bandpass_filter,
+                 preprocessing.notch_filter, preprocessing.select_channels):
+        step(data)
+
+    expected, mne_stats = measure(mne_path, data, repeats)
+    means, windows_stats = measure(windows_path, data, repeats)
+    if not np.array_equal(means, expected):
+        raise AssertionError(f"Channel means of the two paths differ for {minutes} min")
+    return {
+        "minutes": minutes,
+        "epochs": len(means),
+        "recording_mb": round(data.get_data().nbytes / 1024 / 1024, 1),
+        "mne": mne_stats,
+        "windows": windows_stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 20, 60], help="Recording lengths")
+    parser.add_argument("--channels", type=int, default=20, help="Channel layout of the synthetic recordings")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs of each path")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    results = [benchmark(minutes, args.channels, args.repeats) for minutes in args.minutes]
+
+    print(f"{'minutes':>7}  {'epochs':>6}  {'recording':>9}  {'mne (s)':>8}  {'windows (s)':>11}  {'mne peak':>8}  {'windows peak':>12}")
+    for result in results:
+        print(f"{result['minutes']:>7g}  {result['epochs']:>6}  {result['recording_mb']:>6.1f} MB  "
+              f"{result['mne']['seconds']:>8.3f}  {result['windows']['seconds']:>11.3f}  "
+              f"{result['mne']['peak_mb']:>5.1f} MB  {result['windows']['peak_mb']:>9.1f} MB")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"channels": args.channels, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Per-request model latency of model.predict against the compiled forward pass.
+
+Both paths run the create_custom_model architecture on random inputs of the model's
+input shape, for several request sizes (segments per recording). The compiled path is
+what predict_api uses: CompiledModel, a tf.function with a fixed input signature and
+inputs padded to PREDICT_BUCKETS.
+
+Usage:
+    python -m benchmarks.inference [--segments 20 100 200 500] [--runs 20] [--json report.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+def time_calls(predict, inputs, runs):
+    predict(inputs)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(inputs)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, nargs="+", default=[20, 100, 200, 500], help="Segments per request")
+    parser.add_argument("--runs", type=int, default=20, help="Timed calls per request size")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    import numpy as np
+    from app.ml.model import CompiledModel, MODEL_INPUT_SHAPE, create_custom_model
+
+    model = create_custom_model()
+    compiled = CompiledModel(model)
+    rng = np.random.default_rng(0)
+
+    results = []
+    print(f"{'segments':>8}  {'model.predict (s)':>17}  {'compiled (s)':>12}  {'speed-up':>8}")
+    for segments in args.segments:
+        inputs = rng.random((segments, *MODEL_INPUT_SHAPE), dtype=np.float32)
+        before = time_calls(lambda batch: model.predict(batch, verbose=0), inputs, args.runs)
+        after = time_calls(compiled.predict, inputs, args.runs)
+        results.append({
+            "segments": segments,
+            "predict_seconds": round(before, 5),
+            "compiled_seconds": round(after, 5),
+            "speedup": round(before / after, 2),
+        })
+        print(f"{segments:>8}  {before:>17.5f}  {after:>12.5f}  {before / after:>7.2f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
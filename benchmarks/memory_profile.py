@@ -0,0 +1,85 @@
+"""
+Measure peak memory of preprocessing one recording, per recording length.
+
+For every length a synthetic recording is written and process_for_prediction runs on it
+in a fresh interpreter, with the spectrogram cache disabled. The peak resident set size
+is reported together with the baseline after imports, so the difference is what one
+assessment costs on top of an idle worker. Use it to size worker containers.
+
+Usage:
+    python -m benchmarks.memory_profile [--minutes 1 5 10 20] [--channels 20] [--json report.json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from .synthetic import make_recording
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def profile_child(path):
+    """Run in the child interpreter: preprocess path and print the measurements as JSON"""
+    from app.ml.preprocessing import process_for_prediction
+    from app.ml.registry import registry
+
+    registry.get_scaler()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    X_data = process_for_prediction(path)
+    print(json.dumps({
+        "baseline_mb": round(baseline, 1),
+        "peak_mb": round(peak_rss_mb(), 1),
+        "seconds": round(time.perf_counter() - start, 3),
+        "epochs": int(X_data.shape[0]),
+        "output_mb": round(X_data.nbytes / 1024 / 1024, 3),
+    }))
+
+def measure(path):
+    env = os.environ.copy()
+    env["SPECTROGRAM_CACHE_MAX_MB"] = "0"
+    command = [sys.executable, "-m", "benchmarks.memory_profile", "--child", path]
+    completed = subprocess.run(command, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Profiling {path} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 10, 20], help="Recording lengths to profile")
+    parser.add_argument("--channels", type=int, default=20, help="Channel layout of the synthetic recordings")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        profile_child(args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="eeg-memory-") as directory:
+        for minutes in args.minutes:
+            path = make_recording(os.path.join(directory, f"{minutes}min.edf"), minutes, args.channels)
+            result = measure(path)
+            result.update({
+                "minutes": minutes,
+                "file_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+                "assessment_mb": round(result["peak_mb"] - result["baseline_mb"], 1),
+            })
+            os.remove(path)
+            results.append(result)
+            print(f"{minutes:>6} min  file {result['file_mb']:>7.2f} MB  epochs {result['epochs']:>5}  "
+                  f"peak RSS {result['peak_mb']:>8.1f} MB  (+{result['assessment_mb']:.1f} MB over baseline)  "
+                  f"{result['seconds']:.2f}s")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"channels": args.channels, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
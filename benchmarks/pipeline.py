@@ -0,0 +1,304 @@
+"""
+Benchmark every stage of the EEG pipeline, in isolation and end to end.
+
+For every recording length and channel layout a synthetic recording is written and
+benchmarked in a fresh interpreter (with the spectrogram cache disabled):
+
+- isolated: each stage (read, reference, bandpass, notch, channels, ica, epoching,
+  rejection, scaling, spectrogram, predict) runs --repeats times on a fresh copy of
+  the output of the stage before it, then once more under tracemalloc to measure the
+  peak memory it allocates
+- end to end: predict_api runs --repeats times, timed per stage by StageTimer
+
+The report gives median times, throughput (seconds of recording processed per second,
+and epochs per second) and the peak RSS of the process. It can be written as JSON and
+markdown, and compared with a previous JSON report to catch regressions.
+
+Usage:
+    python -m benchmarks.pipeline [--minutes 1 5 10] [--channels 20 22] [--repeats 3] [--profile full]
+                                  [--json report.json] [--markdown report.md]
+                                  [--compare baseline.json] [--tolerance 0.25]
+
+Exits with status 1 if --compare finds a stage more than --tolerance slower than the baseline.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from .synthetic import make_recording
+
+STAGES = [
+    "read", "reference", "bandpass", "notch", "channels", "ica",
+    "epoching", "rejection", "scaling", "spectrogram", "predict",
+]
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def pipeline_steps(profile):
+    """
+    The pipeline as (stage name, prepare, run) triples.
+
+    prepare turns the previous stage's output into a fresh input, so steps that modify
+    their input in place can be repeated; only run is timed.
+    """
+    from app.ml import preprocessing
+    from app.ml.model import model_inputs
+    from app.ml.registry import registry
+
+    def copy(data):
+        return data.copy()
+
+    def same(value):
+        return value
+
+    def predict(spectrograms):
+        # The forward pass predict_api runs, for the configured MODEL_BACKEND and MODEL_PRECISION
+        return registry.get_predictor().predict(model_inputs(spectrograms))
+
+    return [
+        ("read", same, preprocessing.read_recording),
+        ("reference", copy, preprocessing.set_reference),
+        ("bandpass", copy, preprocessing.bandpass_filter),
+        ("notch", copy, preprocessing.notch_filter),
+        ("channels", copy, preprocessing.select_channels),
+        ("ica", copy, lambda data: preprocessing.apply_ica(data, profile, subject="benchmark-subject")),
+        ("epoching", same, preprocessing.make_epochs),
+        ("rejection", same, preprocessing.reject_epochs),
+        ("scaling", same, lambda array: preprocessing.scale_channel_means(array, registry.get_scaler())),
+        ("spectrogram", same, preprocessing.compute_spectrograms),
+        ("predict", same, predict),
+    ]
+
+def run_isolated(path, profile, repeats):
+    results = {}
+    value = path
+    for name, prepare, run in pipeline_steps(profile):
+        timings = []
+        output = None
+        try:
+            for _ in range(repeats):
+                step_input = prepare(value)
+                start = time.perf_counter()
+                output = run(step_input)
+                timings.append(time.perf_counter() - start)
+
+            step_input = prepare(value)
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            run(step_input)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+        except Exception as e:
+            tracemalloc.stop()
+            # Later stages can't run without this one's output
+            results[name] = {"error": " ".join(str(e).split())[:200]}
+            if output is None:
+                break
+            value = output
+            continue
+
+        results[name] = {
+            "median_seconds": round(statistics.median(timings), 4),
+            "min_seconds": round(min(timings), 4),
+            "peak_alloc_mb": round(peak / 1024 / 1024, 2),
+        }
+        value = output
+    return results
+
+def run_end_to_end(path, profile, repeats):
+    from app.ml.model import predict_api
+    from app.ml.stages import StageTimer
+
+    walls = []
+    stages = {}
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with StageTimer() as timer:
+            result = predict_api(path, profile=profile, subject="benchmark-subject")
+        walls.append(time.perf_counter() - start)
+        for name, seconds in timer.timings.items():
+            stages.setdefault(name, []).append(seconds)
+    return {
+        "median_seconds": round(statistics.median(walls), 4),
+        "stages": {name: round(statistics.median(values), 4) for name, values in stages.items()},
+        "status": result["status"],
+        "segments_analyzed": result["segments_analyzed"],
+    }
+
+def run_child(config_path):
+    """Run in the child interpreter: benchmark one recording and write the results to config_path"""
+    import mne
+    mne.set_log_level("ERROR")
+    from app.ml.preprocessing import preprocess_eeg
+    from app.ml.registry import registry
+
+    with open(config_path) as f:
+        config = json.load(f)
+
+    registry.warm_up()
+    baseline = peak_rss_mb()
+    epochs = len(preprocess_eeg(config["path"], config["profile"], subject="benchmark-subject"))
+    results = {
+        "baseline_rss_mb": round(baseline, 1),
+        "epochs": epochs,
+        "isolated": run_isolated(config["path"], config["profile"], config["repeats"]),
+        "end_to_end": run_end_to_end(config["path"], config["profile"], config["repeats"]),
+    }
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    with open(config_path, "w") as f:
+        json.dump(results, f)
+
+def benchmark(path, profile, repeats):
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"path": path, "profile": profile, "repeats": repeats}, f)
+        config_path = f.name
+    env = os.environ.copy()
+    env["SPECTROGRAM_CACHE_MAX_MB"] = "0"
+    try:
+        command = [sys.executable, "-m", "benchmarks.pipeline", "--child", config_path]
+        completed = subprocess.run(command, capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmarking {path} failed:\n{completed.stderr[-2000:]}")
+        with open(config_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(config_path)
+
+def add_throughput(result):
+    recording_seconds = result["minutes"] * 60
+    for entry in result["isolated"].values():
+        if entry.get("median_seconds"):
+            entry["realtime_factor"] = round(recording_seconds / entry["median_seconds"], 1)
+    end_to_end = result["end_to_end"]
+    end_to_end["realtime_factor"] = round(recording_seconds / end_to_end["median_seconds"], 1)
+    end_to_end["epochs_per_second"] = round(result["epochs"] / end_to_end["median_seconds"], 2)
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def to_markdown(report):
+    lines = [
+        f"# Pipeline benchmark ({report['commit'] or 'unknown commit'}, {report['timestamp']})",
+        "",
+        f"Profile `{report['profile']}`, model `{report['backend']}`/`{report['precision']}`, {report['repeats']} repeats, Python {report['python']}, {report['cpus']} CPU(s)",
+    ]
+    for result in report["results"]:
+        end_to_end = result["end_to_end"]
+        lines += [
+            "",
+            f"## {result['minutes']} min, {result['channels']} channels ({result['epochs']} epochs)",
+            "",
+            f"End to end: {end_to_end['median_seconds']:.3f}s ({end_to_end['realtime_factor']}x realtime, "
+            f"{end_to_end['epochs_per_second']} epochs/s, status {end_to_end['status']}), "
+            f"peak RSS {result['peak_rss_mb']} MB (baseline {result['baseline_rss_mb']} MB)",
+            "",
+            "| stage | median (s) | min (s) | x realtime | peak alloc (MB) |",
+            "|---|---|---|---|---|",
+        ]
+        for name in STAGES:
+            entry = result["isolated"].get(name)
+            if entry is None:
+                continue
+            if "error" in entry:
+                lines.append(f"| {name} | error: {entry['error'][:80]} | | | |")
+                continue
+            lines.append(f"| {name} | {entry['median_seconds']:.4f} | {entry['min_seconds']:.4f} | "
+                         f"{entry.get('realtime_factor', '')} | {entry['peak_alloc_mb']} |")
+    return "\n".join(lines) + "\n"
+
+def compare(report, baseline, tolerance):
+    """Return the stages that got more than tolerance slower than in baseline"""
+    previous = {(result["minutes"], result["channels"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["minutes"], result["channels"]))
+        if old is None:
+            continue
+        pairs = [("end_to_end", result["end_to_end"], old["end_to_end"])]
+        pairs += [(name, entry, old["isolated"].get(name, {})) for name, entry in result["isolated"].items()]
+        for name, new_entry, old_entry in pairs:
+            new_seconds, old_seconds = new_entry.get("median_seconds"), old_entry.get("median_seconds")
+            if new_seconds and old_seconds and new_seconds > old_seconds * (1 + tolerance):
+                regressions.append(f"{result['minutes']} min / {result['channels']} channels, {name}: "
+                                   f"{old_seconds:.4f}s -> {new_seconds:.4f}s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 10], help="Recording lengths")
+    parser.add_argument("--channels", type=int, nargs="+", default=[20, 22], help="Channel layouts")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs of every stage")
+    parser.add_argument("--profile", default="full", help="Preprocessing profile")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report as JSON")
+    parser.add_argument("--markdown", dest="markdown_path", default=None, help="Write the report as markdown")
+    parser.add_argument("--compare", default=None, help="JSON report of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against --compare")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    from app.config import settings
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "profile": args.profile,
+        "backend": settings.MODEL_BACKEND,
+        "precision": settings.MODEL_PRECISION,
+        "repeats": args.repeats,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="eeg-benchmark-") as directory:
+        for channels in args.channels:
+            for minutes in args.minutes:
+                path = make_recording(os.path.join(directory, f"{minutes}min-{channels}ch.edf"), minutes, channels)
+                result = {"minutes": minutes, "channels": channels}
+                result.update(benchmark(path, args.profile, args.repeats))
+                add_throughput(result)
+                os.remove(path)
+                report["results"].append(result)
+                print(f"{minutes} min, {channels} channels: {result['end_to_end']['median_seconds']:.2f}s end to end, "
+                      f"peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    markdown = to_markdown(report)
+    print(markdown)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.markdown_path:
+        with open(args.markdown_path, "w") as f:
+            f.write(markdown)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
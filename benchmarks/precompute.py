@@ -0,0 +1,103 @@
+"""
+Per-request savings of the filter and montage precomputation caches.
+
+The pipeline designs its FIR filters once per sampling rate (fir_kernel) and builds
+the 10-20 montage once per process (standard_montage). This runs the filtering stage of
+preprocess_eeg (band-pass, notch, channel selection with the montage, and the ICA
+high-pass) on a synthetic recording with the caches cleared before every run, as
+every request used to, and with them warm, and reports the median time of each
+step and of the precomputed objects on their own.
+
+Usage:
+    python -m benchmarks.precompute [--minutes 5] [--channels 22] [--repeats 10] [--json report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from .synthetic import make_recording
+
+def median_ms(run, repeats, before=None):
+    timings = []
+    for _ in range(repeats):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings) * 1000, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5, help="Length of the recording")
+    parser.add_argument("--channels", type=int, default=22, help="Channel layout, 20 or 22")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs of every step")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    import mne
+    mne.set_log_level("ERROR")
+    from app.ml import filters, preprocessing
+
+    def clear():
+        filters.fir_kernel.cache_clear()
+        preprocessing.standard_montage.cache_clear()
+
+    with tempfile.TemporaryDirectory(prefix="eeg-precompute-") as directory:
+        path = make_recording(os.path.join(directory, "recording.edf"), args.minutes, args.channels)
+        raw = preprocessing.set_reference(preprocessing.read_recording(path))
+
+    sfreq, n_times = raw.info["sfreq"], raw.n_times
+    l_freq, h_freq = preprocessing.PIPELINE_PARAMS["bandpass"]
+    notch = filters.notch_design(preprocessing.PIPELINE_PARAMS["notch"])
+    highpass, decim = preprocessing.PIPELINE_PARAMS["ica"]["highpass"], preprocessing.PIPELINE_PARAMS["ica"]["decim"]
+    selected = preprocessing.select_channels(raw.copy())
+
+    objects = {
+        "bandpass kernel": lambda: filters.fir_kernel(sfreq, l_freq, h_freq),
+        "notch kernel": lambda: filters.fir_kernel(sfreq, *notch),
+        "high-pass kernel": lambda: filters.fir_kernel(sfreq, highpass, None),
+        "montage": preprocessing.standard_montage,
+    }
+    steps = {
+        "bandpass": lambda data: preprocessing.bandpass_filter(data),
+        "notch": lambda data: preprocessing.notch_filter(data),
+        "channels": lambda data: preprocessing.select_channels(data),
+        "ica high-pass": lambda data: filters.decimated_filter(data, highpass, None, decim),
+    }
+
+    results = {"objects": {}, "steps": {}}
+    # Each precomputed object on its own: built from scratch against served from the cache
+    for name, build in objects.items():
+        cold = median_ms(build, args.repeats, before=clear)
+        build()
+        warm = median_ms(build, args.repeats)
+        results["objects"][name] = {"cold_ms": cold, "warm_ms": warm}
+
+    for name, step in steps.items():
+        source = selected if name == "ica high-pass" else raw
+        copies = []
+        cold = median_ms(lambda: step(copies.pop()), args.repeats,
+                         before=lambda: (clear(), copies.append(source.copy())))
+        warm = median_ms(lambda: step(copies.pop()), args.repeats, before=lambda: copies.append(source.copy()))
+        results["steps"][name] = {"cold_ms": cold, "warm_ms": warm, "saved_ms": round(cold - warm, 2)}
+
+    saved = round(sum(entry["saved_ms"] for entry in results["steps"].values()), 2)
+    print(f"{args.minutes} min, {args.channels} channels, {n_times} samples at {sfreq:g} Hz")
+    print(f"\n{'object':<20}  {'built (ms)':>10}  {'cached (ms)':>11}")
+    for name, entry in results["objects"].items():
+        print(f"{name:<20}  {entry['cold_ms']:>10.2f}  {entry['warm_ms']:>11.3f}")
+    print(f"\n{'step':<20}  {'cold (ms)':>9}  {'warm (ms)':>9}  {'saved (ms)':>10}")
+    for name, entry in results["steps"].items():
+        print(f"{name:<20}  {entry['cold_ms']:>9.2f}  {entry['warm_ms']:>9.2f}  {entry['saved_ms']:>10.2f}")
+    print(f"\nSaved per request: {saved:.2f} ms")
+
+    if args.json_path:
+        results["saved_ms"] = saved
+        with open(args.json_path, "w") as f:
+            json.dump({"minutes": args.minutes, "channels": args.channels, **results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare the preprocessing profiles on synthetic recordings of one subject.
+
+Every recording runs through predict_api with each profile. The fast profile's ICA cache
+starts empty, so the first recording fits the subject's ICA and the rest reuse it. The
+report gives the wall time per profile, the ICA stage time, and how closely the fast
+profile's spectrograms and predictions agree with the full profile.
+
+Usage:
+    python -m benchmarks.profiles [--recordings 4] [--minutes 5] [--channels 20] [--json report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from .synthetic import make_recording
+
+SUBJECT = "benchmark-subject"
+
+def run(path, profile):
+    """Return (prediction result, wall seconds, stage timings, spectrograms) for one recording"""
+    from app.ml.model import predict_api
+    from app.ml.preprocessing import process_for_prediction
+    from app.ml.stages import StageTimer
+
+    start = time.perf_counter()
+    with StageTimer() as timer:
+        result = predict_api(path, profile=profile, subject=SUBJECT)
+    wall = time.perf_counter() - start
+    # Served from the spectrogram cache filled by predict_api
+    spectrograms = process_for_prediction(path, profile=profile, subject=SUBJECT)
+    return result, wall, timer.timings, spectrograms
+
+def segment_labels(result):
+    from app.ml.segments import segment_labels, unpack_segments
+    return segment_labels(*unpack_segments(result["segment_details"]["segment_predictions"])).tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", type=int, default=4, help="Number of recordings of the subject")
+    parser.add_argument("--minutes", type=float, default=5, help="Length of each recording")
+    parser.add_argument("--channels", type=int, default=20, help="Channel layout of the synthetic recordings")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    import numpy as np
+
+    with tempfile.TemporaryDirectory(prefix="eeg-profiles-") as directory:
+        # Fresh caches, read by the settings when app.ml is first imported
+        os.environ["ICA_CACHE_DIR"] = os.path.join(directory, "ica")
+        os.environ["SPECTROGRAM_CACHE_DIR"] = os.path.join(directory, "spectrograms")
+        from app.ml.registry import registry
+        registry.warm_up()
+
+        walls = {"full": [], "fast": []}
+        ica = {"full": [], "fast": []}
+        recordings = []
+        for index in range(args.recordings):
+            path = make_recording(os.path.join(directory, f"{index}.edf"), args.minutes, args.channels, seed=index)
+            runs = {}
+            for profile in ["full", "fast"]:
+                result, wall, timings, spectrograms = run(path, profile)
+                walls[profile].append(wall)
+                ica[profile].append(timings.get("ica", 0.0))
+                runs[profile] = (result, spectrograms)
+
+            (full_result, full_spectrograms), (fast_result, fast_spectrograms) = runs["full"], runs["fast"]
+            difference = np.abs(full_spectrograms - fast_spectrograms)
+            entry = {
+                "recording": index,
+                "full_seconds": round(walls["full"][-1], 3),
+                "fast_seconds": round(walls["fast"][-1], 3),
+                "spectrogram_max_abs_diff": round(float(difference.max()), 6) if difference.size else 0.0,
+                "spectrogram_mean_abs_diff": round(float(difference.mean()), 6) if difference.size else 0.0,
+            }
+            if full_result["status"] == "success" and fast_result["status"] == "success":
+                full_labels, fast_labels = segment_labels(full_result), segment_labels(fast_result)
+                entry["same_final_prediction"] = full_result["final_prediction"] == fast_result["final_prediction"]
+                entry["segment_agreement"] = round(
+                    sum(a == b for a, b in zip(full_labels, fast_labels)) / max(len(full_labels), 1), 4
+                )
+            else:
+                error = full_result.get("error") or fast_result.get("error") or ""
+                entry["prediction_error"] = " ".join(error.split())[:200]
+            recordings.append(entry)
+            print(f"recording {index}: full {entry['full_seconds']:.2f}s, fast {entry['fast_seconds']:.2f}s, "
+                  f"spectrogram mean |diff| {entry['spectrogram_mean_abs_diff']:.4f}, "
+                  f"final prediction agrees: {entry.get('same_final_prediction', 'n/a')}")
+
+    report = {
+        "recordings": args.recordings,
+        "minutes": args.minutes,
+        "channels": args.channels,
+        "profiles": {
+            profile: {
+                "median_seconds": round(statistics.median(walls[profile]), 3),
+                "median_ica_seconds": round(statistics.median(ica[profile]), 3),
+            }
+            for profile in walls
+        },
+        "per_recording": recordings,
+    }
+    agreements = [entry["same_final_prediction"] for entry in recordings if "same_final_prediction" in entry]
+    if agreements:
+        report["final_prediction_agreement"] = round(sum(agreements) / len(agreements), 4)
+
+    for profile, summary in report["profiles"].items():
+        print(f"{profile:>5}: median {summary['median_seconds']:.2f}s per recording, "
+              f"ICA {summary['median_ica_seconds']:.2f}s")
+    if agreements:
+        print(f"Final prediction agreement: {report['final_prediction_agreement']:.0%}")
+    else:
+        print("Predictions unavailable, compare the spectrogram differences instead")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Parity report of the int8 quantized model against the float model.
+
+The float model is the one the keras backend serves (model.h5, or the fallback model).
+Unless --int8-model points at an existing artifact, it is quantized to int8 with a
+calibration set collected (app.ml.calibration) from synthetic recordings, then both
+models run on a held-out set of synthetic recordings made with other seeds. For every
+recording the report gives the share of segments whose predicted class agrees, whether
+the final prediction (majority vote, as in predict_api) agrees and the largest
+difference of the MDD confidence; the summary pools them.
+
+--source random uses random model inputs instead of preprocessed recordings, for trees
+where the pipeline's spectrograms don't fit the model's input shape.
+
+Usage:
+    python -m benchmarks.quantization [--recordings 6] [--calibration-recordings 4] [--minutes 2]
+                                      [--source pipeline|random] [--int8-model model-int8.tflite]
+                                      [--json report.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from .synthetic import make_recording
+
+def final_prediction(outputs):
+    """Majority vote over the segments, ties going to Healthy as in predict_api"""
+    healthy = int((outputs.argmax(axis=1) == 0).sum())
+    return "Healthy" if healthy >= len(outputs) - healthy else "Major Depressive Disorder"
+
+def make_inputs(args, directory, seeds):
+    """One batch of model inputs per recording, preprocessed or random"""
+    import numpy as np
+    from app.ml.model import MODEL_INPUT_SHAPE, model_inputs
+
+    if args.source == "random":
+        return [np.random.default_rng(seed).random((args.segments, *MODEL_INPUT_SHAPE), dtype=np.float32)
+                for seed in seeds]
+
+    from app.ml.preprocessing import process_for_prediction
+    inputs = []
+    for seed in seeds:
+        path = make_recording(os.path.join(directory, f"recording-{seed}.edf"), args.minutes, seed=seed)
+        inputs.append(model_inputs(process_for_prediction(path, profile=args.profile)))
+        os.remove(path)
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", type=int, default=6, help="Held-out recordings to compare on")
+    parser.add_argument("--calibration-recordings", type=int, default=4, help="Recordings to calibrate on")
+    parser.add_argument("--minutes", type=float, default=2, help="Length of each recording")
+    parser.add_argument("--profile", default="full", help="Preprocessing profile")
+    parser.add_argument("--source", choices=["pipeline", "random"], default="pipeline", help="Where model inputs come from")
+    parser.add_argument("--segments", type=int, default=100, help="Segments per recording with --source random")
+    parser.add_argument("--max-samples", type=int, default=500, help="Calibration segments")
+    parser.add_argument("--int8-model", default=None, help="Evaluate this int8 model instead of exporting one")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    # Keep synthetic recordings out of the spectrogram cache
+    os.environ["SPECTROGRAM_CACHE_MAX_MB"] = "0"
+    import mne
+    mne.set_log_level("ERROR")
+    import numpy as np
+    from app.ml.calibration import collect_calibration
+    from app.ml.export import export_tflite
+    from app.ml.model import CompiledModel, TFLiteModel, MODEL_INPUT_SHAPE
+    from app.ml.registry import registry
+
+    model = registry.get_model()
+    with tempfile.TemporaryDirectory(prefix="eeg-quantization-") as directory:
+        int8_path = args.int8_model
+        calibration_segments = None
+        if int8_path is None:
+            if args.source == "random":
+                calibration = np.random.default_rng(0).random((args.max_samples, *MODEL_INPUT_SHAPE), dtype=np.float32)
+            else:
+                paths = [make_recording(os.path.join(directory, f"calibration-{seed}.edf"), args.minutes, seed=seed)
+                         for seed in range(args.calibration_recordings)]
+                try:
+                    calibration = collect_calibration(paths, max_samples=args.max_samples, profile=args.profile)
+                except ValueError as e:
+                    sys.exit(f"Cannot calibrate on the pipeline's spectrograms: {e}. Run with --source random instead.")
+            calibration_segments = len(calibration)
+            int8_path = os.path.join(directory, "model-int8.tflite")
+            export_tflite(model, int8_path, "int8", calibration)
+
+        float_model = CompiledModel(model)
+        int8_model = TFLiteModel(int8_path)
+
+        # Seeds after the calibration recordings', so the two sets never overlap
+        seeds = range(1000, 1000 + args.recordings)
+        recordings = []
+        for seed, inputs in zip(seeds, make_inputs(args, directory, seeds)):
+            if inputs.shape[1:] != MODEL_INPUT_SHAPE:
+                sys.exit(f"Held-out recording {seed} has segments of shape {inputs.shape[1:]}, "
+                         f"the model expects {MODEL_INPUT_SHAPE}. Run with --source random instead.")
+            float_outputs = float_model.predict(inputs)
+            int8_outputs = int8_model.predict(inputs)
+            recordings.append({
+                "seed": seed,
+                "segments": len(inputs),
+                "segment_agreement": round(float((float_outputs.argmax(axis=1) == int8_outputs.argmax(axis=1)).mean()), 4),
+                "float_prediction": final_prediction(float_outputs),
+                "int8_prediction": final_prediction(int8_outputs),
+                "max_confidence_diff": round(float(np.abs(float_outputs[:, 1] - int8_outputs[:, 1]).max()), 5),
+            })
+
+    segments = sum(entry["segments"] for entry in recordings)
+    summary = {
+        "recordings": len(recordings),
+        "segments": segments,
+        "calibration_segments": calibration_segments,
+        "segment_agreement": round(sum(entry["segment_agreement"] * entry["segments"] for entry in recordings) / segments, 4),
+        "final_agreement": round(sum(entry["float_prediction"] == entry["int8_prediction"] for entry in recordings) / len(recordings), 4),
+        "max_confidence_diff": max(entry["max_confidence_diff"] for entry in recordings),
+    }
+
+    print(f"{'seed':>6}  {'segments':>8}  {'segment agreement':>17}  {'float':>26}  {'int8':>26}  {'max diff':>8}")
+    for entry in recordings:
+        print(f"{entry['seed']:>6}  {entry['segments']:>8}  {entry['segment_agreement']:>17.4f}  "
+              f"{entry['float_prediction']:>26}  {entry['int8_prediction']:>26}  {entry['max_confidence_diff']:>8.5f}")
+    print(f"\nSegment agreement {summary['segment_agreement']:.2%} over {segments} segments, "
+          f"final prediction agreement {summary['final_agreement']:.2%} over {len(recordings)} recordings, "
+          f"largest MDD confidence difference {summary['max_confidence_diff']:.5f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"source": args.source, "summary": summary, "recordings": recordings}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
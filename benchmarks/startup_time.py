@@ -0,0 +1,101 @@
+"""
+Measure how long the web app takes to import, broken down by module.
+
+Each run imports the app in a fresh interpreter with ``python -X importtime`` and
+records the cumulative import time of every module. The report lists the slowest
+modules and flags any heavy ML package (TensorFlow, MNE, ...) that got imported,
+since those should only load in the inference workers.
+
+Usage:
+    python -m benchmarks.startup_time [--runs 5] [--top 15] [--max-seconds 1.0] [--json report.json]
+
+Exits with status 1 if the median import time exceeds --max-seconds or a heavy
+ML package is imported, so it can be used as a regression check in CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["tensorflow", "keras", "mne", "scipy", "cv2", "sklearn"]
+
+def parse_importtime(stderr):
+    """Return {module: cumulative seconds} from -X importtime output"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            # Header line
+            continue
+        timings[parts[2].strip()] = int(parts[1]) / 1e6
+    return timings
+
+def measure(module):
+    """Import module in a fresh interpreter and return (wall seconds, per-module timings)"""
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    start = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    return wall, parse_importtime(completed.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if the median import time is above this")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    walls = []
+    imports = []
+    runs = []
+    for _ in range(args.runs):
+        wall, timings = measure(args.module)
+        walls.append(wall)
+        imports.append(timings.get(args.module, 0.0))
+        runs.append(timings)
+
+    # Median cumulative time per module across runs
+    modules = {}
+    for name in runs[-1]:
+        modules[name] = statistics.median(run.get(name, 0.0) for run in runs)
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    heavy = sorted({name.split(".")[0] for name in modules} & set(HEAVY_MODULES))
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_wall_seconds": round(statistics.median(walls), 4),
+        "median_import_seconds": round(statistics.median(imports), 4),
+        "heavy_modules_imported": heavy,
+        "slowest_modules": [{"module": name, "cumulative_seconds": round(seconds, 4)} for name, seconds in slowest],
+    }
+
+    print(f"Import of {args.module}: {report['median_import_seconds']:.3f}s "
+          f"(process wall time {report['median_wall_seconds']:.3f}s, median of {args.runs} runs)")
+    print(f"{'cumulative (s)':>15}  module")
+    for name, seconds in slowest:
+        print(f"{seconds:>15.4f}  {name}")
+    if heavy:
+        print(f"Heavy ML modules imported at startup: {', '.join(heavy)}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = bool(heavy)
+    if args.max_seconds is not None and report["median_import_seconds"] > args.max_seconds:
+        print(f"Import time is above the {args.max_seconds:.3f}s limit")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Throughput of the inference executor for combinations of workers and threads per worker.
+
+For every combination a fresh interpreter starts an InferenceExecutor with that many
+worker processes, each limited to that many threads (TF_INTER_OP_THREADS,
+TF_INTRA_OP_THREADS, BLAS_THREADS and MNE_N_JOBS), warms it up and submits --jobs
+predictions of a synthetic recording at once. The report gives assessments per
+minute and the p50/p95 latency of a job. Combinations using more threads than the
+machine has cores show the cost of oversubscription.
+
+Usage:
+    python -m benchmarks.threads [--workers 1 2 4] [--threads 1 2 4] [--jobs 8] [--minutes 1]
+                                 [--profile full] [--json report.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from .synthetic import make_recording
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def thread_environment(threads):
+    """Settings limiting every library in a worker to threads"""
+    names = ["TF_INTER_OP_THREADS", "TF_INTRA_OP_THREADS", "BLAS_THREADS", "MNE_N_JOBS"]
+    return {name: str(threads) for name in names}
+
+async def run_jobs(executor, path, jobs, profile):
+    async def job():
+        start = time.perf_counter()
+        result = await executor.submit(path, profile=profile)
+        return time.perf_counter() - start, result["status"]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[job() for _ in range(jobs)])
+    return time.perf_counter() - start, results
+
+def run_child(config_path):
+    """Run in the child interpreter: time one workers x threads combination and write the results to config_path"""
+    with open(config_path) as f:
+        config = json.load(f)
+
+    from app.ml.executor import InferenceExecutor
+
+    async def main():
+        executor = InferenceExecutor(config["workers"], max_queue=config["jobs"])
+        if not await executor.warm_up():
+            raise RuntimeError("Inference workers failed to warm up")
+        try:
+            return await run_jobs(executor, config["path"], config["jobs"], config["profile"])
+        finally:
+            executor.shutdown()
+
+    wall, results = asyncio.run(main())
+    latencies = [seconds for seconds, _ in results]
+    with open(config_path, "w") as f:
+        json.dump({
+            "wall_seconds": round(wall, 3),
+            "assessments_per_minute": round(len(results) / wall * 60, 2),
+            "p50_seconds": round(percentile(latencies, 0.5), 3),
+            "p95_seconds": round(percentile(latencies, 0.95), 3),
+            "statuses": sorted(set(status for _, status in results)),
+        }, f)
+
+def benchmark(path, workers, threads, jobs, profile):
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"path": path, "workers": workers, "jobs": jobs, "profile": profile}, f)
+        config_path = f.name
+    env = os.environ.copy()
+    env.update(thread_environment(threads))
+    env["SPECTROGRAM_CACHE_MAX_MB"] = "0"
+    try:
+        command = [sys.executable, "-m", "benchmarks.threads", "--child", config_path]
+        completed = subprocess.run(command, capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmarking {workers} worker(s) x {threads} thread(s) failed:\n{completed.stderr[-2000:]}")
+        with open(config_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(config_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker processes")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4], help="Threads per worker")
+    parser.add_argument("--jobs", type=int, default=8, help="Predictions submitted at once")
+    parser.add_argument("--minutes", type=float, default=1, help="Length of the recording")
+    parser.add_argument("--profile", default="full", help="Preprocessing profile")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    results = []
+    print(f"{os.cpu_count()} CPU(s), {args.jobs} jobs of a {args.minutes} min recording")
+    print(f"{'workers':>7}  {'threads':>7}  {'assessments/min':>15}  {'p50 (s)':>8}  {'p95 (s)':>8}")
+    with tempfile.TemporaryDirectory(prefix="eeg-threads-") as directory:
+        path = make_recording(os.path.join(directory, "recording.edf"), args.minutes)
+        for workers in args.workers:
+            for threads in args.threads:
+                result = {"workers": workers, "threads": threads}
+                result.update(benchmark(path, workers, threads, args.jobs, args.profile))
+                results.append(result)
+                print(f"{workers:>7}  {threads:>7}  {result['assessments_per_minute']:>15.2f}  "
+                      f"{result['p50_seconds']:>8.3f}  {result['p95_seconds']:>8.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "jobs": args.jobs, "minutes": args.minutes,
+                       "profile": args.profile, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import sys
 import os
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
 
@@ -24,7 +25,9 @@ from app.auth import get_current_user
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    # Share the single in-memory database between the test and the app threads
+    poolclass=StaticPool
 )
 
 # Add SQLite-specific functions to handle things like DEFAULT now()
@@ -32,8 +35,6 @@ engine = create_engine(
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
-    # Add functions that SQLite doesn't natively support but our models might use
-    cursor.execute("CREATE FUNCTION IF NOT EXISTS now() RETURNS TIMESTAMP AS 'SELECT CURRENT_TIMESTAMP'")
     cursor.close()
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
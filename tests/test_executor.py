@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+from app import metrics
+from app.ml import executor as executor_module
+from app.ml.executor import InferenceExecutor, QueueFullError
+
+# Stand-ins for the worker functions, imported by name in the spawned workers
+
+def _init_worker(progress_queue):
+    pass
+
+def _worker_ready():
+    return True
+
+def _run_prediction(token, file_path, file_hash=None, profile="full", subject=None):
+    if file_path == "out-of-memory.edf":
+        os._exit(1)
+    return {"status": "success", "file_path": file_path}, {}, {}, time.time()
+
+def test_dead_worker_is_replaced():
+    """Test that a pool that lost a worker is replaced instead of failing every later job"""
+    inference = InferenceExecutor(max_workers=1, max_queue=1)
+    
+    async def scenario():
+        assert await inference.warm_up()
+        with pytest.raises(BrokenProcessPool):
+            await inference.submit("out-of-memory.edf")
+        assert not inference.ready
+        assert metrics.inference_ready._values[()] == 0
+        
+        result = await inference.submit("recording.edf")
+        assert await inference._recovery
+        return result
+    
+    with patch.multiple(executor_module, _init_worker=_init_worker, _worker_ready=_worker_ready,
+                        _run_prediction=_run_prediction):
+        try:
+            result = asyncio.run(scenario())
+        finally:
+            inference.shutdown()
+    
+    assert result == {"status": "success", "file_path": "recording.edf"}
+    assert inference.stats.failed == 1 and inference.stats.completed == 1
+
+def test_reserved_slot_is_kept_for_its_job():
+    """Test that a job submitted into a reserved slot runs even though the queue is full"""
+    inference = InferenceExecutor(max_workers=0, max_queue=0, threads=1)
+    inference.reserve()
+    assert inference.is_full()
+    with pytest.raises(QueueFullError):
+        inference.reserve()
+    
+    with patch.multiple(executor_module, _init_worker=_init_worker, _run_prediction=_run_prediction):
+        try:
+            result = asyncio.run(inference.submit("recording.edf", reserved=True))
+        finally:
+            inference.shutdown()
+    
+    assert result["status"] == "success"
+    assert inference.snapshot()["in_flight"] == 0
+    assert inference.stats.rejected == 1 and inference.stats.completed == 1
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.ml.export import export_tflite, load_calibration
+from app.ml.model import CompiledModel, TFLiteModel, create_custom_model
+from app.ml.registry import ModelRegistry
+
+@pytest.fixture(scope="module")
+def keras_model():
+    return create_custom_model()
+
+@pytest.mark.parametrize("quantize, atol", [("none", 1e-5), ("float16", 1e-3), ("int8", 2e-2)])
+def test_tflite_matches_keras(keras_model, tmp_path, quantize, atol):
+    """Test that the exported TFLite model gives the Keras model's output for any batch size"""
+    rng = np.random.default_rng(0)
+    calibration = rng.random((32, 33, 45, 1), dtype=np.float32)
+    path = str(tmp_path / "model.tflite")
+    assert export_tflite(keras_model, path, quantize, calibration) > 0
+
+    tflite = TFLiteModel(path, buckets=(4, 16))
+    compiled = CompiledModel(keras_model, buckets=(4, 16))
+    for size in [1, 4, 5, 40]:
+        inputs = rng.random((size, 33, 45, 1), dtype=np.float32)
+        outputs = tflite.predict(inputs)
+        assert outputs.shape == (size, 2)
+        assert outputs.dtype == np.float32
+        np.testing.assert_allclose(outputs, compiled.predict(inputs), atol=atol)
+
+    assert tflite.predict(np.zeros((0, 33, 45, 1), dtype=np.float32)).shape == (0, 2)
+    with pytest.raises(ValueError):
+        tflite.predict(np.zeros((2, 3, 17, 25), dtype=np.float32))
+
+def test_int8_export_needs_calibration(keras_model, tmp_path):
+    with pytest.raises(ValueError):
+        export_tflite(keras_model, str(tmp_path / "model.tflite"), "int8")
+    with pytest.raises(ValueError):
+        export_tflite(keras_model, str(tmp_path / "model.tflite"), "int4")
+
+def test_load_calibration_keeps_model_shaped_arrays(tmp_path):
+    """Test that calibration files are searched in directories and arrays of other shapes are skipped"""
+    np.save(tmp_path / "segments.npy", np.ones((3, 33, 45, 1)))
+    np.savez(tmp_path / "entry.npz", spectrograms=np.ones((4, 3, 17, 25)), model_inputs=np.zeros((2, 33, 45, 1)))
+
+    calibration = load_calibration([str(tmp_path)])
+    assert calibration.shape == (5, 33, 45, 1)
+    assert calibration.dtype == np.float32
+    assert load_calibration([str(tmp_path)], max_samples=2).shape == (2, 33, 45, 1)
+
+    np.savez(tmp_path / "other.npz", spectrograms=np.ones((4, 3, 17, 25)))
+    with pytest.raises(ValueError):
+        load_calibration([str(tmp_path / "other.npz")])
+
+def test_registry_uses_tflite_backend(keras_model, tmp_path):
+    """Test that MODEL_BACKEND=tflite serves the exported model without loading the Keras one"""
+    path = str(tmp_path / "model.tflite")
+    export_tflite(keras_model, path)
+    registry = ModelRegistry()
+
+    with patch("app.ml.registry.settings.MODEL_BACKEND", "tflite"), \
+            patch("app.ml.model.settings.TFLITE_MODEL_PATH", path), \
+            patch("app.ml.model.load_model") as mock_load_model, \
+            patch("app.ml.preprocessing.load_scaler"):
+        registry.warm_up()
+
+    assert registry.is_ready()
+    assert isinstance(registry.get_predictor(), TFLiteModel)
+    mock_load_model.assert_not_called()
+
+def test_registry_reports_missing_tflite_model(tmp_path):
+    registry = ModelRegistry()
+
+    with patch("app.ml.registry.settings.MODEL_BACKEND", "tflite"), \
+            patch("app.ml.model.settings.TFLITE_MODEL_PATH", str(tmp_path / "missing.tflite")):
+        with pytest.raises(FileNotFoundError):
+            registry.get_predictor()
+
+    with patch("app.ml.registry.settings.MODEL_BACKEND", "onnx"):
+        with pytest.raises(ValueError):
+            registry.get_predictor()
+
+def test_collect_calibration_from_cache_and_recordings(tmp_path):
+    """Test that calibration segments come from cache entries and recordings, skipping other shapes"""
+    from app.ml.cache import SpectrogramCache
+    from app.ml.calibration import collect_calibration
+
+    cache = SpectrogramCache(str(tmp_path), 1024 * 1024)
+    cache.put("model-shaped", np.ones((3, 33, 45, 1), dtype=np.float32))
+    cache.put("pipeline-shaped", np.ones((4, 3, 17, 25), dtype=np.float32))
+    # Reshaped by model_inputs as in predict_api
+    recording = np.zeros((5, 33, 45, 1, 1), dtype=np.float32)
+
+    with patch("app.ml.preprocessing.process_for_prediction", return_value=recording) as mock_process:
+        calibration = collect_calibration(["a.edf"], cache=cache)
+    mock_process.assert_called_once_with("a.edf", profile="full")
+    assert calibration.shape == (8, 33, 45, 1)
+    assert calibration.dtype == np.float32
+
+    assert collect_calibration(cache=cache, max_samples=2).shape == (2, 33, 45, 1)
+
+    cache.purge()
+    cache.put("pipeline-shaped", np.ones((4, 3, 17, 25), dtype=np.float32))
+    with pytest.raises(ValueError):
+        collect_calibration(cache=cache)
+
+def test_registry_serves_int8_model(keras_model, tmp_path):
+    """Test that MODEL_PRECISION=int8 serves the int8 artifact on the keras backend too"""
+    path = str(tmp_path / "model-int8.tflite")
+    calibration = np.random.default_rng(0).random((16, 33, 45, 1), dtype=np.float32)
+    export_tflite(keras_model, path, "int8", calibration)
+    registry = ModelRegistry()
+
+    with patch("app.ml.registry.settings.MODEL_PRECISION", "int8"), \
+            patch("app.ml.model.settings.INT8_MODEL_PATH", path), \
+            patch("app.ml.model.load_model") as mock_load_model:
+        predictor = registry.get_predictor()
+
+    assert isinstance(predictor, TFLiteModel)
+    assert predictor.model_path == path
+    mock_load_model.assert_not_called()
+
+    with patch("app.ml.registry.settings.MODEL_PRECISION", "int4"):
+        with pytest.raises(ValueError):
+            ModelRegistry().get_predictor()
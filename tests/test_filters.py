@@ -0,0 +1,81 @@
+import mne
+import numpy as np
+import pytest
+from app.ml.filters import filter_raw, fir_filter, fir_kernel, kernel_spectrum, notch_design, notch_raw
+
+def make_raw(seconds=60, n_channels=4, sfreq=256.0):
+    rng = np.random.default_rng(0)
+    times = np.arange(int(seconds * sfreq)) / sfreq
+    data = 1e-5 * rng.standard_normal((n_channels, len(times))) + 2e-5 * np.sin(2 * np.pi * 50 * times)
+    info = mne.create_info([f"EEG {i}" for i in range(n_channels)], sfreq, "eeg")
+    return mne.io.RawArray(data, info, verbose="error")
+
+@pytest.mark.parametrize("l_freq, h_freq", [(0.1, 70), (1.0, None), (None, 40)])
+def test_filter_raw_matches_mne(l_freq, h_freq):
+    """Test that the cached-kernel filter gives Raw.filter's data and info"""
+    raw = make_raw()
+    expected = raw.copy().filter(l_freq, h_freq, verbose="error")
+    filtered = filter_raw(raw.copy(), l_freq, h_freq)
+
+    np.testing.assert_allclose(filtered.get_data(), expected.get_data(), rtol=0, atol=1e-18)
+    assert filtered.info["highpass"] == expected.info["highpass"]
+    assert filtered.info["lowpass"] == expected.info["lowpass"]
+
+def test_notch_raw_matches_mne():
+    raw = make_raw()
+    expected = raw.copy().notch_filter(50, verbose="error")
+    np.testing.assert_allclose(notch_raw(raw.copy(), 50).get_data(), expected.get_data(), rtol=0, atol=1e-18)
+
+def test_filter_raw_on_threads():
+    raw = make_raw()
+    np.testing.assert_array_equal(filter_raw(raw.copy(), 0.1, 70, n_jobs=2).get_data(),
+                                  filter_raw(raw.copy(), 0.1, 70).get_data())
+
+def test_kernel_designed_once():
+    """Test that kernels are shared between requests and can't be modified by one"""
+    kernel = fir_kernel(256.0, 0.1, 70)
+    assert fir_kernel(256.0, 0.1, 70) is kernel
+    assert fir_kernel(512.0, 0.1, 70) is not kernel
+    with pytest.raises(ValueError):
+        kernel[0] = 1.0
+
+def test_fir_filter_shorter_than_kernel():
+    """Test MNE's edge padding on a signal shorter than the kernel"""
+    x = np.random.default_rng(1).standard_normal(1000)
+    expected = mne.filter.filter_data(x[np.newaxis], 256.0, 0.1, 70, verbose="error")[0]
+    np.testing.assert_allclose(fir_filter(x, fir_kernel(256.0, 0.1, 70)), expected, rtol=0, atol=1e-12)
+
+def test_skip_annotations_filter_parts_separately():
+    """Test that recordings with edge annotations fall back to Raw.filter"""
+    raw = make_raw()
+    raw.set_annotations(mne.Annotations([30.0], [0.0], ["edge"]))
+    expected = raw.copy().filter(1.0, None, verbose="error")
+    np.testing.assert_array_equal(filter_raw(raw.copy(), 1.0, None).get_data(), expected.get_data())
+
+def test_notch_design_matches_mne():
+    kernel = fir_kernel(256.0, *notch_design(50))
+    expected = mne.filter.create_filter(None, 256.0, 50 + 0.625, 50 - 0.625, l_trans_bandwidth=0.5,
+                                        h_trans_bandwidth=0.5, fir_design="firwin", verbose="error")
+    np.testing.assert_array_equal(kernel, expected)
+
+def test_kernel_spectrum_shared_between_channels():
+    """Test that filtering with the precomputed spectrum gives the result of fir_filter's own"""
+    x = np.random.default_rng(2).standard_normal(15360)
+    kernel = fir_kernel(256.0, 0.1, 70)
+    np.testing.assert_array_equal(fir_filter(x, kernel, kernel_spectrum(15360, 256.0, 0.1, 70)), fir_filter(x, kernel))
+
+def test_filter_raw_on_threads_filters_in_place():
+    """Test that channels filtered on several threads are written back one at a time"""
+    import tracemalloc
+    
+    # Design the kernel and load the FFT code before measuring
+    filter_raw(make_raw(seconds=300, n_channels=1), 0.1, 70, n_jobs=2)
+    raw = make_raw(seconds=300, n_channels=64)
+    channel_bytes = raw._data[0].nbytes
+    tracemalloc.start()
+    filter_raw(raw, 0.1, 70, n_jobs=2)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    # A few channels' FFT buffers per thread, not a filtered copy of all 64 channels
+    assert peak < 24 * channel_bytes
@@ -2,6 +2,8 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 import os
+import subprocess
+import sys
 from app.main import app
 
 client = TestClient(app)
@@ -15,9 +17,19 @@ def test_api_root():
 
 def test_health_check():
     """Test the health check endpoint"""
-    response = client.get("/api/health")
+    with patch("app.main.get_executor") as mock_get_executor:
+        mock_get_executor.return_value.ready = True
+        response = client.get("/api/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "healthy"}
+    assert response.json() == {"status": "healthy", "model_ready": True}
+
+def test_health_check_before_warm_up():
+    """Test that the app is not reported healthy until the model is warmed up"""
+    with patch("app.main.get_executor") as mock_get_executor:
+        mock_get_executor.return_value.ready = False
+        response = client.get("/api/health")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting", "model_ready": False}
 
 def test_api_docs_endpoint():
     """Test that the API docs endpoint exists"""
@@ -54,4 +66,30 @@ def test_serve_frontend():
             response = client.get("/dashboard")
     
     # The endpoint should be called without an error
-    assert response.status_code != 404
\ No newline at end of file
+    assert response.status_code != 404
+
+def test_app_import_skips_ml_stack():
+    """Test that importing the app does not pull in TensorFlow or MNE"""
+    code = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('tensorflow', 'keras', 'mne', 'cv2', 'scipy', 'sklearn') if m in sys.modules))"
+    )
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=project_root)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1:] in ([], [""])
+
+def test_metrics_endpoint():
+    """Test that request latencies are exported in Prometheus text format by route template"""
+    client.get("/api")
+    client.get("/api/assessment/jobs/abc123")
+    
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api",status="200"}' in body
+    # Path parameters are not part of the label
+    assert 'route="/api/assessment/jobs/{job_id}"' in body
+    assert "abc123" not in body
@@ -0,0 +1,51 @@
+import pytest
+from app.metrics import MetricsRegistry
+from app.ml.stages import StageTimer, timed
+
+def test_histogram_exposition():
+    """Test the cumulative buckets, sum and count of a histogram"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage durations", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="read")
+    histogram.observe(0.5, stage="read")
+    histogram.observe(5, stage="read")
+    
+    lines = registry.render().splitlines()
+    
+    assert lines[:2] == ["# HELP stage_seconds Stage durations", "# TYPE stage_seconds histogram"]
+    assert 'stage_seconds_bucket{stage="read",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="read",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="read",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="read"} 5.55' in lines
+    assert 'stage_seconds_count{stage="read"} 3' in lines
+
+def test_counter_and_gauge_exposition():
+    """Test counters, gauges and label escaping"""
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events", ["event"])
+    gauge = registry.gauge("in_flight", "In flight")
+    counter.inc(event='cache "hit"')
+    counter.inc(2, event='cache "hit"')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    
+    body = registry.render()
+    
+    assert 'events_total{event="cache \\"hit\\""} 3' in body
+    assert "in_flight 1" in body
+    with pytest.raises(ValueError):
+        counter.inc(stage="read")
+
+def test_timed_decorator_records_stage():
+    """Test that a function decorated with timed is recorded as a stage"""
+    @timed("work")
+    def work(value):
+        return value * 2
+    
+    # No-op without an active timer
+    assert work(2) == 4
+    
+    with StageTimer() as timer:
+        assert work(3) == 6
+    assert list(timer.timings) == ["work"]
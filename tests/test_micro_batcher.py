@@ -0,0 +1,174 @@
+import pytest
+import threading
+import numpy as np
+from app.ml.model import MicroBatcher
+
+def run_concurrently(batcher, batches):
+    results = [None] * len(batches)
+    errors = [None] * len(batches)
+    
+    def call(index):
+        try:
+            results[index] = batcher.predict(batches[index])
+        except Exception as e:
+            errors[index] = e
+    
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(len(batches))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def test_concurrent_requests_share_a_forward_pass():
+    """Test that segments from concurrent callers run in one batch and are scattered back"""
+    calls = []
+    
+    def predict_fn(inputs):
+        calls.append(len(inputs))
+        return inputs.reshape(len(inputs), -1).sum(axis=1, keepdims=True)
+    
+    batcher = MicroBatcher(predict_fn, max_wait=0.5, max_batch_size=10)
+    batches = [np.full((n, 3, 3, 1), float(n)) for n in (1, 2, 3, 4)]
+    
+    results, errors = run_concurrently(batcher, batches)
+    
+    assert errors == [None] * 4
+    assert calls == [10]
+    for batch, result in zip(batches, results):
+        np.testing.assert_array_equal(result, predict_fn(batch))
+
+def test_batch_errors_reach_every_caller():
+    """Test that a failed forward pass is raised in every caller that shared it"""
+    def predict_fn(inputs):
+        raise ValueError("bad input shape")
+    
+    batcher = MicroBatcher(predict_fn, max_wait=0.2)
+    results, errors = run_concurrently(batcher, [np.zeros((2, 3)), np.zeros((1, 3))])
+    
+    assert all(isinstance(error, ValueError) for error in errors)
+
+def test_different_shapes_run_separately():
+    """Test that segments of different shapes are not concatenated"""
+    calls = []
+    
+    def predict_fn(inputs):
+        calls.append(inputs.shape)
+        return np.zeros((len(inputs), 2))
+    
+    batcher = MicroBatcher(predict_fn, max_wait=0.2)
+    results, errors = run_concurrently(batcher, [np.zeros((2, 3)), np.zeros((1, 4)), np.zeros((3, 3))])
+    
+    assert errors == [None] * 3
+    assert sorted(calls) == [(1, 4), (5, 3)]
+    assert [len(result) for result in results] == [2, 1, 3]
+
+def test_submit_returns_before_the_forward_pass():
+    """Test that submit() queues a request without waiting for the model"""
+    release = threading.Event()
+    
+    def predict_fn(inputs):
+        release.wait()
+        return inputs * 2
+    
+    batcher = MicroBatcher(predict_fn, max_wait=0)
+    request = batcher.submit(np.ones((2, 3)))
+    assert not request.done.is_set()
+    release.set()
+    np.testing.assert_array_equal(request.wait(), np.full((2, 3), 2.0))
+
+def test_predict_api_counts_votes_across_batches():
+    """Test that segment votes of streamed batches add up as if the recording came in one batch"""
+    from unittest.mock import patch
+    from app.ml.model import predict_api
+    from app.ml.segments import expand_segments
+    
+    rng = np.random.default_rng(0)
+    batches = [rng.random((n, 33, 45, 1)).astype(np.float32) for n in (4, 4, 3)]
+    
+    def predict_fn(inputs):
+        healthy = inputs.reshape(len(inputs), -1).mean(axis=1)
+        return np.stack([healthy, 1 - healthy], axis=1)
+    
+    with patch("app.ml.model.get_batcher", return_value=MicroBatcher(predict_fn)), \
+            patch("app.ml.preprocessing.iter_spectrograms", return_value=(batch for batch in batches)):
+        result = predict_api("recording.edf")
+    
+    expected = predict_fn(np.concatenate(batches))
+    details = expand_segments(result["segment_details"])["detailed_predictions"]
+    assert result["status"] == "success"
+    assert result["segments_analyzed"] == 11
+    assert [segment["segment_number"] for segment in details] == list(range(1, 12))
+    assert [segment["healthy_confidence"] for segment in details] == expected[:, 0].tolist()
+    assert result["segment_details"]["healthy_segments"] == int((expected[:, 0] >= expected[:, 1]).sum())
+    assert result["debug_info"]["spectrogram_shape"] == "(11, 33, 45, 1)"
+    assert result["debug_info"]["prediction_shape"] == "(11, 2)"
+
+def test_votes_decided():
+    from app.ml.model import SegmentVotes
+    
+    votes = SegmentVotes()
+    votes.add(np.zeros((12, 1)), np.array([[0.9, 0.1]] * 10 + [[0.2, 0.8]] * 2))
+    assert votes.decided(remaining=8)
+    assert not votes.decided(remaining=9)
+    # 10 of 12 is a majority at 90%, not at 99.9%
+    assert votes.decided(remaining=1000, confidence=0.9)
+    assert not votes.decided(remaining=1000, confidence=0.999)
+    
+    votes = SegmentVotes()
+    votes.add(np.zeros((12, 1)), np.array([[0.2, 0.8]] * 10 + [[0.9, 0.1]] * 2))
+    assert votes.decided(remaining=7)
+    # A tie goes to Healthy
+    assert not votes.decided(remaining=8)
+
+def test_predict_api_early_exit():
+    """Test that scoring stops once the remaining epochs can't change the majority"""
+    from unittest.mock import patch
+    from app.ml import model
+    
+    pulled = []
+    
+    def iter_spectrograms(file_path, batch_size, **kwargs):
+        for start in range(0, 200, batch_size):
+            pulled.append(start)
+            yield np.zeros((min(batch_size, 200 - start), 33, 45, 1), dtype=np.float32)
+    
+    batcher = MicroBatcher(lambda inputs: np.tile([0.8, 0.2], (len(inputs), 1)))
+    with patch("app.ml.model.get_batcher", return_value=batcher), \
+            patch("app.ml.preprocessing.iter_spectrograms", side_effect=iter_spectrograms), \
+            patch("app.ml.preprocessing.count_epochs", return_value=200), \
+            patch.object(model.settings, "EARLY_EXIT", True), \
+            patch.object(model.settings, "EARLY_EXIT_BATCH", 32):
+        result = model.predict_api("recording.edf")
+    
+    # 128 segments counted settle it with 72 epochs left; the batch already submitted is counted too
+    assert len(pulled) == 5
+    assert result["segments_analyzed"] == 160
+    assert result["final_prediction"] == "Healthy"
+    early_exit = result["segment_details"]["early_exit"]
+    assert early_exit["stopped_early"] and early_exit["segments_evaluated"] == 160
+    assert early_exit["epochs_in_recording"] == 200
+    assert early_exit["estimated_seconds_saved"] >= 0
+
+@pytest.mark.parametrize("confidence", [-0.1, 1, 1.5])
+def test_early_exit_confidence_validated(confidence):
+    from unittest.mock import patch
+    from app.ml import model
+    
+    with pytest.raises(ValueError, match="confidence"):
+        model.EarlyExit(200, confidence=confidence)
+    with patch.object(model.settings, "EARLY_EXIT_CONFIDENCE", confidence):
+        with pytest.raises(ValueError, match="confidence"):
+            model.EarlyExit(200)
+    assert model.EarlyExit(200, confidence=0.999).confidence == 0.999
+
+@pytest.mark.parametrize("workers, threads, max_wait", [(1, 1, 0), (2, 4, 0), (0, 1, 0), (0, 4, 0.005)])
+def test_batch_window_only_with_inference_threads(workers, threads, max_wait):
+    """Test that batches only wait for other assessments where several run in one process"""
+    from unittest.mock import patch
+    from app.ml import model
+    
+    with patch.object(model.settings, "INFERENCE_WORKERS", workers), \
+            patch.object(model.settings, "INFERENCE_THREADS", threads), \
+            patch.object(model.settings, "MODEL_BATCH_MAX_WAIT_MS", 5):
+        assert model._batch_max_wait() == max_wait
@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.ml.registry import ModelRegistry
+
+def test_model_loaded_once():
+    """Test that the model is only loaded on first use"""
+    registry = ModelRegistry()
+    
+    with patch("app.ml.model.load_model") as mock_load_model:
+        mock_load_model.return_value = MagicMock()
+        first = registry.get_model()
+        second = registry.get_model()
+    
+    assert first is second
+    mock_load_model.assert_called_once()
+
+def test_scaler_loaded_once():
+    """Test that scaler.pkl is only unpickled on first use"""
+    registry = ModelRegistry()
+    
+    with patch("app.ml.preprocessing.load_scaler") as mock_load_scaler:
+        mock_load_scaler.return_value = MagicMock()
+        registry.get_scaler()
+        registry.get_scaler()
+    
+    mock_load_scaler.assert_called_once()
+
+def test_warm_up_marks_ready():
+    """Test that a dummy prediction runs through the compiled model before the registry reports ready"""
+    registry = ModelRegistry()
+    mock_model = MagicMock()
+    
+    with patch("app.ml.model.load_model", return_value=mock_model), \
+            patch("app.ml.model.CompiledModel") as mock_compiled_model, \
+            patch("app.ml.preprocessing.load_scaler", return_value=MagicMock()):
+        assert not registry.is_ready()
+        registry.warm_up()
+    
+    assert registry.is_ready()
+    mock_compiled_model.assert_called_once_with(mock_model)
+    batch = mock_compiled_model.return_value.predict.call_args[0][0]
+    assert batch.shape[1:] == (33, 45, 1)
+
+def test_compiled_model_matches_predict():
+    """Test that the compiled forward pass gives model.predict's output for any batch size"""
+    import numpy as np
+    from app.ml.model import CompiledModel, create_custom_model
+    
+    model = create_custom_model()
+    compiled = CompiledModel(model, buckets=(4, 16))
+    
+    for size in [1, 4, 5, 40]:
+        inputs = np.random.default_rng(size).random((size, 33, 45, 1), dtype=np.float32)
+        outputs = compiled.predict(inputs)
+        assert outputs.shape == (size, 2)
+        np.testing.assert_allclose(outputs, model.predict(inputs, verbose=0), rtol=1e-5, atol=1e-6)
+    
+    with pytest.raises(ValueError):
+        compiled.predict(np.zeros((2, 3, 17, 25), dtype=np.float32))
@@ -1,10 +1,15 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock, AsyncMock, mock_open
 from app.main import app
 import json
 import os
+import hashlib
 from app.auth import get_current_user
+from app.database import get_db
+from app.ml.executor import QueueFullError
+from app import models
+from sqlalchemy.orm import sessionmaker
 
 client = TestClient(app)
 
@@ -44,6 +49,361 @@ def get_mock_user():
     mock_user.created_at = "2023-01-01T00:00:00"
     return mock_user
 
+def test_submit_assessment_queue_full(tmp_path):
+    """Test that a full inference queue returns 503 instead of blocking"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user()
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    
+    with patch("app.routers.phq9_prediction.get_executor") as mock_get_executor, \
+            patch("app.uploads.settings.UPLOAD_DIR", str(tmp_path)):
+        mock_get_executor.return_value.submit = AsyncMock(side_effect=QueueFullError("Inference queue is full"))
+        response = client.post(
+            "/api/assessment/submit-assessment",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    assert response.status_code == 503
+    # The temporary upload directory is removed
+    assert os.listdir(tmp_path) == []
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
+
+def test_submit_assessment_streams_upload(tmp_path):
+    """Test that the upload is streamed to a private directory with its hash"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user()
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    received = {}
+    
+    async def fake_submit(file_path, on_stage=None, file_hash=None, profile="full", subject=None, reserved=False):
+        with open(file_path, "rb") as f:
+            received["content"] = f.read()
+        received["file_path"] = file_path
+        received["file_hash"] = file_hash
+        raise QueueFullError("Inference queue is full")
+    
+    with patch("app.routers.phq9_prediction.get_executor") as mock_get_executor, \
+            patch("app.uploads.settings.UPLOAD_DIR", str(tmp_path)), \
+            patch("app.uploads.settings.UPLOAD_CHUNK_KB", 1):
+        mock_get_executor.return_value.submit = fake_submit
+        client.post(
+            "/api/assessment/submit-assessment",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("../recording.edf", b"x" * 5000)}
+        )
+    
+    assert received["content"] == b"x" * 5000
+    assert received["file_hash"] == hashlib.sha256(b"x" * 5000).hexdigest()
+    assert os.path.dirname(os.path.dirname(received["file_path"])) == str(tmp_path)
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
+
+def test_submit_assessment_upload_too_large(tmp_path):
+    """Test that uploads over the size limit are rejected while streaming"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user()
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    
+    with patch("app.routers.phq9_prediction.get_executor") as mock_get_executor, \
+            patch("app.uploads.settings.UPLOAD_DIR", str(tmp_path)), \
+            patch("app.uploads.settings.MAX_UPLOAD_MB", 0):
+        response = client.post(
+            "/api/assessment/submit-assessment",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    assert response.status_code == 413
+    mock_get_executor.return_value.submit.assert_not_called()
+    assert os.listdir(tmp_path) == []
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
+
+def test_oversized_content_length_rejected_before_reading(tmp_path):
+    """Test that a body announced as too large is refused before it is parsed"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user()
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    
+    with patch("app.routers.phq9_prediction.save_upload") as mock_save_upload, \
+            patch("app.uploads.settings.MAX_UPLOAD_MB", 0):
+        response = client.post(
+            "/api/assessment/jobs",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"x" * 1024 * 1024)}
+        )
+    
+    assert response.status_code == 413
+    mock_save_upload.assert_not_called()
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
+
+def test_oversized_body_cut_off_while_received():
+    """Test that a body sent without Content-Length is refused once too much of it has arrived"""
+    import asyncio
+    from fastapi import HTTPException
+    from app.uploads import UploadLimitMiddleware
+    
+    received = []
+    
+    async def receive():
+        received.append(1)
+        return {"type": "http.request", "body": b"x" * 16 * 1024, "more_body": len(received) < 64}
+    
+    async def read_body(scope, receive, send):
+        while (await receive())["more_body"]:
+            pass
+    
+    middleware = UploadLimitMiddleware(read_body, paths=["/upload"])
+    scope = {"type": "http", "path": "/upload", "headers": [(b"transfer-encoding", b"chunked")]}
+    with patch("app.uploads.settings.MAX_UPLOAD_MB", 0), pytest.raises(HTTPException) as error:
+        asyncio.run(middleware(scope, receive, None))
+    
+    assert error.value.status_code == 413
+    # Cut off just past the 64 KB allowance, not after the whole megabyte
+    assert len(received) == 5
+
+def test_assessment_job_route_exists():
+    """Test that the assessment job endpoints exist"""
+    response = client.post("/api/assessment/jobs")
+    assert response.status_code != 404
+    response = client.get("/api/assessment/jobs/abc")
+    assert response.status_code != 404
+
+def test_submit_assessment_job(test_db, authenticated_client):
+    """Test that a submitted job runs in the background and can be polled"""
+    # The background runner opens its own sessions on the test database
+    testing_session_local = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+    
+    test_db.add(models.User(
+        id=1, email="test@example.com", name="Test User",
+        ic_number="123456789", phone_number="123-456-7890", password="hashed_password"
+    ))
+    test_db.commit()
+    
+    prediction_result = {
+        "final_prediction": "Healthy",
+        "confidence": 80.0,
+        "segments_analyzed": 5,
+        "segment_details": {"healthy_segments": 4, "mdd_segments": 1, "detailed_predictions": []}
+    }
+    
+    async def fake_submit(file_path, on_stage=None, file_hash=None, profile="full", subject=None, reserved=False):
+        assert os.path.exists(file_path)
+        # The slot reserved when the job was accepted
+        assert reserved
+        assert profile == "fast"
+        assert subject == "1"
+        for stage_name in ["filtering", "ica"]:
+            on_stage(stage_name)
+        return prediction_result
+    
+    with patch("app.routers.phq9_prediction.SessionLocal", testing_session_local), \
+            patch("app.routers.phq9_prediction.get_executor") as mock_get_executor:
+        mock_get_executor.return_value.submit = fake_submit
+        response = authenticated_client.post(
+            "/api/assessment/jobs?profile=fast",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    
+    response = authenticated_client.get(f"/api/assessment/jobs/{job_id}")
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "completed"
+    assert job["progress"] == 1.0
+    assert job["assessment"]["prediction"] == "Healthy"
+    assert job["assessment"]["phq9_score"] == 9
+    assert job["assessment"]["phq9_category"] == "Mild Depression"
+    assert job["profile"] == "fast"
+    assert job["assessment"]["detailed_results"]["preprocessing_profile"] == "fast"
+
+def test_job_progress_follows_streamed_stages(test_db, authenticated_client, tmp_path):
+    """Test that the stages a streamed prediction reports never move a job's progress backwards"""
+    import numpy as np
+    from benchmarks.synthetic import make_recording
+    from app.ml.model import MicroBatcher, predict_api
+    from app.ml.stages import StageTimer
+    
+    # The stages predict_api really reports, with several blocks of the recording streamed
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=3)
+    reported = []
+    batcher = MicroBatcher(lambda inputs: np.tile([0.8, 0.2], (len(inputs), 1)))
+    with patch("app.ml.model.get_batcher", return_value=batcher), \
+            patch("app.ml.preprocessing.SPECTROGRAM_BATCH", 16), \
+            patch("app.ml.preprocessing.get_spectrogram_cache") as mock_get_cache:
+        mock_get_cache.return_value.enabled = False
+        with StageTimer(on_stage=reported.append):
+            predict_api(path)
+    assert reported.count("ica") > 2 and reported.index("predict") < len(reported) - 1
+    
+    testing_session_local = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+    test_db.add(models.User(
+        id=1, email="test@example.com", name="Test User",
+        ic_number="123456789", phone_number="123-456-7890", password="hashed_password"
+    ))
+    test_db.commit()
+    progress = []
+    
+    async def fake_submit(file_path, on_stage=None, file_hash=None, profile="full", subject=None, reserved=False):
+        for stage_name in reported:
+            on_stage(stage_name)
+            session = testing_session_local()
+            progress.append(session.query(models.AssessmentJob).first().progress)
+            session.close()
+        return {
+            "status": "success",
+            "final_prediction": "Healthy",
+            "confidence": 100.0,
+            "segments_analyzed": 5,
+            "segment_details": {"healthy_segments": 5, "mdd_segments": 0}
+        }
+    
+    with patch("app.routers.phq9_prediction.SessionLocal", testing_session_local), \
+            patch("app.routers.phq9_prediction.get_executor") as mock_get_executor:
+        mock_get_executor.return_value.submit = fake_submit
+        response = authenticated_client.post(
+            "/api/assessment/jobs",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    assert response.status_code == 202
+    assert progress == sorted(progress)
+    assert progress[-1] == 0.8
+    assert authenticated_client.get(f"/api/assessment/jobs/{response.json()['id']}").json()["status"] == "completed"
+
+def test_failed_prediction_fails_job(test_db, authenticated_client):
+    """Test that a job whose prediction reports an error is failed without saving an assessment"""
+    testing_session_local = sessionmaker(autocommit=False, autoflush=False, bind=test_db.get_bind())
+    test_db.add(models.User(
+        id=1, email="test@example.com", name="Test User",
+        ic_number="123456789", phone_number="123-456-7890", password="hashed_password"
+    ))
+    test_db.commit()
+    
+    async def fake_submit(file_path, on_stage=None, file_hash=None, profile="full", subject=None, reserved=False):
+        return {
+            "status": "error",
+            "final_prediction": "Unable to predict",
+            "confidence": 0,
+            "segments_analyzed": 0,
+            "error": "Expected model input of shape (None, 33, 45, 1)",
+            "segment_details": {"healthy_segments": 0, "mdd_segments": 0}
+        }
+    
+    with patch("app.routers.phq9_prediction.SessionLocal", testing_session_local), \
+            patch("app.routers.phq9_prediction.get_executor") as mock_get_executor:
+        mock_get_executor.return_value.submit = fake_submit
+        response = authenticated_client.post(
+            "/api/assessment/jobs",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    job = authenticated_client.get(f"/api/assessment/jobs/{response.json()['id']}").json()
+    assert job["status"] == "failed"
+    assert job["error"] == "Expected model input of shape (None, 33, 45, 1)"
+    assert job["assessment"] is None
+    assert test_db.query(models.CombinedAssessment).count() == 0
+
+def test_submit_assessment_unknown_profile(tmp_path):
+    """Test that an unknown preprocessing profile is rejected before the upload is stored"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user()
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    
+    with patch("app.routers.phq9_prediction.get_executor") as mock_get_executor, \
+            patch("app.uploads.settings.UPLOAD_DIR", str(tmp_path)):
+        response = client.post(
+            "/api/assessment/submit-assessment?profile=fastest",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    assert response.status_code == 400
+    mock_get_executor.return_value.submit.assert_not_called()
+    assert os.listdir(tmp_path) == []
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
+
+def test_submit_assessment_job_reserves_a_slot(test_db, authenticated_client, tmp_path):
+    """Test that an accepted job holds its slot in the inference queue until it runs"""
+    from app.ml.executor import InferenceExecutor
+    
+    test_db.add(models.User(
+        id=1, email="test@example.com", name="Test User",
+        ic_number="123456789", phone_number="123-456-7890", password="hashed_password"
+    ))
+    test_db.commit()
+    
+    def post_job():
+        return authenticated_client.post(
+            "/api/assessment/jobs",
+            data={"phq9_answers": ["1"] * 9},
+            files={"file": ("recording.edf", b"edf-bytes")}
+        )
+    
+    inference = InferenceExecutor(max_workers=0, max_queue=0, threads=1)
+    with patch("app.routers.phq9_prediction.get_executor", return_value=inference), \
+            patch("app.routers.phq9_prediction.settings.JOB_STORAGE_DIR", str(tmp_path)), \
+            patch("app.routers.phq9_prediction.run_assessment_job", new_callable=AsyncMock):
+        # The first job waits in the background with the only slot
+        assert post_job().status_code == 202
+        assert inference.snapshot()["in_flight"] == 1
+        assert post_job().status_code == 503
+        assert len(os.listdir(tmp_path)) == 1
+        
+        # A failed upload gives its slot back
+        inference.release()
+        with patch("app.uploads.settings.MAX_UPLOAD_MB", 0):
+            assert post_job().status_code == 413
+        assert inference.snapshot()["in_flight"] == 0
+    
+    assert test_db.query(models.AssessmentJob).count() == 1
+
+def test_get_unknown_assessment_job(test_db, authenticated_client):
+    """Test polling a job that does not exist"""
+    response = authenticated_client.get("/api/assessment/jobs/unknown")
+    assert response.status_code == 404
+
+def test_assessment_history_segments(test_db, authenticated_client):
+    """Test that history returns packed segment columns, and the per-segment list on request"""
+    from app.ml.segments import pack_segments, unpack_segments
+    
+    test_db.add(models.User(
+        id=1, email="test@example.com", name="Test User",
+        ic_number="123456789", phone_number="123-456-7890", password="hashed_password"
+    ))
+    segment = {"segment_number": 1, "prediction": "MDD", "healthy_confidence": 0.25, "mdd_confidence": 0.75}
+    for detailed_results in (
+        # Stored before the packed columns
+        {"healthy_segments": 0, "mdd_segments": 1, "detailed_predictions": [segment]},
+        {"healthy_segments": 0, "mdd_segments": 1, "segment_predictions": pack_segments([0.25], [0.75])},
+    ):
+        test_db.add(models.CombinedAssessment(
+            user_id=1, phq9_answers=[1] * 9, phq9_score=9, phq9_category="Mild Depression",
+            prediction="Major Depressive Disorder", confidence=100.0, segments_analyzed=1,
+            detailed_results=detailed_results
+        ))
+    test_db.commit()
+    
+    history = authenticated_client.get("/api/assessment/assessment-history").json()
+    assert len(history) == 2
+    for assessment in history:
+        assert "detailed_predictions" not in assessment["detailed_results"]
+        healthy, mdd = unpack_segments(assessment["detailed_results"]["segment_predictions"])
+        assert healthy.tolist() == [0.25] and mdd.tolist() == [0.75]
+    
+    history = authenticated_client.get("/api/assessment/assessment-history?expand_segments=true").json()
+    for assessment in history:
+        assert assessment["detailed_results"] == {"healthy_segments": 0, "mdd_segments": 1, "detailed_predictions": [segment]}
+
 # Test submitting PHQ-9 assessment
 # @patch("app.routers.phq9_prediction.get_db")
 # def test_submit_phq9(mock_get_db):
@@ -0,0 +1,323 @@
+import pytest
+from unittest.mock import patch
+import numpy as np
+import cv2
+from scipy import signal
+from sklearn.preprocessing import StandardScaler
+from app.ml.preprocessing import apply_scaler, compute_spectrograms, scale_channel_means, SPECTROGRAM_BATCH
+
+def reference_spectrograms(data_array, scaler):
+    """The notebook's original float64 pipeline: scale everything, then loop over epochs"""
+    data_array = scaler.transform(data_array.reshape(-1, 1)).reshape(data_array.shape)
+    X_data = []
+    for d in data_array:
+        mean_signal = np.mean(d, axis=0)
+        frequencies, times, stft_data = signal.spectrogram(
+            x=mean_signal,
+            fs=256,
+            window=('tukey', 0.25),
+            nperseg=32,
+            noverlap=16,
+            nfft=32
+        )
+        resized_spectrogram = np.abs(stft_data)
+        resized_spectrogram = resized_spectrogram / np.max(resized_spectrogram)
+        resized_spectrogram = cv2.resize(resized_spectrogram, dsize=(75, 17), interpolation=cv2.INTER_CUBIC)
+        X_data.append(np.array(np.split(resized_spectrogram, 3, axis=1)))
+    return np.array(X_data)
+
+def make_epochs(n_epochs, seed=0):
+    rng = np.random.default_rng(seed)
+    data_array = rng.normal(2e-6, 10e-6, (n_epochs, 17, 1280))
+    scaler = StandardScaler().fit(rng.normal(1e-6, 20e-6, (5000, 1)))
+    return data_array, scaler
+
+def test_apply_scaler_matches_transform():
+    """Test that the in-place affine scaling matches StandardScaler.transform"""
+    data_array, scaler = make_epochs(2)
+    expected = scaler.transform(data_array.reshape(-1, 1)).reshape(data_array.shape)
+    
+    scaled = apply_scaler(data_array, scaler)
+    
+    assert scaled is data_array
+    np.testing.assert_allclose(scaled, expected, rtol=1e-12)
+
+@pytest.mark.parametrize("n_epochs", [1, 7, SPECTROGRAM_BATCH + 3])
+def test_batched_spectrograms_match_reference(n_epochs):
+    """Test that the batched float32 featurizer reproduces the per-epoch float64 loop"""
+    data_array, scaler = make_epochs(n_epochs)
+    expected = reference_spectrograms(data_array, scaler)
+    
+    X_data = compute_spectrograms(scale_channel_means(data_array, scaler))
+    
+    assert X_data.shape == (n_epochs, 3, 17, 25)
+    assert X_data.dtype == np.float32
+    np.testing.assert_allclose(X_data, expected, rtol=1e-4, atol=1e-5)
+
+def test_no_epochs():
+    """Test that a recording with every epoch rejected gives an empty batch"""
+    assert compute_spectrograms(np.empty((0, 1280), dtype=np.float32)).shape == (0, 3, 17, 25)
+
+def make_raw(seconds=30, seed=0):
+    import mne
+    rng = np.random.default_rng(seed)
+    ch_names = ["Fp1", "Fp2", "F7", "F3", "Fz", "F8", "T3", "Cz", "C4", "T4", "T5", "P3", "Pz", "P4", "T6", "O1", "O2"]
+    info = mne.create_info(ch_names, 256, "eeg")
+    raw = mne.io.RawArray(rng.normal(0, 10e-6, (len(ch_names), seconds * 256)), info, verbose="error")
+    raw.set_montage(mne.channels.make_standard_montage("standard_1020"))
+    return raw
+
+def test_fast_profile_reuses_subject_ica(tmp_path):
+    """Test that the fast profile fits one ICA per subject and device, then reuses it"""
+    from app.ml.cache import IcaCache
+    from app.ml.preprocessing import get_ica
+    from app.ml.stages import StageTimer
+    
+    with patch("app.ml.preprocessing.get_ica_cache", return_value=IcaCache(str(tmp_path))):
+        with StageTimer() as timer:
+            first = get_ica(make_raw(seed=0), "fast", subject="7")
+            second = get_ica(make_raw(seed=1), "fast", subject="7")
+            other = get_ica(make_raw(seed=1), "fast", subject="8")
+    
+    assert timer.counters == {"ica_cache_misses": 2, "ica_cache_hits": 1}
+    np.testing.assert_allclose(second.unmixing_matrix_, first.unmixing_matrix_)
+    assert not np.allclose(other.unmixing_matrix_, first.unmixing_matrix_)
+
+def test_full_profile_always_fits_ica(tmp_path):
+    """Test that the full profile never touches the ICA cache"""
+    from app.ml.preprocessing import get_ica
+    
+    with patch("app.ml.preprocessing.get_ica_cache") as mock_get_ica_cache, \
+            patch("app.ml.preprocessing.fit_ica") as mock_fit_ica:
+        get_ica(make_raw(), "full", subject="7")
+    
+    mock_fit_ica.assert_called_once()
+    mock_get_ica_cache.assert_not_called()
+
+def test_fit_ica_on_decimated_samples():
+    """Test that the ICA is fitted as MNE fits it on the high-passed copy with decim"""
+    import mne
+    from app.ml.preprocessing import fit_ica, PIPELINE_PARAMS
+    
+    raw = make_raw(seconds=60)
+    ica = fit_ica(raw)
+    expected = mne.preprocessing.ICA(random_state=42, n_components=13).fit(
+        raw.copy().filter(1.0, None, verbose="error"), decim=PIPELINE_PARAMS["ica"]["decim"], verbose="error")
+    
+    assert ica.n_samples_ == expected.n_samples_
+    np.testing.assert_allclose(ica.pca_mean_, expected.pca_mean_, rtol=1e-10)
+    np.testing.assert_allclose(ica.pca_components_, expected.pca_components_, rtol=0, atol=1e-10)
+    np.testing.assert_array_equal(raw.get_data(), make_raw(seconds=60).get_data())
+    assert ica.info["highpass"] == expected.info["highpass"] == 1.0
+
+def test_fit_ica_on_high_passed_info():
+    """Test that the decimated samples are known to be high-passed, so MNE doesn't warn"""
+    import warnings
+    from app.ml.preprocessing import fit_ica
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        fit_ica(make_raw(seconds=60))
+
+def test_apply_ica_in_place_in_blocks():
+    """Test that cleaning in blocks gives ICA.apply's result on the whole recording"""
+    from app.ml.preprocessing import apply_ica, fit_ica
+    
+    raw = make_raw(seconds=150)
+    ica = fit_ica(raw)
+    expected = ica.apply(raw.copy(), verbose="error").get_data()
+    with patch("app.ml.preprocessing.get_ica", return_value=ica):
+        assert apply_ica(raw) is raw
+    np.testing.assert_allclose(raw.get_data(), expected, rtol=0, atol=1e-18)
+
+def test_ica_peak_memory_one_hour_recording(tmp_path):
+    """
+    Test that the ICA stage of a 1-hour recording allocates less than twice the recording.
+    
+    It used to make three full copies (high-passed for the fit, ICA.fit's own, and the
+    cleaned one) and peaked at five times the recording. FastICA is cut short to keep the
+    test fast; its iterations don't allocate anything the size of the recording.
+    """
+    import tracemalloc
+    from sklearn.decomposition import FastICA
+    from benchmarks.synthetic import make_recording
+    from app.ml.preprocessing import apply_ica, read_recording, select_channels
+    
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=60)
+    data = select_channels(read_recording(path))
+    
+    with patch("sklearn.decomposition.FastICA", lambda **params: FastICA(**{**params, "max_iter": 5})):
+        tracemalloc.start()
+        try:
+            apply_ica(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    
+    assert peak < 2 * data.get_data().nbytes
+
+@pytest.mark.parametrize("n_channels", [20, 22])
+def test_synthetic_recording_channel_layouts(tmp_path, n_channels):
+    """Test that both recording setups are reduced to the 17 standard channels"""
+    from benchmarks.synthetic import make_recording
+    from app.ml.preprocessing import read_recording, select_channels, CHANNEL_NAMES
+    
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=0.5, n_channels=n_channels)
+    data = read_recording(path)
+    assert data.info["nchan"] == n_channels
+    
+    select_channels(data)
+    assert sorted(data.ch_names) == sorted(CHANNEL_NAMES.values())
+
+def test_montage_shared_between_recordings(tmp_path):
+    """Test that every recording gets the same positions from the one cached montage"""
+    from benchmarks.synthetic import make_recording
+    from app.ml.preprocessing import read_recording, select_channels, standard_montage
+    
+    montage = standard_montage()
+    positions = montage.get_positions()["ch_pos"]["Cz"].copy()
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=0.5)
+    first, second = select_channels(read_recording(path)), select_channels(read_recording(path))
+    
+    assert standard_montage() is montage
+    np.testing.assert_array_equal(montage.get_positions()["ch_pos"]["Cz"], positions)
+    np.testing.assert_array_equal(first._get_channel_positions(), second._get_channel_positions())
+
+def test_memory_mapped_recording_matches_ram(tmp_path):
+    """Test that a recording read into a memory-mapped file is preprocessed exactly as one read into RAM"""
+    from benchmarks.synthetic import make_recording
+    from app.ml import preprocessing
+    
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=2, n_channels=22)
+    memmap_dir = tmp_path / "memmap"
+    memmap_dir.mkdir()
+    with patch.object(preprocessing.settings, "EDF_MEMMAP_MINUTES", 0):
+        expected = preprocessing.preprocess_eeg(path)
+    with patch.object(preprocessing.settings, "EDF_MEMMAP_MINUTES", 1), \
+            patch.object(preprocessing.settings, "EDF_MEMMAP_DIR", str(memmap_dir)):
+        assert preprocessing.memory_mapped(preprocessing.read_recording(path))
+        array = preprocessing.preprocess_eeg(path)
+    
+    np.testing.assert_array_equal(array, expected)
+    assert list(memmap_dir.iterdir()) == []
+
+def test_memory_mapped_recording_stays_in_file(tmp_path):
+    """Test that referencing and dropping channels don't copy a memory-mapped recording into RAM"""
+    import tracemalloc
+    from benchmarks.synthetic import make_recording
+    from app.ml import preprocessing
+    
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=10, n_channels=22)
+    with patch.object(preprocessing.settings, "EDF_MEMMAP_MINUTES", 1):
+        data = preprocessing.read_recording(path)
+    size = data._data.nbytes
+    
+    tracemalloc.start()
+    try:
+        preprocessing.select_channels(preprocessing.set_reference(data))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    assert preprocessing.memory_mapped(data)
+    assert data.info["nchan"] == 17
+    # A few one-minute blocks, not the ten minutes of the recording
+    assert peak < size / 4
+
+@pytest.mark.parametrize("length, step, n_times", [(1280, 768, 20000), (5, 3, 101), (7, 7, 50), (10, 4, 9)])
+def test_window_extrema(length, step, n_times):
+    from app.ml.preprocessing import window_extrema
+    
+    samples = np.random.default_rng(0).standard_normal((3, n_times))
+    maxima, minima = window_extrema(samples, length, step)
+    starts = range(0, n_times - length + 1, step)
+    
+    assert maxima.shape == minima.shape == (3, len(starts))
+    for k, start in enumerate(starts):
+        np.testing.assert_array_equal(maxima[:, k], samples[:, start:start + length].max(axis=1))
+        np.testing.assert_array_equal(minima[:, k], samples[:, start:start + length].min(axis=1))
+
+def test_epochs_are_windows_of_the_recording():
+    """Test that the epochs start where MNE's fixed-length epochs do, without copying the recording"""
+    import mne
+    from app.ml.preprocessing import make_epochs
+    
+    raw = make_raw(seconds=62)
+    epochs = make_epochs(raw)
+    expected = mne.make_fixed_length_epochs(raw, duration=5, overlap=2, verbose="error")
+    
+    np.testing.assert_array_equal(epochs.starts, expected.events[:, 0] - raw.first_samp)
+    assert epochs.shape == (len(expected.events), 17, 1280)
+    assert np.shares_memory(epochs.windows(), raw._data)
+    with pytest.raises(ValueError):
+        make_epochs(make_raw(seconds=4))
+
+@pytest.mark.parametrize("annotated", [False, True])
+def test_reject_epochs_matches_drop_bad(annotated):
+    """Test that the vectorized rejection drops the epochs drop_bad drops, with the same drop log"""
+    import mne
+    from app.ml.preprocessing import make_epochs, reject_criteria, reject_epochs
+    
+    raw = make_raw(seconds=300)
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        raw._data[rng.integers(17), rng.integers(raw.n_times)] = rng.choice([-1.5e-4, 1.5e-4])
+    raw._data[0, -1] = 2e-4
+    if annotated:
+        raw.set_annotations(mne.Annotations([100.0], [10.0], ["BAD_movement"]))
+    
+    expected = mne.make_fixed_length_epochs(raw, duration=5, overlap=2)
+    expected.drop_bad(reject=dict(eeg=reject_criteria))
+    epochs = reject_epochs(make_epochs(raw))
+    
+    assert 0 < len(epochs) < len(epochs.drop_log)
+    np.testing.assert_array_equal(np.asarray(epochs), expected.get_data())
+    assert epochs.drop_log == expected.drop_log
+    np.testing.assert_array_equal(epochs.channel_means(), expected.get_data().mean(axis=1))
+
+def test_spectrogram_batches_stream_the_pipeline(tmp_path):
+    """Test that the batches arrive before the recording is cleaned and concatenate to the pipeline's output"""
+    import mne
+    from benchmarks.synthetic import make_recording
+    from app.ml import preprocessing
+    from app.ml.cache import SpectrogramCache
+    
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=4)
+    cache = SpectrogramCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    epochs = preprocessing.preprocess_eeg(path)
+    expected = preprocessing.compute_spectrograms(
+        preprocessing.scale_channel_means(epochs, preprocessing.registry.get_scaler()))
+    
+    applied = []
+    apply = mne.preprocessing.ICA.apply
+    with patch.object(mne.preprocessing.ICA, "apply", side_effect=lambda *args, **kwargs: applied.append(1) or apply(*args, **kwargs), autospec=True), \
+            patch("app.ml.preprocessing.get_spectrogram_cache", return_value=cache):
+        batches = preprocessing.iter_spectrograms(path, batch_size=16)
+        first = next(batches)
+        blocks_cleaned = len(applied)
+        batches = [first] + list(batches)
+        cached = list(preprocessing.iter_spectrograms(path, batch_size=16))
+    
+    assert blocks_cleaned < len(applied) == 4
+    assert [len(batch) for batch in batches] == [16] * (len(expected) // 16) + [len(expected) % 16]
+    np.testing.assert_array_equal(np.concatenate(batches), expected)
+    np.testing.assert_array_equal(np.concatenate(cached), expected)
+
+def test_streamed_epochs_only_touch_their_block(tmp_path):
+    """Test that each block's epochs cover that block's samples, not the whole recording"""
+    from benchmarks.synthetic import make_recording
+    from app.ml import preprocessing
+    
+    path = make_recording(str(tmp_path / "recording.edf"), minutes=5)
+    expected = preprocessing.preprocess_eeg(path)
+    block = preprocessing.BLOCK_SECONDS * 256
+    
+    spans = list(preprocessing.iter_epochs(path))
+    touched = [span.samples.shape[1] for span in spans]
+    
+    assert len(spans) == 5
+    # One block plus the epoch overlapping the previous one
+    assert max(touched) <= block + expected.length
+    assert sum(touched) < 1.1 * expected.samples.shape[1]
+    np.testing.assert_array_equal(np.concatenate([span.channel_means() for span in spans]), expected.channel_means())
+    np.testing.assert_array_equal(np.concatenate([np.asarray(span) for span in spans]), np.asarray(expected))
@@ -0,0 +1,41 @@
+import json
+import numpy as np
+import pytest
+from app.ml.segments import compact_segments, expand_segments, pack_segments, segment_labels, unpack_segments
+
+def test_pack_round_trip():
+    """Test that the model's float32 confidences survive packing and JSON exactly"""
+    healthy = np.random.default_rng(0).random(1000).astype(np.float32)
+    packed = json.loads(json.dumps(pack_segments(healthy, 1 - healthy)))
+    
+    unpacked_healthy, unpacked_mdd = unpack_segments(packed)
+    np.testing.assert_array_equal(unpacked_healthy, healthy)
+    np.testing.assert_array_equal(unpacked_mdd, 1 - healthy)
+    assert packed["count"] == 1000
+
+def test_unpack_rejects_unknown_encoding():
+    packed = pack_segments([0.5], [0.5])
+    with pytest.raises(ValueError):
+        unpack_segments({**packed, "encoding": "float16"})
+    with pytest.raises(ValueError):
+        unpack_segments({**packed, "count": 2})
+
+def test_segment_labels_break_ties_as_argmax():
+    assert segment_labels([0.9, 0.5, 0.2], [0.1, 0.5, 0.8]).tolist() == ["Healthy", "Healthy", "MDD"]
+
+def test_expand_and_compact():
+    """Test that the expanded view is the per-segment list predict_api used to store"""
+    detailed_predictions = [
+        {"segment_number": 1, "prediction": "Healthy", "healthy_confidence": 0.75, "mdd_confidence": 0.25},
+        {"segment_number": 2, "prediction": "MDD", "healthy_confidence": 0.125, "mdd_confidence": 0.875},
+    ]
+    stored = {"healthy_segments": 1, "mdd_segments": 1, "preprocessing_profile": "full",
+              "segment_predictions": pack_segments([0.75, 0.125], [0.25, 0.875])}
+    legacy = {**{key: value for key, value in stored.items() if key != "segment_predictions"},
+              "detailed_predictions": detailed_predictions}
+    
+    assert expand_segments(stored) == legacy
+    assert compact_segments(legacy) == stored
+    assert expand_segments(legacy) is legacy
+    assert compact_segments(stored) is stored
+    assert expand_segments({}) == {}
@@ -0,0 +1,99 @@
+import os
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+from app.main import app
+from app.auth import get_current_user
+from app.ml.cache import SpectrogramCache, hash_file
+
+client = TestClient(app)
+
+def test_cache_round_trip(tmp_path):
+    """Test that stored spectrograms are returned unchanged"""
+    cache = SpectrogramCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    spectrograms = np.random.rand(4, 3, 17, 25)
+    key = cache.key("filehash", "fingerprint")
+    
+    assert cache.get(key) is None
+    cache.put(key, spectrograms)
+    np.testing.assert_array_equal(cache.get(key), spectrograms)
+    assert cache.usage()["entries"] == 1
+
+def test_cache_key_depends_on_fingerprint():
+    """Test that a pipeline change invalidates cached entries"""
+    cache = SpectrogramCache("unused", max_bytes=1)
+    assert cache.key("filehash", "fingerprint-a") != cache.key("filehash", "fingerprint-b")
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the size cap evicts the entry read least recently"""
+    spectrograms = np.random.rand(4, 3, 17, 25)
+    cache = SpectrogramCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    cache.put("first", spectrograms)
+    entry_size = cache.usage()["size_bytes"]
+    
+    # Room for two entries only
+    cache.max_bytes = entry_size * 2 + entry_size // 2
+    cache.put("second", spectrograms)
+    
+    # Age both entries, then read "first" so "second" is the least recently used
+    old = time.time() - 100
+    os.utime(os.path.join(str(tmp_path), "first.npz"), (old - 10, old - 10))
+    os.utime(os.path.join(str(tmp_path), "second.npz"), (old, old))
+    assert cache.get("first") is not None
+    cache.put("third", spectrograms)
+    
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+
+def test_cache_purge(tmp_path):
+    """Test that purge removes every entry"""
+    cache = SpectrogramCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    cache.put("a", np.zeros((1, 3, 17, 25)))
+    cache.put("b", np.zeros((1, 3, 17, 25)))
+    
+    assert cache.purge() == 2
+    assert cache.usage()["entries"] == 0
+
+def test_hash_file(tmp_path):
+    """Test that identical bytes hash the same"""
+    first = tmp_path / "first.edf"
+    second = tmp_path / "second.edf"
+    first.write_bytes(b"edf-bytes")
+    second.write_bytes(b"edf-bytes")
+    assert hash_file(str(first)) == hash_file(str(second))
+
+def get_mock_user(email):
+    mock_user = MagicMock()
+    mock_user.id = 1
+    mock_user.email = email
+    return mock_user
+
+def test_purge_cache_requires_admin():
+    """Test that non-admin users cannot purge the cache"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user("test@example.com")
+    
+    with patch("app.auth.settings.ADMIN_EMAILS", "admin@example.com"):
+        response = client.delete("/api/assessment/cache")
+    
+    assert response.status_code == 403
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
+
+def test_purge_cache_as_admin(tmp_path):
+    """Test that an admin can purge the cache"""
+    app.dependency_overrides[get_current_user] = lambda: get_mock_user("admin@example.com")
+    cache = SpectrogramCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    cache.put("a", np.zeros((1, 3, 17, 25)))
+    
+    with patch("app.auth.settings.ADMIN_EMAILS", "admin@example.com"), \
+            patch("app.routers.phq9_prediction.get_spectrogram_cache", return_value=cache):
+        response = client.delete("/api/assessment/cache")
+    
+    assert response.status_code == 200
+    assert response.json()["entries_removed"] == 1
+    
+    # Reset dependency override
+    app.dependency_overrides = {}
@@ -0,0 +1,40 @@
+import os
+from unittest.mock import patch
+from app.ml import threads
+
+def test_blas_environment():
+    assert threads.blas_environment(0) == {}
+    environment = threads.blas_environment(2)
+    assert environment["OMP_NUM_THREADS"] == "2"
+    assert environment["OPENBLAS_NUM_THREADS"] == "2"
+    assert environment["MKL_NUM_THREADS"] == "2"
+
+def test_configure_blas_limits_loaded_pools_once():
+    """Test that BLAS_THREADS is exported for libraries loaded later and applied to the loaded ones once"""
+    with patch.object(threads, "_blas_configured", False), \
+            patch.object(threads.settings, "BLAS_THREADS", 2), \
+            patch.dict("os.environ"), \
+            patch("threadpoolctl.threadpool_limits") as mock_limits:
+        threads.configure_blas()
+        threads.configure_blas()
+        assert os.environ["OPENBLAS_NUM_THREADS"] == "2"
+    mock_limits.assert_called_once_with(limits=2)
+
+def test_configure_tensorflow_ignores_initialized_runtime():
+    """Test that thread settings TensorFlow no longer accepts are logged instead of failing the worker"""
+    import tensorflow as tf
+
+    with patch.object(threads, "_tensorflow_configured", False), \
+            patch.object(threads.settings, "TF_INTRA_OP_THREADS", 3), \
+            patch.object(tf.config.threading, "set_intra_op_parallelism_threads",
+                         side_effect=RuntimeError("cannot be modified after initialization")) as mock_set:
+        threads.configure_tensorflow()
+    mock_set.assert_called_once_with(3)
+
+def test_library_thread_settings():
+    with patch.object(threads.settings, "MNE_N_JOBS", 0), patch.object(threads.settings, "TF_INTRA_OP_THREADS", 0):
+        assert threads.mne_n_jobs() == 1
+        assert threads.tflite_threads() is None
+    with patch.object(threads.settings, "MNE_N_JOBS", 4), patch.object(threads.settings, "TF_INTRA_OP_THREADS", 2):
+        assert threads.mne_n_jobs() == 4
+        assert threads.tflite_threads() == 2